@@ -21,15 +21,16 @@ from anthropic.types import TextBlock
 from anthropic.types.beta import BetaMessage, BetaTextBlock, BetaToolUseBlock
 from anthropic.types.tool_use_block import ToolUseBlock
 
-from screeninfo import get_monitors
 from computer_use_demo.tools.logger import logger, truncate_string
+from computer_use_demo.tools.screen_geometry import screen_geometry
 
 logger.info("Starting the gradio app")
 
-screens = get_monitors()
+screens = screen_geometry.screens()
 logger.info(f"Found {len(screens)} screens")
 
 from computer_use_demo.loop import APIProvider, sampling_loop_sync
+from computer_use_demo.message_log import MessageLog
 
 from computer_use_demo.tools import ToolResult
 from computer_use_demo.tools.computer import get_screen_details
@@ -43,7 +44,7 @@ WARNING_TEXT = "⚠️ Security Alert: Do not provide access to sensitive accoun
 def setup_state(state):
 
     if "messages" not in state:
-        state["messages"] = []
+        state["messages"] = MessageLog()  # indexed, O(1) duplicate checks in the executors
     # -------------------------------
     if "planner_model" not in state:
         state["planner_model"] = "gpt-4o"  # default
@@ -1,5 +1,8 @@
 import asyncio
-from typing import Any, Dict, cast
+import threading
+import uuid
+import weakref
+from typing import Any, cast
 from collections.abc import Callable
 from anthropic.types.beta import (
     BetaContentBlock,
@@ -10,8 +13,9 @@ from anthropic.types.beta import (
     BetaTextBlockParam,
     BetaToolResultBlockParam,
 )
-from anthropic.types import TextBlock
-from anthropic.types.beta import BetaMessage, BetaTextBlock, BetaToolUseBlock
+from anthropic.types.beta import BetaMessage, BetaToolUseBlock
+from .display import ChatRenderer
+from ..message_log import append_unique
 from ..tools import BashTool, ComputerTool, EditTool, ToolCollection, ToolResult
 
 
@@ -29,28 +33,54 @@ class AnthropicExecutor:
         )
         self.output_callback = output_callback
         self.tool_output_callback = tool_output_callback
+        self.last_tool_calls: list[dict[str, Any]] = []  # tool calls of the last response, for the trajectory cache
+        self.renderer = ChatRenderer()
+
+        # One long-lived event loop for all tool calls: the bash session's subprocess is bound
+        # to the loop it was started on, so it must outlive a single call
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="anthropic-executor-loop", daemon=True)
+        self._loop_thread.start()
+        self._finalizer = weakref.finalize(self, _stop_loop, self._loop, self._loop_thread)
+
+    def run_tools(self, tool_blocks: list[BetaToolUseBlock]) -> list[ToolResult]:
+        """Run the tool_use blocks of a response on the executor's loop; results are in block order."""
+        calls = [(block.name, cast(dict[str, Any], block.input)) for block in tool_blocks]
+        return asyncio.run_coroutine_threadsafe(self.tool_collection.run_many(calls), self._loop).result()
+
+    def close(self):
+        """Stop the executor's event loop."""
+        self._finalizer()
+
+    def replay(self, tool_calls: list[dict[str, Any]], messages: list[BetaMessageParam]):
+        """Run recorded tool calls (e.g. from the trajectory cache) as if the model had sent them."""
+        content = [BetaToolUseBlock(id=f"toolu_{uuid.uuid4()}", name=call["name"], input=call["input"], type="tool_use")
+                   for call in tool_calls]
+        response = BetaMessage.model_construct(content=content, role="assistant", type="message")
+        return (yield from self(response, messages))
 
     def __call__(self, response: BetaMessage, messages: list[BetaMessageParam]):
         new_message = {
             "role": "assistant",
             "content": cast(list[BetaContentBlockParam], response.content),
         }
-        if new_message not in messages:
-            messages.append(new_message)
-        else:
+        if not append_unique(messages, new_message):  # O(1) for a MessageLog
             print("new_message already in messages, there are duplicates.")
         
         tool_result_content: list[BetaToolResultBlockParam] = []
+        self.last_tool_calls = [{"name": block.name, "input": block.input}
+                                for block in response.content if block.type == "tool_use"]
+        tool_results: dict[str, ToolResult] | None = None
         for content_block in cast(list[BetaContentBlock], response.content):
             
             self.output_callback(content_block, sender="bot")
             # Execute the tool
             if content_block.type == "tool_use":
-                # Run the asynchronous tool execution in a synchronous context
-                result = asyncio.run(self.tool_collection.run(
-                    name=content_block.name,
-                    tool_input=cast(dict[str, Any], content_block.input),
-                ))
+                if tool_results is None:
+                    # Run all tool_use blocks of the response at once: different tools run concurrently
+                    tool_blocks = [block for block in response.content if block.type == "tool_use"]
+                    tool_results = dict(zip((block.id for block in tool_blocks), self.run_tools(tool_blocks)))
+                result = tool_results[content_block.id]
                 
                 self.output_callback(result, sender="bot")
                 
@@ -61,37 +91,21 @@ class AnthropicExecutor:
 
             # Craft messages based on the content_block
             # Note: to display the messages in the gradio, you should organize the messages in the following way (user message, bot message)
-            
-            display_messages = _message_display_callback(messages)
-            # display_messages = []
-            
-            # Send the messages to the gradio
-            for user_msg, bot_msg in display_messages:
-                yield [user_msg, bot_msg], tool_result_content
+            # Send only the messages added since the last action to the gradio
+            for display_message in self.renderer.updates(messages):
+                yield display_message, tool_result_content
 
         if not tool_result_content:
             return messages
         
         return tool_result_content
 
-def _message_display_callback(messages):
-    display_messages = []
-    for msg in messages:
-        try:
-            if isinstance(msg["content"][0], TextBlock):
-                display_messages.append((msg["content"][0].text, None))  # User message
-            elif isinstance(msg["content"][0], BetaTextBlock):
-                display_messages.append((None, msg["content"][0].text))  # Bot message
-            elif isinstance(msg["content"][0], BetaToolUseBlock):
-                display_messages.append((None, f"Tool Use: {msg['content'][0].name}\nInput: {msg['content'][0].input}"))  # Bot message
-            elif isinstance(msg["content"][0], Dict) and msg["content"][0]["content"][-1]["type"] == "image":
-                display_messages.append((None, f'<img src="data:image/png;base64,{msg["content"][0]["content"][-1]["source"]["data"]}">'))  # Bot message
-            else:
-                print(msg["content"][0])
-        except Exception as e:
-            print("error", e)
-            pass
-    return display_messages
+def _stop_loop(loop: asyncio.AbstractEventLoop, thread: threading.Thread):
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+    if not thread.is_alive():
+        loop.close()
+
 
 def _make_api_tool_result(
     result: ToolResult, tool_use_id: str
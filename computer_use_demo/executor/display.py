@@ -0,0 +1,55 @@
+"""
+Chat display items for the executors.
+
+The executors yield (user, bot) display pairs to the UI after every action. Rebuilding
+them from the whole conversation each time re-walks every message and re-sends every
+base64 `<img>`, which is quadratic over a session. `ChatRenderer` keeps a cursor into
+`messages` and only renders the messages appended since its last call.
+"""
+from typing import Dict
+
+from anthropic.types import TextBlock
+from anthropic.types.beta import BetaTextBlock, BetaToolUseBlock
+
+from computer_use_demo.tools.logger import logger
+
+
+def message_display_item(msg) -> tuple[str | None, str | None] | None:
+    """The (user, bot) display pair of one message, or None if it is not displayed."""
+    try:
+        if isinstance(msg["content"][0], TextBlock):
+            return (msg["content"][0].text, None)  # User message
+        elif isinstance(msg["content"][0], BetaTextBlock):
+            return (None, msg["content"][0].text)  # Bot message
+        elif isinstance(msg["content"][0], BetaToolUseBlock):
+            return (None, f"Tool Use: {msg['content'][0].name}\nInput: {msg['content'][0].input}")  # Bot message
+        elif isinstance(msg["content"][0], Dict) and msg["content"][0]["content"][-1]["type"] == "image":
+            return (None, f'<img src="data:image/png;base64,{msg["content"][0]["content"][-1]["source"]["data"]}">')  # Bot message
+    except Exception:
+        logger.warning("Could not render a chat message", exc_info=True)
+    return None
+
+
+class ChatRenderer:
+    """Renders the display pairs of the messages appended to a conversation since the last call."""
+
+    def __init__(self):
+        self.cursor = 0  # messages[:cursor] are rendered
+        self._messages_id: int | None = None
+
+    def render(self, messages: list) -> list[tuple[str | None, str | None]]:
+        if id(messages) != self._messages_id or len(messages) < self.cursor:
+            # another conversation, or this one was truncated: start over
+            self._messages_id = id(messages)
+            self.cursor = 0
+        items = [message_display_item(msg) for msg in messages[self.cursor:]]
+        self.cursor = len(messages)
+        return [item for item in items if item is not None]
+
+    def updates(self, messages: list) -> list[list[str | None]]:
+        """
+        New display pairs to yield after an action; a single empty pair when there are none,
+        so that every action still refreshes the UI (its callbacks may have updated the chat).
+        """
+        items = self.render(messages)
+        return [[user_msg, bot_msg] for user_msg, bot_msg in items] or [[None, None]]
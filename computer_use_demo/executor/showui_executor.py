@@ -1,6 +1,5 @@
-import ast
 import asyncio
-from typing import Any, Dict, cast, List, Union
+from typing import Any, Dict, cast, List
 from collections.abc import Callable
 import uuid
 from anthropic.types.beta import (
@@ -12,10 +11,17 @@ from anthropic.types.beta import (
     BetaTextBlockParam,
     BetaToolResultBlockParam,
 )
-from anthropic.types import TextBlock
-from anthropic.types.beta import BetaMessage, BetaTextBlock, BetaToolUseBlock
+from anthropic.types.beta import BetaMessage, BetaToolUseBlock
 from computer_use_demo.tools import BashTool, ComputerTool, EditTool, ToolCollection, ToolResult
+from computer_use_demo.tools.action_parser import ActionParseError, ShowUIAction, parse_actions, parse_actor_response
+from computer_use_demo.tools.base import ToolFailure
 from computer_use_demo.tools.colorful_text import colorful_text_showui, colorful_text_vlm
+from computer_use_demo.tools.coordinates import get_coordinate_mapper
+from computer_use_demo.tools.logger import logger
+from computer_use_demo.executor.display import ChatRenderer
+from computer_use_demo.message_log import append_unique
+from computer_use_demo.tools.screen_geometry import screen_geometry
+from computer_use_demo.tools.settle import SettleDetector, settle_detector
 
 
 class ShowUIExecutor:
@@ -23,17 +29,23 @@ class ShowUIExecutor:
         self, 
         output_callback: Callable[[BetaContentBlockParam], None], 
         tool_output_callback: Callable[[Any, str], None],
-        selected_screen: int = 0
+        selected_screen: int = 0,
+        settle_detector: SettleDetector = settle_detector,
     ):
         self.output_callback = output_callback
         self.tool_output_callback = tool_output_callback
         self.selected_screen = selected_screen
+        self.settle_detector = settle_detector
         self.screen_bbox = self._get_screen_resolution()
-        print("Screen BBox:", self.screen_bbox)
+        logger.debug(f"Screen BBox: {self.screen_bbox}")
+        self.coordinate_mapper = get_coordinate_mapper(selected_screen)
         
         self.tool_collection = ToolCollection(
             ComputerTool(selected_screen=selected_screen, is_scaling=False)
         )
+        self.last_actions: list[dict[str, Any]] = []  # parsed actions of the last call, for the trajectory cache
+        self.last_parse_error: ActionParseError | None = None  # set when the last call's output could not be parsed
+        self.renderer = ChatRenderer()
         
         self.supported_action_type={
             # "showui_action": "anthropic_tool_action"
@@ -43,34 +55,75 @@ class ShowUIExecutor:
             "ESC": "key",
             "ESCAPE": "key",
             "PRESS":  "key",
+            "HOVER": "key",
+            "SCROLL": "key",
+            "DOUBLE_CLICK": "key",
+            "RIGHT_CLICK": "key",
+            "DRAG": "key",
+            "HOTKEY": "key",
+            "WAIT": "key",
+            "STOP": "key",
         }
 
     def __call__(self, response: str, messages: list[BetaMessageParam]):
         # response is expected to be :
         # {'content': "{'action': 'CLICK', 'value': None, 'position': [0.83, 0.15]}, ...", 'role': 'assistant'}, 
         
-        action_dict = self._format_actor_output(response)  # str -> dict
-        
-        actions = action_dict["content"]
-        role = action_dict["role"]
-        
-        # Parse the actions from showui
-        action_list = self._parse_showui_output(actions)
-        print("Parsed Action List:", action_list)
-        
+        try:
+            action_dict = parse_actor_response(response)
+            if action_dict.get("error"):
+                # the actor could not convert its model's output, e.g. UI-TARS
+                raise ActionParseError(action_dict["error"])
+            actions = parse_actions(action_dict["content"])  # str -> action records
+            # Map the actions from showui to the computer tool
+            action_list = self._parse_showui_output(actions)
+        except ActionParseError as e:
+            return (yield from self._report_parse_error(e, messages))
+        logger.debug(f"Parsed Action List: {action_list}")
+        self.last_actions = action_list
+        self.last_parse_error = None
+
+        return (yield from self.execute(action_list, messages))
+
+    def _report_parse_error(self, error: ActionParseError, messages: list[BetaMessageParam]):
+        # report it instead of silently doing nothing: the failure goes into the conversation,
+        # where the planner sees it, and to the UI like the result of an executed action
+        logger.warning(f"Error parsing output: {error}")
+        self.last_actions = []
+        self.last_parse_error = error
+        self.output_callback(f"{colorful_text_showui}: could not parse the actions: {error}", sender="bot")
+        result = ToolFailure(error=f"Could not parse the actor output: {error}")
+        tool_use_id = f"toolu_{uuid.uuid4()}"
+        tool_result_content = [_make_api_tool_result(result, tool_use_id)]
+        messages.append({"role": "user", "content": [f"History error: {result.error}"]})
+        self.tool_output_callback(result, tool_use_id)
+        for display_message in self.renderer.updates(messages):
+            yield display_message, tool_result_content
+        return tool_result_content
+
+    def replay(self, action_list: list[dict[str, Any]], messages: list[BetaMessageParam]):
+        """Execute already parsed actions, e.g. a step from the trajectory cache."""
+        action_list = [{**action, "coordinate": tuple(action["coordinate"]) if action.get("coordinate") else None}
+                       for action in action_list]
+        self.last_actions = action_list
+        self.last_parse_error = None
+        return (yield from self.execute(action_list, messages))
+
+    def execute(self, action_list: list[dict[str, Any]] | None, messages: list[BetaMessageParam]):
         tool_result_content = None
         
         if action_list is not None and len(action_list) > 0:
                     
-            for action in action_list:  # Execute the tool (adapting the code from anthropic_executor.py)
+            for i, action in enumerate(action_list):  # Execute the tool (adapting the code from anthropic_executor.py)
             
                 tool_result_content: list[BetaToolResultBlockParam] = []
                 
                 self.output_callback(f"{colorful_text_showui}:\n{action}", sender="bot")
-                print("Converted Action:", action)
+                logger.debug(f"Converted Action: {action}")
                 
                 sim_content_block = BetaToolUseBlock(id=f'toolu_{uuid.uuid4()}',
-                                        input={'action': action["action"], 'text': action["text"], 'coordinate': action["coordinate"]},
+                                        input={'action': action["action"], 'text': action["text"], 'coordinate': action["coordinate"],
+                                               **{key: action[key] for key in ("scroll_direction",) if key in action}},
                                         name='computer', type='tool_use')
                 
                 # update messages
@@ -78,14 +131,19 @@ class ShowUIExecutor:
                     "role": "assistant",
                     "content": cast(list[BetaContentBlockParam], [sim_content_block]),
                 }
-                if new_message not in messages:
-                    messages.append(new_message)
+                append_unique(messages, new_message)  # O(1) for a MessageLog
 
                 # Run the asynchronous tool execution in a synchronous context
                 result = self.tool_collection.sync_call(
                     name=sim_content_block.name,
                     tool_input=cast(dict[str, Any], sim_content_block.input),
                 )
+                # let the UI react before the next action (or the next screenshot), except between
+                # the move and the click of one CLICK-like action: nothing to wait for there
+                next_action = action_list[i + 1] if i + 1 < len(action_list) else None
+                if not (action["action"] == "mouse_move" and next_action is not None
+                        and next_action["action"] in _ACTIONS_AT_POINTER):
+                    self.settle_detector.wait(self.selected_screen)
                 
                 tool_result_content.append(
                     _make_api_tool_result(result, sim_content_block.id)
@@ -95,199 +153,102 @@ class ShowUIExecutor:
 
                 # Craft messages based on the content_block
                 # Note: to display the messages in the gradio, you should organize the messages in the following way (user message, bot message)
-                display_messages = _message_display_callback(messages)
-                # Send the messages to the gradio
-                for user_msg, bot_msg in display_messages:
-                    yield [user_msg, bot_msg], tool_result_content
+                # Send only the messages added since the last action to the gradio
+                for display_message in self.renderer.updates(messages):
+                    yield display_message, tool_result_content
         
         return tool_result_content
     
     
-    def _format_actor_output(self, action_output: str|dict) -> Dict[str, Any]:
-        if type(action_output) == dict:
-            return action_output
-        else:
-            try:
-                action_output.replace("'", "\"")
-                action_dict = ast.literal_eval(action_output)
-                return action_dict
-            except Exception as e:
-                print(f"Error parsing action output: {e}")
-                return None
-    
-
-    def _parse_showui_output(self, output_text: str) -> Union[List[Dict[str, Any]], None]:
-        try:
-            output_text = output_text.strip()
+    def _parse_showui_output(self, actions: list[ShowUIAction]) -> List[Dict[str, Any]]:
+        # refine the actions, mapping to the Anthropic's format
+        refined_output = []
+        
+        for action_item in actions:
             
-            # process single dictionary
-            if output_text.startswith("{") and output_text.endswith("}"):
-                output_text = f"[{output_text}]"
-
-            # Validate if the output resembles a list of dictionaries
-            if not (output_text.startswith("[") and output_text.endswith("]")):
-                raise ValueError("Output does not look like a valid list or dictionary.")
-
-            print("Output Text:", output_text)
-
-            parsed_output = ast.literal_eval(output_text)
-
-            print("Parsed Output:", parsed_output)
-
-            if isinstance(parsed_output, dict):
-                parsed_output = [parsed_output]
-            elif not isinstance(parsed_output, list):
-                raise ValueError("Parsed output is neither a dictionary nor a list.")
-
-            if not all(isinstance(item, dict) for item in parsed_output):
-                raise ValueError("Not all items in the parsed output are dictionaries.")
-
-            # refine key: value pairs, mapping to the Anthropic's format
-            refined_output = []
+            if action_item.action not in self.supported_action_type:
+                raise ActionParseError(f"Action {action_item.action} not supported. Check the output from ShowUI: {action_item}")
             
-            for action_item in parsed_output:
-                
-                print("Action Item:", action_item)
-                # sometime showui returns lower case action names
-                action_item["action"] = action_item["action"].upper()
-                
-                if action_item["action"] not in self.supported_action_type:
-                    raise ValueError(f"Action {action_item['action']} not supported. Check the output from ShowUI: {output_text}")
-                    # continue
-                
-                elif action_item["action"] == "CLICK":  # 1. click -> mouse_move + left_click
-                    x, y = action_item["position"]
-                    action_item["position"] = (int(x * (self.screen_bbox[2] - self.screen_bbox[0])),
-                                               int(y * (self.screen_bbox[3] - self.screen_bbox[1])))
-                    refined_output.append({"action": "mouse_move", "text": None, "coordinate": tuple(action_item["position"])})
-                    refined_output.append({"action": "left_click", "text": None, "coordinate": None})
-                
-                elif action_item["action"] == "INPUT":  # 2. input -> type
-                    refined_output.append({"action": "type", "text": action_item["value"], "coordinate": None})
+            elif action_item.action == "CLICK":  # 1. click -> mouse_move + left_click
+                refined_output.append({"action": "mouse_move", "text": None, "coordinate": _point(action_item)})
+                refined_output.append({"action": "left_click", "text": None, "coordinate": None})
+            
+            elif action_item.action == "INPUT":  # 2. input -> type
+                refined_output.append({"action": "type", "text": action_item.value, "coordinate": None})
+            
+            elif action_item.action == "ENTER":  # 3. enter -> key, enter
+                refined_output.append({"action": "key", "text": "Enter", "coordinate": None})
+            
+            elif action_item.action == "ESC" or action_item.action == "ESCAPE":  # 4. enter -> key, enter
+                refined_output.append({"action": "key", "text": "Escape", "coordinate": None})
                 
-                elif action_item["action"] == "ENTER":  # 3. enter -> key, enter
-                    refined_output.append({"action": "key", "text": "Enter", "coordinate": None})
+            elif action_item.action == "HOVER":  # 5. hover -> mouse_move
+                refined_output.append({"action": "mouse_move", "text": None, "coordinate": _point(action_item)})
                 
-                elif action_item["action"] == "ESC" or action_item["action"] == "ESCAPE":  # 4. enter -> key, enter
-                    refined_output.append({"action": "key", "text": "Escape", "coordinate": None})
-                    
-                elif action_item["action"] == "HOVER":  # 5. hover -> mouse_move
-                    x, y = action_item["position"]
-                    action_item["position"] = (int(x * (self.screen_bbox[2] - self.screen_bbox[0])),
-                                               int(y * (self.screen_bbox[3] - self.screen_bbox[1])))
-                    refined_output.append({"action": "mouse_move", "text": None, "coordinate": tuple(action_item["position"])})
-                    
-                elif action_item["action"] == "SCROLL":  # 6. scroll -> key: pagedown
-                    if action_item["value"] == "up":
-                        refined_output.append({"action": "key", "text": "pageup", "coordinate": None})
-                    elif action_item["value"] == "down":
-                        refined_output.append({"action": "key", "text": "pagedown", "coordinate": None})
-                    else:
-                        raise ValueError(f"Scroll direction {action_item['value']} not supported.")
-
-                elif action_item["action"] == "PRESS":  # 7. press
-                    x, y = action_item["position"]
-                    action_item["position"] = (int(x * (self.screen_bbox[2] - self.screen_bbox[0])),
-                                               int(y * (self.screen_bbox[3] - self.screen_bbox[1])))
-                    refined_output.append({"action": "mouse_move", "text": None, "coordinate": tuple(action_item["position"])})
-                    refined_output.append({"action": "left_press", "text": None, "coordinate": None})
-
-            return refined_output
-
-        except Exception as e:
-            print(f"Error parsing output: {e}")
-            return None
+            elif action_item.action == "SCROLL":  # 6. scroll -> key: pagedown, or scroll at the position
+                if action_item.position is None and action_item.value == "up":
+                    refined_output.append({"action": "key", "text": "pageup", "coordinate": None})
+                elif action_item.position is None and action_item.value == "down":
+                    refined_output.append({"action": "key", "text": "pagedown", "coordinate": None})
+                elif action_item.value in ("up", "down", "left", "right"):
+                    refined_output.append({"action": "scroll", "text": None, "scroll_direction": action_item.value,
+                                           "coordinate": _point(action_item) if action_item.position is not None else None})
+                else:
+                    raise ActionParseError(f"Scroll direction {action_item.value} not supported.")
+
+            elif action_item.action == "PRESS":  # 7. press
+                refined_output.append({"action": "mouse_move", "text": None, "coordinate": _point(action_item)})
+                refined_output.append({"action": "left_press", "text": None, "coordinate": None})
+
+            elif action_item.action == "DOUBLE_CLICK":  # 8. double click -> mouse_move + double_click
+                refined_output.append({"action": "mouse_move", "text": None, "coordinate": _point(action_item)})
+                refined_output.append({"action": "double_click", "text": None, "coordinate": None})
+
+            elif action_item.action == "RIGHT_CLICK":  # 9. right click -> mouse_move + right_click
+                refined_output.append({"action": "mouse_move", "text": None, "coordinate": _point(action_item)})
+                refined_output.append({"action": "right_click", "text": None, "coordinate": None})
+
+            elif action_item.action == "DRAG":  # 10. drag -> mouse_move to the start + left_click_drag to the end
+                start, end = _points(action_item)
+                refined_output.append({"action": "mouse_move", "text": None, "coordinate": start})
+                refined_output.append({"action": "left_click_drag", "text": None, "coordinate": end})
+
+            elif action_item.action == "HOTKEY":  # 11. hotkey -> key, e.g. ctrl+c
+                if not action_item.value:
+                    raise ActionParseError(f"Action HOTKEY needs the keys as its value: {action_item}")
+                refined_output.append({"action": "key", "text": action_item.value, "coordinate": None})
+
+            elif action_item.action == "WAIT":  # 12. wait -> wait
+                refined_output.append({"action": "wait", "text": None, "coordinate": None})
+
+            elif action_item.action == "STOP":  # 13. the actor is done, the actions after it are not run
+                break
+
+        # positions are relative to the screen: map them to screen pixels in one batch
+        return self.coordinate_mapper.map_actions(refined_output, "normalized", "screen")
         
 
     def _get_screen_resolution(self):
-        from screeninfo import get_monitors
-        import platform
-        if platform.system() == "Darwin":
-            import Quartz  # uncomment this line if you are on macOS
-        import subprocess
-            
-        # Detect platform
-        system = platform.system()
-
-        if system == "Windows":
-            # Windows: Use screeninfo to get monitor details
-            screens = get_monitors()
-
-            # Sort screens by x position to arrange from left to right
-            sorted_screens = sorted(screens, key=lambda s: s.x)
-
-            if self.selected_screen < 0 or self.selected_screen >= len(screens):
-                raise IndexError("Invalid screen index.")
-
-            screen = sorted_screens[self.selected_screen]
-            bbox = (screen.x, screen.y, screen.x + screen.width, screen.y + screen.height)
-
-        elif system == "Darwin":  # macOS
-            # macOS: Use Quartz to get monitor details
-            max_displays = 32  # Maximum number of displays to handle
-            active_displays = Quartz.CGGetActiveDisplayList(max_displays, None, None)[1]
-
-            # Get the display bounds (resolution) for each active display
-            screens = []
-            for display_id in active_displays:
-                bounds = Quartz.CGDisplayBounds(display_id)
-                screens.append({
-                    'id': display_id,
-                    'x': int(bounds.origin.x),
-                    'y': int(bounds.origin.y),
-                    'width': int(bounds.size.width),
-                    'height': int(bounds.size.height),
-                    'is_primary': Quartz.CGDisplayIsMain(display_id)  # Check if this is the primary display
-                })
-
-            # Sort screens by x position to arrange from left to right
-            sorted_screens = sorted(screens, key=lambda s: s['x'])
-
-            if self.selected_screen < 0 or self.selected_screen >= len(screens):
-                raise IndexError("Invalid screen index.")
-
-            screen = sorted_screens[self.selected_screen]
-            bbox = (screen['x'], screen['y'], screen['x'] + screen['width'], screen['y'] + screen['height'])
-
-        else:  # Linux or other OS
-            cmd = "xrandr | grep ' primary' | awk '{print $4}'"
-            try:
-                output = subprocess.check_output(cmd, shell=True).decode()
-                resolution = output.strip()
-                # Parse the resolution format like "1920x1080+1920+0"
-                # The format is "WIDTHxHEIGHT+X+Y"
-                parts = resolution.split('+')[0]  # Get just the "1920x1080" part
-                width, height = map(int, parts.split('x'))
-                # Get the X, Y offset if needed
-                x_offset = int(resolution.split('+')[1]) if len(resolution.split('+')) > 1 else 0
-                y_offset = int(resolution.split('+')[2]) if len(resolution.split('+')) > 2 else 0
-                bbox = (x_offset, y_offset, x_offset + width, y_offset + height)
-            except subprocess.CalledProcessError:
-                raise RuntimeError("Failed to get screen resolution on Linux.")
-        
-        return bbox
+        return screen_geometry.bbox(self.selected_screen)
 
 
 
-def _message_display_callback(messages):
-    display_messages = []
-    for msg in messages:
-        try:
-            if isinstance(msg["content"][0], TextBlock):
-                display_messages.append((msg["content"][0].text, None))  # User message
-            elif isinstance(msg["content"][0], BetaTextBlock):
-                display_messages.append((None, msg["content"][0].text))  # Bot message
-            elif isinstance(msg["content"][0], BetaToolUseBlock):
-                display_messages.append((None, f"Tool Use: {msg['content'][0].name}\nInput: {msg['content'][0].input}"))  # Bot message
-            elif isinstance(msg["content"][0], Dict) and msg["content"][0]["content"][-1]["type"] == "image":
-                display_messages.append((None, f'<img src="data:image/png;base64,{msg["content"][0]["content"][-1]["source"]["data"]}">'))  # Bot message
-            else:
-                pass
-                # print(msg["content"][0])
-        except Exception as e:
-            print("error", e)
-            pass
-    return display_messages
+# computer actions that act where a preceding mouse_move put the pointer
+_ACTIONS_AT_POINTER = ("left_click", "double_click", "right_click", "left_press", "left_click_drag")
+
+
+def _point(action: ShowUIAction) -> tuple[float, float]:
+    """The [x, y] position an action requires."""
+    if action.position is None or isinstance(action.position[0], tuple):
+        raise ActionParseError(f"Action {action.action} needs a position [x, y]: {action}")
+    return action.position
+
+
+def _points(action: ShowUIAction) -> tuple[tuple[float, float], tuple[float, float]]:
+    """The [[x1, y1], [x2, y2]] start and end positions an action requires."""
+    if action.position is None or not isinstance(action.position[0], tuple):
+        raise ActionParseError(f"Action {action.action} needs positions [[x1, y1], [x2, y2]]: {action}")
+    return action.position
 
 
 def _make_api_tool_result(
@@ -2,8 +2,9 @@ import os
 import base64
 from openai import OpenAI
 
-from computer_use_demo.gui_agent.llm_utils.oai import encode_image
-from computer_use_demo.tools.screen_capture import get_screenshot
+from computer_use_demo.tools.frame import Frame
+from computer_use_demo.tools.image_codec import ImageCodec, get_codec
+from computer_use_demo.tools.screen_capture import capture_frame
 from computer_use_demo.tools.logger import logger, truncate_string
 from computer_use_demo.tools.colorful_text import colorful_text_showui
 
@@ -40,13 +41,15 @@ class ShowUIActorAPI:
     # 'phone' action space could be added if needed
     }
 
-    def __init__(self, base_url: str, model_name: str, output_callback, api_key: str = "", selected_screen: int = 0, split: str = 'desktop'):
+    def __init__(self, base_url: str, model_name: str, output_callback, api_key: str = "", selected_screen: int = 0, split: str = 'desktop',
+                 image_codec: ImageCodec | str | None = None):
         self.base_url = base_url
         self.model_name = model_name
         self.client = OpenAI(base_url=self.base_url, api_key=api_key)
         self.selected_screen = selected_screen
         self.output_callback = output_callback
         self.split = split # 'desktop' or 'phone'
+        self.image_codec = get_codec("lmstudio", image_codec)
 
         self.system_prompt = self._NAV_SYSTEM.format(
             _APP=self.split,
@@ -54,16 +57,14 @@ class ShowUIActorAPI:
         )
         self.action_history = '' # Initialize action history
 
-    def __call__(self, messages):
+    def __call__(self, messages, frame: Frame | None = None):
         task = messages # In planner+actor mode, messages from planner is the task for actor
 
-        # Get screenshot
-        screenshot_pil, screenshot_path_obj = get_screenshot(selected_screen=self.selected_screen, resize=True, target_width=1920, target_height=1080)
-        screenshot_path = str(screenshot_path_obj)
-        image_base64 = encode_image(screenshot_path)
-
+        # Get screenshot, kept in memory, unless the loop already captured this step's frame
+        if frame is None:
+            frame = capture_frame(selected_screen=self.selected_screen, resize=True, target_width=1920, target_height=1080)
         if self.output_callback:
-            self.output_callback(f'Screenshot for API-based {colorful_text_showui} ({self.model_name}):\n<img src="data:image/png;base64,{image_base64}">', sender="bot")
+            self.output_callback(f'Screenshot for API-based {colorful_text_showui} ({self.model_name}):\n<img src="data:image/png;base64,{frame.base64}">', sender="bot")
 
         # Construct messages for the API
         # Similar to original ShowUIActor, considering action history
@@ -73,7 +74,7 @@ class ShowUIActorAPI:
         user_content = []
         # System prompt is handled by the API call structure for OpenAI compatible APIs
         # user_content.append({"type": "text", "text": self.system_prompt + self._NAV_FORMAT}) # System prompt included here for now
-        user_content.append({"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_base64}"}})
+        user_content.append({"type": "image_url", "image_url": {"url": self.image_codec.data_url(frame)}})
 
         current_prompt = f"Task: {task}"
         if self.action_history:
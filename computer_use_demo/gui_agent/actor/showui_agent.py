@@ -1,20 +1,21 @@
 import os
-import ast
 import base64
 from io import BytesIO
 from pathlib import Path
 from uuid import uuid4
 
-import pyautogui
 import requests
 import torch
 from PIL import Image, ImageDraw
 from qwen_vl_utils import process_vision_info
 from transformers import AutoProcessor, Qwen2VLForConditionalGeneration
 
-from computer_use_demo.gui_agent.llm_utils.oai import encode_image
+from computer_use_demo.tools.action_parser import parse_actions
 from computer_use_demo.tools.colorful_text import colorful_text_showui, colorful_text_vlm
-from computer_use_demo.tools.screen_capture import get_screenshot
+from computer_use_demo.tools.frame import Frame
+from computer_use_demo.tools.logger import logger
+from computer_use_demo.tools.resize import PixelBudget
+from computer_use_demo.tools.screen_capture import capture_frame
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
@@ -79,6 +80,9 @@ class ShowUIActor:
         self.min_pixels = 256 * 28 * 28
         self.max_pixels = max_pixels * 28 * 28
         # self.max_pixels = 1344 * 28 * 28
+        # frames are snapped to this budget before the processor sees them, so it does not resize again
+        self.pixel_budget = PixelBudget(self.min_pixels, self.max_pixels)
+        self.visual_tokens = None  # visual tokens of the last screenshot
         
         self.processor = AutoProcessor.from_pretrained(
             "Qwen/Qwen2-VL-2B-Instruct",
@@ -92,15 +96,20 @@ class ShowUIActor:
         )
         self.action_history = ''  # Initialize action history
 
-    def __call__(self, messages):
+    def __call__(self, messages, frame: Frame | None = None):
 
         task = messages
         
-        # screenshot
-        screenshot, screenshot_path = get_screenshot(selected_screen=self.selected_screen, resize=True, target_width=1920, target_height=1080)
-        screenshot_path = str(screenshot_path)
-        image_base64 = encode_image(screenshot_path)
-        self.output_callback(f'Screenshot for {colorful_text_showui}:\n<img src="data:image/png;base64,{image_base64}">', sender="bot")
+        # screenshot, kept in memory and handed to the processor as a PIL image
+        if frame is None:
+            frame = capture_frame(selected_screen=self.selected_screen, pixel_budget=self.pixel_budget)
+        self.output_callback(f'Screenshot for {colorful_text_showui}:\n<img src="data:image/png;base64,{frame.base64}">', sender="bot")
+
+        # snap to the processor's patch grid and pixel budget (memoized on the frame)
+        image = frame.resized(self.pixel_budget.size_for(*frame.size))
+        self.visual_tokens = self.pixel_budget.visual_tokens(*image.size)
+        logger.debug(f"ShowUI screenshot {frame.size} -> {image.size}, {self.visual_tokens} visual tokens")
+        image_content = {"type": "image", "image": image, "resized_width": image.width, "resized_height": image.height}
 
         # Use system prompt, task, and action history to build the messages
         if len(self.action_history) == 0:
@@ -109,7 +118,7 @@ class ShowUIActor:
                     "role": "user",
                     "content": [
                         {"type": "text", "text": self.system_prompt},
-                        {"type": "image", "image": screenshot_path, "min_pixels": self.min_pixels, "max_pixels": self.max_pixels},
+                        image_content,
                         {"type": "text", "text": f"Task: {task}"}
                     ],
                 }
@@ -121,7 +130,7 @@ class ShowUIActor:
                     "role": "user",
                     "content": [
                         {"type": "text", "text": self.system_prompt},
-                        {"type": "image", "image": screenshot_path, "min_pixels": self.min_pixels, "max_pixels": self.max_pixels},
+                        image_content,
                         {"type": "text", "text": f"Task: {task}"},
                         {"type": "text", "text": self.action_history},
                     ],
@@ -163,33 +172,5 @@ class ShowUIActor:
 
 
     def parse_showui_output(self, output_text):
-        try:
-            # Ensure the output is stripped of any extra spaces
-            output_text = output_text.strip()
-
-            # Wrap the input in brackets if it looks like a single dictionary
-            if output_text.startswith("{") and output_text.endswith("}"):
-                output_text = f"[{output_text}]"
-
-            # Validate if the output resembles a list of dictionaries
-            if not (output_text.startswith("[") and output_text.endswith("]")):
-                raise ValueError("Output does not look like a valid list or dictionary.")
-
-            # Parse the output using ast.literal_eval
-            parsed_output = ast.literal_eval(output_text)
-
-            # Ensure the result is a list
-            if isinstance(parsed_output, dict):
-                parsed_output = [parsed_output]
-            elif not isinstance(parsed_output, list):
-                raise ValueError("Parsed output is neither a dictionary nor a list.")
-
-            # Ensure all elements in the list are dictionaries
-            if not all(isinstance(item, dict) for item in parsed_output):
-                raise ValueError("Not all items in the parsed output are dictionaries.")
-
-            return parsed_output
-
-        except Exception as e:
-            print(f"Error parsing output: {e}")
-            return None
+        """The action dicts in `output_text`; raises ActionParseError if it is malformed."""
+        return [action.as_dict() for action in parse_actions(output_text)]
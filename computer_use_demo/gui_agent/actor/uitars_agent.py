@@ -1,9 +1,10 @@
 import json
-import re
 from openai import OpenAI
 
-from computer_use_demo.gui_agent.llm_utils.oai import encode_image
-from computer_use_demo.tools.screen_capture import get_screenshot
+from computer_use_demo.tools.action_parser import ActionParseError, parse_ui_tars_actions
+from computer_use_demo.tools.frame import Frame
+from computer_use_demo.tools.image_codec import ImageCodec, get_codec
+from computer_use_demo.tools.screen_capture import capture_frame
 from computer_use_demo.tools.logger import logger, truncate_string
 
 
@@ -20,8 +21,11 @@ You are a GUI agent. You are given a task and your action history, with screensh
 
 ## Action Space
 click(start_box='<|box_start|>(x1,y1)<|box_end|>')
+left_double(start_box='<|box_start|>(x1,y1)<|box_end|>')
+right_single(start_box='<|box_start|>(x1,y1)<|box_end|>')
+drag(start_box='<|box_start|>(x1,y1)<|box_end|>', end_box='<|box_start|>(x3,y3)<|box_end|>')
 hotkey(key='')
-type(content='') #If you want to submit your input, use \"\" at the end of `content`.
+type(content='') #If you want to submit your input, use \"\\n\" at the end of `content`.
 scroll(start_box='<|box_start|>(x1,y1)<|box_end|>', direction='down or up or right or left')
 wait() #Sleep for 5s and take a screenshot to check for any changes.
 finished()
@@ -29,29 +33,31 @@ call_user() # Submit the task and call the user when the task is unsolvable, or
 
 ## Note
 - Do not generate any other text.
+- You may output several actions, one per line, when they do not depend on seeing the screen in between (e.g. click a field, then type).
 """
 
-    def __init__(self, ui_tars_url, output_callback, api_key="", selected_screen=0, model_name: str = "ui-tars"):
+    def __init__(self, ui_tars_url, output_callback, api_key="", selected_screen=0, model_name: str = "ui-tars",
+                 image_codec: ImageCodec | str | None = None):
 
         self.ui_tars_url = ui_tars_url
         self.ui_tars_client = OpenAI(base_url=self.ui_tars_url, api_key=api_key)
         self.selected_screen = selected_screen
         self.output_callback = output_callback
         self.model_name = model_name
+        self.image_codec = get_codec("lmstudio", image_codec)  # served from a local OpenAI-compatible endpoint
 
         self.grounding_system_prompt = self._NAV_SYSTEM_GROUNDING.format()
 
 
-    def __call__(self, messages):
+    def __call__(self, messages, frame: Frame | None = None):
 
         task = messages
         
-        # take screenshot
-        screenshot, screenshot_path = get_screenshot(selected_screen=self.selected_screen, resize=True, target_width=1920, target_height=1080)
-        screenshot_path = str(screenshot_path)
-        screenshot_base64 = encode_image(screenshot_path)
+        # take screenshot, kept in memory, unless the loop already captured this step's frame
+        if frame is None:
+            frame = capture_frame(selected_screen=self.selected_screen, resize=True, target_width=1920, target_height=1080)
 
-        logger.info(f"Sending messages to UI-TARS on {self.ui_tars_url} with model {self.model_name}: {task}, screenshot: {screenshot_path}")
+        logger.info(f"Sending messages to UI-TARS on {self.ui_tars_url} with model {self.model_name}: {task}, screenshot: {frame}")
 
         response = self.ui_tars_client.chat.completions.create(
             model=self.model_name,
@@ -59,7 +65,7 @@ call_user() # Submit the task and call the user when the task is unsolvable, or
                 {"role": "system", "content": self.grounding_system_prompt},
                 {"role": "user", "content": [
                     {"type": "text", "text": task},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{screenshot_base64}"}}
+                    {"type": "image_url", "image_url": {"url": self.image_codec.data_url(frame)}}
                     ]
                 },
                 ],
@@ -68,103 +74,27 @@ call_user() # Submit the task and call the user when the task is unsolvable, or
             )
         
         ui_tars_action = response.choices[0].message.content
-        converted_action = convert_ui_tars_action_to_json(ui_tars_action)
-        response = str(converted_action)
+        try:
+            # all actions of the response, executed as one batch
+            response = {'content': convert_ui_tars_action_to_json(ui_tars_action), 'role': 'assistant'}
+        except ActionParseError as e:
+            # hand the raw output and the error on, the executor reports it as a failed step
+            logger.warning(f"Could not parse the UI-TARS output: {e}")
+            response = {'content': ui_tars_action, 'role': 'assistant', 'error': str(e)}
 
-        response = {'content': response, 'role': 'assistant'}
         return response
 
 
 
 def convert_ui_tars_action_to_json(action_str: str) -> str:
     """
-    Converts an action line such as:
+    Converts every action of a UI-TARS response, such as:
       Action: click(start_box='(153,97)')
-    into a JSON string of the form:
-      {
-        "action": "CLICK",
-        "value": null,
-        "position": [153, 97]
-      }
+
+      type(content='hello')
+    into a JSON list of ShowUI actions, positions normalized from UI-TARS' 0-1000 range:
+      [{"action": "CLICK", "value": null, "position": [0.153, 0.097]},
+       {"action": "INPUT", "value": "hello", "position": null}]
+    Raises ActionParseError if the response has no valid action.
     """
-    
-    # Strip leading/trailing whitespace and remove "Action: " prefix if present
-    action_str = action_str.strip()
-    if action_str.startswith("Action:"):
-        action_str = action_str[len("Action:"):].strip()
-
-    # Mappings from old action names to the new action schema
-    ACTION_MAP = {
-        "click": "CLICK",
-        "type": "INPUT",
-        "scroll": "SCROLL",
-        "wait": "STOP",        # TODO: deal with "wait()"
-        "finished": "STOP",
-        "call_user": "STOP",
-        "hotkey": "HOTKEY",    # We break down the actual key below (Enter, Esc, etc.)
-    }
-
-    # Prepare a structure for the final JSON
-    # Default to no position and null value
-    output_dict = {
-        "action": None,
-        "value": None,
-        "position": None
-    }
-
-    # 1) CLICK(...) e.g. click(start_box='(153,97)')
-    match_click = re.match(r"^click\(start_box='\(?(\d+),\s*(\d+)\)?'\)$", action_str)
-    if match_click:
-        x, y = match_click.groups()
-        output_dict["action"] = ACTION_MAP["click"]
-        output_dict["position"] = [int(x), int(y)]
-        return json.dumps(output_dict)
-
-    # 2) HOTKEY(...) e.g. hotkey(key='Enter')
-    match_hotkey = re.match(r"^hotkey\(key='([^']+)'\)$", action_str)
-    if match_hotkey:
-        key = match_hotkey.group(1).lower()
-        if key == "enter":
-            output_dict["action"] = "ENTER"
-        elif key == "esc":
-            output_dict["action"] = "ESC"
-        else:
-            # Otherwise treat it as some generic hotkey
-            output_dict["action"] = ACTION_MAP["hotkey"]
-            output_dict["value"] = key
-        return json.dumps(output_dict)
-
-    # 3) TYPE(...) e.g. type(content='some text')
-    match_type = re.match(r"^type\(content='([^']*)'\)$", action_str)
-    if match_type:
-        typed_content = match_type.group(1)
-        output_dict["action"] = ACTION_MAP["type"]
-        output_dict["value"] = typed_content
-        # If you want a position (x,y) you need it in your string. Otherwise it's omitted.
-        return json.dumps(output_dict)
-
-    # 4) SCROLL(...) e.g. scroll(start_box='(153,97)', direction='down')
-    #    or scroll(start_box='...', direction='down')
-    match_scroll = re.match(
-        r"^scroll\(start_box='[^']*'\s*,\s*direction='(down|up|left|right)'\)$",
-        action_str
-    )
-    if match_scroll:
-        direction = match_scroll.group(1)
-        output_dict["action"] = ACTION_MAP["scroll"]
-        output_dict["value"] = direction
-        return json.dumps(output_dict)
-
-    # 5) WAIT() or FINISHED() or CALL_USER() etc.
-    if action_str in ["wait()", "finished()", "call_user()"]:
-        base_action = action_str.replace("()", "")
-        if base_action in ACTION_MAP:
-            output_dict["action"] = ACTION_MAP[base_action]
-        else:
-            output_dict["action"] = "STOP"
-        return json.dumps(output_dict)
-
-    # If none of the above patterns matched, you can decide how to handle
-    # unknown or unexpected action lines:
-    output_dict["action"] = "STOP"
-    return json.dumps(output_dict)
\ No newline at end of file
+    return json.dumps([action.as_dict() for action in parse_ui_tars_actions(action_str)])
@@ -1,12 +1,15 @@
 import os
 import logging
-import base64
 import requests
-from computer_use_demo.gui_agent.llm_utils.llm_utils import is_image_path, encode_image
+from PIL import Image
+from computer_use_demo.gui_agent.llm_utils.llm_utils import is_image_path
+from computer_use_demo.tools.frame import Frame
+from computer_use_demo.tools.image_codec import ImageCodec, get_codec
 
 
 
-def run_oai_interleaved(messages: list, system: str, llm: str, api_key: str, max_tokens=256, temperature=0, base_url: str | None = None):
+def run_oai_interleaved(messages: list, system: str, llm: str, api_key: str, max_tokens=256, temperature=0, base_url: str | None = None,
+                        image_codec: ImageCodec | str | None = None):
 
     api_key = api_key or os.environ.get("OPENAI_API_KEY")
     if not api_key and not base_url: # If base_url is provided, API key might be optional (e.g. local LM Studio)
@@ -15,6 +18,7 @@ def run_oai_interleaved(messages: list, system: str, llm: str, api_key: str, max
     headers = {"Content-Type": "application/json",
                "Authorization": f"Bearer {api_key}"}
 
+    codec = ImageCodec.from_spec(image_codec)
     final_messages = [{"role": "system", "content": system}]
 
     # image_url = "https://upload.wikimedia.org/wikipedia/commons/thumb/d/dd/Gfp-wisconsin-madison-the-nature-boardwalk.jpg/2560px-Gfp-wisconsin-madison-the-nature-boardwalk.jpg"
@@ -26,8 +30,8 @@ def run_oai_interleaved(messages: list, system: str, llm: str, api_key: str, max
                 for cnt in item["content"]:
                     if isinstance(cnt, str):
                         if is_image_path(cnt):
-                            base64_image = encode_image(cnt)
-                            content = {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+                            with Image.open(cnt) as img:
+                                content = {"type": "image_url", "image_url": {"url": codec.data_url(img)}}
                         else:
                             content = {"type": "text", "text": cnt}
                     
@@ -36,10 +40,14 @@ def run_oai_interleaved(messages: list, system: str, llm: str, api_key: str, max
                     contents.append(content)
                 message = {"role": item["role"], "content": contents}
                 
+            elif isinstance(item, Frame):  # in-memory screenshot, no disk round trip
+                contents.append({"type": "image_url", "image_url": {"url": codec.data_url(item)}})
+                message = {"role": "user", "content": contents}
+
             elif isinstance(item, str):
                 if is_image_path(item):
-                    base64_image = encode_image(item)
-                    contents.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}})
+                    with Image.open(item) as img:
+                        contents.append({"type": "image_url", "image_url": {"url": codec.data_url(img)}})
                     message = {"role": "user", "content": contents}
                 else:
                     contents.append({"type": "text", "text": item})
@@ -80,32 +88,10 @@ def run_oai_interleaved(messages: list, system: str, llm: str, api_key: str, max
         print(f"Error in interleaved openAI: {e}. This may due to your invalid OPENAI_API_KEY. Please check the response: {response.json()} ")
         return response.json()
 
-def run_ssh_llm_interleaved(messages: list, system: str, llm: str, ssh_host: str, ssh_port: int, max_tokens=256, temperature=0.7, do_sample=True):
+def run_ssh_llm_interleaved(messages: list, system: str, llm: str, ssh_host: str, ssh_port: int, max_tokens=256, temperature=0.7, do_sample=True,
+                            image_codec: ImageCodec | str | None = None):
     """Send chat completion request to SSH remote server"""
-    from PIL import Image
-    from io import BytesIO
-    def encode_image(image_path: str, max_size=1024) -> str:
-        """Convert image to base64 encoding with preprocessing"""
-        try:
-            with Image.open(image_path) as img:
-                # Convert to RGB format
-                img = img.convert('RGB')
-                
-                # Scale down if image is too large
-                if max(img.size) > max_size:
-                    ratio = max_size / max(img.size)
-                    new_size = tuple(int(dim * ratio) for dim in img.size)
-                    img = img.resize(new_size, Image.LANCZOS)
-                
-                # Convert processed image to base64
-                buffered = BytesIO()
-                img.save(buffered, format="JPEG", quality=85)
-                img_str = base64.b64encode(buffered.getvalue()).decode()
-                return img_str
-        except Exception as e:
-            print(f"Image processing failed: {str(e)}")
-            raise
-
+    codec = get_codec("ssh", image_codec)
 
     try:
         # Verify SSH connection info
@@ -133,13 +119,13 @@ def run_ssh_llm_interleaved(messages: list, system: str, llm: str, ssh_host: str
                     for cnt in item["content"]:
                         if isinstance(cnt, str):
                             if is_image_path(cnt):
-                                base64_image = encode_image(cnt)
-                                content = {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}"
+                                with Image.open(cnt) as img:
+                                    content = {
+                                        "type": "image_url",
+                                        "image_url": {
+                                            "url": codec.data_url(img)
+                                        }
                                     }
-                                }
                             else:
                                 content = {
                                     "type": "text",
@@ -147,6 +133,14 @@ def run_ssh_llm_interleaved(messages: list, system: str, llm: str, ssh_host: str
                                 }
                         contents.append(content)
                     message = {"role": item["role"], "content": contents}
+                elif isinstance(item, Frame):  # in-memory screenshot
+                    contents.append({
+                        "type": "image_url",
+                        "image_url": {
+                            "url": codec.data_url(item)
+                        }
+                    })
+                    message = {"role": "user", "content": contents}
                 else:  # str
                     contents.append({"type": "text", "text": item})
                     message = {"role": "user", "content": contents}
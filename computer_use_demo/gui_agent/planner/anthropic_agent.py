@@ -24,6 +24,7 @@ from anthropic.types.beta import (
 from anthropic.types import TextBlock
 from anthropic.types.beta import BetaMessage, BetaTextBlock, BetaToolUseBlock
 
+from computer_use_demo.message_log import MessageLog
 from computer_use_demo.tools import BashTool, ComputerTool, EditTool, ToolCollection, ToolResult
 
 from PIL import Image
@@ -113,6 +114,9 @@ class AnthropicActor:
         """
         if self.only_n_most_recent_images:
             _maybe_filter_to_n_most_recent_images(messages, self.only_n_most_recent_images)
+            if isinstance(messages, MessageLog):
+                # the filter edited messages in place, their fingerprints are stale
+                messages.reindex()
 
         # Call the API synchronously
         raw_response = self.client.beta.messages.with_raw_response.create(
@@ -10,10 +10,13 @@ from anthropic import Anthropic, AnthropicBedrock, AnthropicVertex, APIResponse
 from anthropic.types import TextBlock, ToolResultBlockParam
 from anthropic.types.beta import BetaMessage, BetaTextBlock, BetaToolUseBlock, BetaMessageParam
 
-from computer_use_demo.tools.screen_capture import get_screenshot
+from computer_use_demo.tools.change_map import ChangeTracker
+from computer_use_demo.tools.frame import Frame
+from computer_use_demo.tools.image_codec import ImageCodec, get_codec
+from computer_use_demo.tools.screen_capture import capture_frame
 from computer_use_demo.gui_agent.llm_utils.oai import run_oai_interleaved, run_ssh_llm_interleaved
 from computer_use_demo.gui_agent.llm_utils.qwen import run_qwen
-from computer_use_demo.gui_agent.llm_utils.llm_utils import extract_data, encode_image
+from computer_use_demo.gui_agent.llm_utils.llm_utils import extract_data
 from computer_use_demo.tools.colorful_text import colorful_text_showui, colorful_text_vlm
 
 
@@ -31,6 +34,10 @@ class APIVLMPlanner:
         selected_screen: int = 0,
         print_usage: bool = True,
         base_url: str | None = None,
+        image_codec: ImageCodec | str | None = None,
+        changed_regions: bool = False,
+        max_changed_fraction: float = 0.5,
+        keyframe_interval: int = 5,
     ):
         if model == "gpt-4o":
             self.model = "gpt-4o-2024-11-20"
@@ -57,6 +64,12 @@ class APIVLMPlanner:
         self.output_callback = output_callback
         self.system_prompt = self._get_system_prompt() + self.system_prompt_suffix
         self.base_url = base_url
+        self.image_codec = get_codec(provider, image_codec)  # how screenshots are sent to the model
+        # send the last full frame (the keyframe) plus full-res crops of what changed since, instead of a new full frame
+        self.change_tracker = ChangeTracker() if changed_regions else None
+        self.max_changed_fraction = max_changed_fraction
+        self.keyframe_interval = keyframe_interval
+        self._keyframe_age = 0  # steps since the keyframe was sent
 
 
         self.print_usage = print_usage
@@ -64,7 +77,7 @@ class APIVLMPlanner:
         self.total_cost = 0
 
            
-    def __call__(self, messages: list):
+    def __call__(self, messages: list, frame: Frame | None = None):
         
         # drop looping actions msg, byte image etc
         planner_messages = _message_filter_callback(messages)  
@@ -73,11 +86,10 @@ class APIVLMPlanner:
         if self.only_n_most_recent_images:
             _maybe_filter_to_n_most_recent_images(planner_messages, self.only_n_most_recent_images)
 
-        # Take a screenshot
-        screenshot, screenshot_path = get_screenshot(selected_screen=self.selected_screen)
-        screenshot_path = str(screenshot_path)
-        image_base64 = encode_image(screenshot_path)
-        self.output_callback(f'Screenshot for {colorful_text_vlm}:\n<img src="data:image/png;base64,{image_base64}">',
+        # Take a screenshot, kept in memory, unless the loop already captured this step's frame
+        if frame is None:
+            frame = capture_frame(selected_screen=self.selected_screen)
+        self.output_callback(f'Screenshot for {colorful_text_vlm}:\n<img src="data:image/png;base64,{frame.base64}">',
                              sender="bot")
         
         # if isinstance(planner_messages[-1], dict):
@@ -90,13 +102,16 @@ class APIVLMPlanner:
         # append screenshot
         # planner_messages.append({"role": "user", "content": [{"type": "image", "image": screenshot_path}]})
         
-        planner_messages.append(screenshot_path)
-        
-        print(f"Sending messages to VLMPlanner: {planner_messages}")
-
         # Use APIProvider enum for provider checks
         from computer_use_demo.loop import APIProvider
 
+        if self.change_tracker is not None and self.provider != APIProvider.QWEN:
+            planner_messages.extend(self._changed_region_messages(frame))
+        else:
+            planner_messages.append(frame)
+        
+        print(f"Sending messages to VLMPlanner: {planner_messages}")
+
         if self.provider == APIProvider.OPENAI or self.provider == APIProvider.OPENROUTER:
             # This will now handle gpt-4o, gpt-4o-mini, and OpenRouter models if self.model is set correctly
             vlm_response, token_usage = run_oai_interleaved(
@@ -107,6 +122,7 @@ class APIVLMPlanner:
                 max_tokens=self.max_tokens,
                 temperature=0,
                 base_url=self.base_url, # Pass the base_url here
+                image_codec=self.image_codec,
             )
             print(f"{self.provider} token usage: {token_usage}")
             self.total_token_usage += token_usage
@@ -116,6 +132,8 @@ class APIVLMPlanner:
             # Add cost calculation for OpenRouter if available
             
         elif self.provider == APIProvider.QWEN and self.model == "qwen2-vl-max": # Specific check for qwen via its own API
+            # dashscope reads local images from disk, persist the frame for it
+            planner_messages[-1] = str(frame.save())
             vlm_response, token_usage = run_qwen(
                 messages=planner_messages,
                 system=self.system_prompt,
@@ -143,6 +161,7 @@ class APIVLMPlanner:
                 ssh_host=ssh_host,
                 ssh_port=ssh_port,
                 max_tokens=self.max_tokens,
+                image_codec=self.image_codec,
             )
         else:
             raise ValueError(f"Model {self.model} not supported")
@@ -167,6 +186,38 @@ class APIVLMPlanner:
         return vlm_response_json
 
 
+    def _changed_region_messages(self, frame: Frame) -> list:
+        """
+        The keyframe (the last full frame sent) followed by full-resolution crops of the regions
+        of `frame` that changed since. The history keeps no images, so every request carries the
+        keyframe; its encoding is reused across steps. Sends `frame` as the new keyframe on the
+        first step, when most of the screen changed, or every `keyframe_interval` steps.
+        """
+        keyframe = self.change_tracker.reference(frame.selected_screen)
+        change_map = self.change_tracker.compare(frame)
+        if (change_map is None or change_map.dirty_fraction > self.max_changed_fraction
+                or self._keyframe_age >= self.keyframe_interval):
+            self.change_tracker.set_reference(frame)
+            self._keyframe_age = 0
+            return [frame]
+        self._keyframe_age += 1
+
+        width, height = frame.size
+        boxes = change_map.boxes(margin=change_map.tile // 2)
+        if not boxes:
+            return [f"Screenshot of the {width}x{height} screen, unchanged since an earlier step:", keyframe]
+
+        crops = [Frame.from_region(frame.image, box, selected_screen=frame.selected_screen, timestamp=frame.timestamp)
+                 for box in boxes]
+        box_list = ", ".join(str(box) for box in boxes)
+        return [
+            f"Screenshot of the {width}x{height} screen from an earlier step:",
+            keyframe,
+            f"The screen is now that screenshot with the following full-resolution crops pasted over it, "
+            f"at (left, top, right, bottom): {box_list}",
+            *crops,
+        ]
+
     def _api_response_callback(self, response: APIResponse):
         self.api_response_callback(response)
         
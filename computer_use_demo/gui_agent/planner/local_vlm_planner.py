@@ -10,8 +10,10 @@ from anthropic import Anthropic, AnthropicBedrock, AnthropicVertex, APIResponse
 from anthropic.types import TextBlock, ToolResultBlockParam
 from anthropic.types.beta import BetaMessage, BetaTextBlock, BetaToolUseBlock, BetaMessageParam
 
-from computer_use_demo.tools.screen_capture import get_screenshot
-from computer_use_demo.gui_agent.llm_utils.llm_utils import extract_data, encode_image
+from computer_use_demo.tools.frame import Frame
+from computer_use_demo.tools.resize import PixelBudget
+from computer_use_demo.tools.screen_capture import capture_frame
+from computer_use_demo.gui_agent.llm_utils.llm_utils import extract_data
 from computer_use_demo.tools.colorful_text import colorful_text_showui, colorful_text_vlm
 
 import torch
@@ -49,6 +51,9 @@ class LocalVLMPlanner:
         self.device = device
         self.min_pixels = 256 * 28 * 28
         self.max_pixels = 1344 * 28 * 28
+        # frames are snapped to this budget before the processor sees them, so it does not resize again
+        self.pixel_budget = PixelBudget(self.min_pixels, self.max_pixels)
+        self.visual_tokens = None  # visual tokens of the last screenshot
         self.model_name = model
         if model in MODEL_TO_HF_PATH:
             self.hf_path = MODEL_TO_HF_PATH[model]
@@ -80,26 +85,29 @@ class LocalVLMPlanner:
         self.total_cost = 0
 
            
-    def __call__(self, messages: list):
+    def __call__(self, messages: list, frame: Frame | None = None):
         
         # drop looping actions msg, byte image etc
         planner_messages = _message_filter_callback(messages)  
         print(f"filtered_messages: {planner_messages}")
 
-        # Take a screenshot
-        screenshot, screenshot_path = get_screenshot(selected_screen=self.selected_screen)
-        screenshot_path = str(screenshot_path)
-        image_base64 = encode_image(screenshot_path)
-        self.output_callback(f'Screenshot for {colorful_text_vlm}:\n<img src="data:image/png;base64,{image_base64}">',
+        # Take a screenshot, kept in memory, unless the loop already captured this step's frame
+        if frame is None:
+            frame = capture_frame(selected_screen=self.selected_screen)
+        self.output_callback(f'Screenshot for {colorful_text_vlm}:\n<img src="data:image/png;base64,{frame.base64}">',
                              sender="bot")
         
         if isinstance(planner_messages[-1], dict):
             if not isinstance(planner_messages[-1]["content"], list):
                 planner_messages[-1]["content"] = [planner_messages[-1]["content"]]
-            planner_messages[-1]["content"].append(screenshot_path)
+            planner_messages[-1]["content"].append(frame)
 
         print(f"Sending messages to VLMPlanner: {planner_messages}")
 
+        # snap to the processor's patch grid and pixel budget (memoized on the frame)
+        image = frame.resized(self.pixel_budget.size_for(*frame.size))
+        self.visual_tokens = self.pixel_budget.visual_tokens(*image.size)
+
         messages_for_processor = [
             {
                 "role": "system",
@@ -108,7 +116,7 @@ class LocalVLMPlanner:
             {
                 "role": "user",
                 "content": [
-                {"type": "image", "image": screenshot_path, "min_pixels": self.min_pixels, "max_pixels": self.max_pixels},
+                {"type": "image", "image": image, "resized_width": image.width, "resized_height": image.height},
                 {"type": "text", "text": f"Task: {''.join(planner_messages)}"}
             ],
         }]
@@ -11,8 +11,17 @@ from anthropic.types.beta import BetaContentBlock, BetaMessage, BetaMessageParam
 from computer_use_demo.tools import ToolResult
 
 from computer_use_demo.tools.colorful_text import colorful_text_showui, colorful_text_vlm
-from computer_use_demo.tools.screen_capture import get_screenshot
-from computer_use_demo.gui_agent.llm_utils.oai import encode_image
+from computer_use_demo.tools.screen_capture import capture_frame
+from computer_use_demo.tools.capture_daemon import CaptureDaemon
+from computer_use_demo.tools.change_map import ScreenHistory
+from computer_use_demo.tools.frame import Frame
+from computer_use_demo.tools.display_backend import use_display_backend
+from computer_use_demo.tools.input_backend import use_input_backend
+from computer_use_demo.tools.pacing import set_pacing_profile
+from computer_use_demo.tools.pipeline import StepPipeline
+from computer_use_demo.tools.trajectory_cache import task_text
+from computer_use_demo.tools.trajectory_cache import trajectory_cache as shared_trajectory_cache
+from computer_use_demo.tools.telemetry import action_telemetry
 from computer_use_demo.tools.logger import logger
 from computer_use_demo.gui_agent.actor.uitars_agent import UITARS_Actor
 from computer_use_demo.gui_agent.actor.showui_actor_api import ShowUIActorAPI
@@ -74,12 +83,50 @@ def sampling_loop_sync(
     showui_max_pixels: int = 1344,
     showui_awq_4bit: bool = False,
     ui_tars_url: str = "",
-    lmstudio_base_url: str = ""
+    lmstudio_base_url: str = "",
+    image_codec: str | None = None,
+    prefetch_frames: bool = False,
+    changed_regions: bool = False,
+    display_backend: str | None = None,
+    pacing: str | None = None,
+    input_backend: str | None = None,
+    pipelined: bool = False,
+    trajectory_cache: bool = False,
+    screen_history: bool = False,
 ):
     """
     Synchronous agentic sampling loop for the assistant/tool interaction of computer use.
+
+    `image_codec` (e.g. "jpeg:85:1280", see tools/image_codec.py) overrides how screenshots
+    are encoded for API-based planners and actors; by default each provider uses its own codec.
+    `prefetch_frames` captures the screen on a background thread (see tools/capture_daemon.py)
+    so the planner gets a frame without waiting for a grab.
+    `changed_regions` makes API-based planners send the last full frame they sent plus
+    full-resolution crops of the regions that changed since (see tools/change_map.py).
+    `display_backend` ("native" or "synthetic", default $OOTB_DISPLAY_BACKEND) selects where
+    screenshots come from and where input goes; "synthetic" runs on a headless machine
+    (see tools/display_backend.py).
+    `pacing` ("fast", "human" or "safe", default $OOTB_PACING or "safe") sets the delays between
+    input events, drag durations and press holds (see tools/pacing.py).
+    `input_backend` ("pyautogui", "xdotool", "xtest", "uinput", "recording" or "null",
+    default $OOTB_INPUT_BACKEND) overrides where input goes (see tools/input_backend.py).
+    `pipelined` overlaps the stages of planner + actor steps: the settle wait's last sample is
+    the next screenshot and the next planner call runs while the step's messages are rendered
+    (see tools/pipeline.py).
+    `trajectory_cache` records the steps of successful runs by task and screen, and replays
+    them without model calls when the task runs again and the screen still matches pixel for
+    pixel; steps that type text are only recorded with $OOTB_TRAJECTORY_RECORD_TEXT=1
+    (see tools/trajectory_cache.py).
+    `screen_history` tells the planner when the last actions left the screen unchanged or it
+    is back to the screen of an earlier step (see ScreenHistory in tools/change_map.py).
     """
 
+    use_display_backend(display_backend)
+    if input_backend is not None:
+        use_input_backend(input_backend)
+    if pacing is not None:
+        set_pacing_profile(pacing)
+
     # ---------------------------
     # Initialize Planner
     # ---------------------------
@@ -126,6 +173,8 @@ def sampling_loop_sync(
             api_response_callback=api_response_callback,
             selected_screen=selected_screen,
             output_callback=output_callback,
+            image_codec=image_codec,
+            changed_regions=changed_regions,
         )
         loop_mode = "planner + actor"
 
@@ -140,6 +189,8 @@ def sampling_loop_sync(
             selected_screen=selected_screen,
             output_callback=output_callback,
             base_url="https://openrouter.ai/api/v1", # Explicitly pass OpenRouter base URL
+            image_codec=image_codec,
+            changed_regions=changed_regions,
         )
         loop_mode = "planner + actor"
 
@@ -173,6 +224,8 @@ def sampling_loop_sync(
             api_response_callback=api_response_callback,
             selected_screen=selected_screen,
             output_callback=output_callback,
+            image_codec=image_codec,
+            changed_regions=changed_regions,
         )
         loop_mode = "planner + actor"
     else:
@@ -220,7 +273,8 @@ def sampling_loop_sync(
             model_name="showui-2b", # Assuming LM Studio serves a model with this name
             output_callback=output_callback,
             selected_screen=selected_screen,
-            api_key="" # LM Studio typically doesn't require an API key for local setups
+            api_key="", # LM Studio typically doesn't require an API key for local setups
+            image_codec=image_codec,
         )
         executor = ShowUIExecutor(
             output_callback=output_callback,
@@ -234,7 +288,8 @@ def sampling_loop_sync(
             model_name="ui-tars-7b-dpo", # Assuming LM Studio serves a model with this name
             output_callback=output_callback,
             selected_screen=selected_screen,
-            api_key="" # LM Studio typically doesn't require an API key
+            api_key="", # LM Studio typically doesn't require an API key
+            image_codec=image_codec,
         )
         executor = ShowUIExecutor(
             output_callback=output_callback,
@@ -248,7 +303,8 @@ def sampling_loop_sync(
             model_name="ui-tars-2b-sft", # Assuming LM Studio serves a model with this name
             output_callback=output_callback,
             selected_screen=selected_screen,
-            api_key="" # LM Studio typically doesn't require an API key
+            api_key="", # LM Studio typically doesn't require an API key
+            image_codec=image_codec,
         )
         executor = ShowUIExecutor(
             output_callback=output_callback,
@@ -264,7 +320,8 @@ def sampling_loop_sync(
         actor = UITARS_Actor(
             ui_tars_url=ui_tars_url,
             output_callback=output_callback,
-            selected_screen=selected_screen
+            selected_screen=selected_screen,
+            image_codec=image_codec,
         )
         
         executor = ShowUIExecutor(
@@ -282,6 +339,11 @@ def sampling_loop_sync(
 
     tool_result_content = None
     showui_loop_count = 0
+
+    # Record this run's steps, and replay the ones recorded for the same task (see tools/trajectory_cache.py)
+    task = task_text(messages) if trajectory_cache else None
+    cache = shared_trajectory_cache if task else None
+    recorder = cache.start(task) if task else None
     
     logger.info(f"Start the message loop. User messages: {messages}")
 
@@ -290,18 +352,38 @@ def sampling_loop_sync(
         # Unified loop: 
         # 1) repeatedly call actor -> executor -> check tool_result -> maybe end
         # ------------------------------
+        step = 0
         while True:
-            # Call the actor with current messages
-            response = actor(messages=messages)
+            frame = capture_frame(selected_screen=selected_screen) if recorder is not None else None
+            if recorder is not None and cache.is_done(task, step, frame):
+                logger.info(f"Trajectory cache: {task!r} is done, as recorded.")
+                cache.commit(recorder, final_frame=frame)
+                return messages
+            cached = cache.lookup(task, step, frame) if recorder is not None else None
+
+            if cached is not None:
+                # Replay the recorded tool calls instead of calling the actor
+                recorder.replayed += 1
+                run = executor.replay(cached.actions, messages)
+            else:
+                # Call the actor with current messages
+                response = actor(messages=messages)
+                run = executor(response, messages)
 
             # Let the executor process that response, yielding any intermediate messages
-            for message, tool_result_content in executor(response, messages):
+            for message, tool_result_content in run:
                 yield message
 
             # If executor didn't produce further content, we're done
             if not tool_result_content:
+                if recorder is not None:
+                    cache.commit(recorder, final_frame=frame)
                 return messages
 
+            if recorder is not None:
+                recorder.record(frame, executor.last_tool_calls)
+            step += 1
+
             # If there is more tool content, treat that as user input
             messages.append({
                 "content": tool_result_content,
@@ -316,59 +398,144 @@ def sampling_loop_sync(
         # 3) Otherwise actor => executor
         # 4) repeat
         # ------------------------------------------------------
-        while True:
-            # Step 1: Planner (VLM) response
-            vlm_response = planner(messages=messages)
-
-            # Step 2: Extract the "Next Action" from the planner output
-            next_action = json.loads(vlm_response).get("Next Action")
-
-            # Yield the next_action string, in case the UI or logs want to show it
-            yield next_action
-
-            # Step 3: Check if there are no further actions
-            if not next_action or next_action in ("None", ""):
-                final_sc, final_sc_path = get_screenshot(selected_screen=selected_screen)
-                final_image_b64 = encode_image(str(final_sc_path))
-
-                output_callback(
-                    (
-                        f"No more actions from {colorful_text_vlm}. End of task. Final State:\n"
-                        f'<img src="data:image/png;base64,{final_image_b64}">'
-                    ),
-                    sender="bot"
+        # Optionally prefetch frames on a background thread so capture is off the critical path
+        capture_daemon = CaptureDaemon(selected_screen=selected_screen).start() if prefetch_frames else None
+        # Optionally overlap the next planner call with rendering and reuse the settled frame
+        pipeline = StepPipeline(selected_screen=selected_screen) if pipelined else None
+        if pipeline is not None:
+            # the planner runs on the pipeline's worker: its UI callbacks run on this thread, in order
+            planner.output_callback = pipeline.defer(planner.output_callback)
+            planner.api_response_callback = pipeline.defer(planner.api_response_callback)
+        last_action_end = None
+        planned = None  # next planner call, already submitted by the pipeline
+        frame = None  # next step's frame, when the pipeline already took it
+        screens = ScreenHistory() if screen_history else None
+
+        def note_screen(frame: Frame):
+            # tell the planner when the screen repeats an earlier step's, before it plans this step
+            note = screens.note(frame, showui_loop_count) if screens is not None else None
+            if note:
+                messages.append({"role": "user", "content": [note]})
+
+        try:
+            while True:
+                # Step 0: Capture this step's screen once; planner, actor and UI share its encodings
+                if frame is None:
+                    if capture_daemon is not None:
+                        # freshest prefetched frame taken after the last action finished settling
+                        frame = capture_daemon.latest(newer_than=last_action_end)
+                    else:
+                        frame = capture_frame(selected_screen=selected_screen)
+                    note_screen(frame)
+
+                done = recorder is not None and cache.is_done(task, showui_loop_count, frame)
+                cached = cache.lookup(task, showui_loop_count, frame) if recorder is not None and not done else None
+
+                if cached is None:
+                    if done:
+                        # the recorded run ended on this screen
+                        next_action = None
+                    else:
+                        # Step 1: Planner (VLM) response, already running if the pipeline submitted it
+                        if planned is not None:
+                            vlm_response = pipeline.result(planned)
+                            planned = None
+                        else:
+                            vlm_response = planner(messages=messages, frame=frame)
+
+                        # Step 2: Extract the "Next Action" from the planner output
+                        next_action = json.loads(vlm_response).get("Next Action")
+
+                        # Yield the next_action string, in case the UI or logs want to show it
+                        yield next_action
+
+                    # Step 3: Check if there are no further actions
+                    if not next_action or next_action in ("None", ""):
+                        if recorder is not None:
+                            cache.commit(recorder, final_frame=frame)
+
+                        # nothing was executed since this step's capture, so it is the final state
+                        final_image_b64 = frame.base64
+
+                        output_callback(
+                            (
+                                f"No more actions from {colorful_text_vlm}. End of task. Final State:\n"
+                                f'<img src="data:image/png;base64,{final_image_b64}">'
+                            ),
+                            sender="bot"
+                        )
+                        yield None
+                        break
+
+                    # Step 4: Output an action message
+                    output_callback(
+                        f"{colorful_text_vlm} sending action to {colorful_text_showui}:\n{next_action}",
+                        sender="bot"
+                    )
+
+                    # Step 5: Actor response
+                    actor_response = actor(messages=next_action, frame=frame)
+                    yield actor_response
+
+                    run = executor(actor_response, messages)
+                    history = [
+                        "History plan:" + str(json.loads(vlm_response)),
+                        "History actions:" + str(actor_response["content"])
+                    ]
+                else:
+                    # Steps 1-5 replayed from the trajectory cache, the screen matches the recording
+                    recorder.replayed += 1
+                    output_callback(f"Replaying recorded step {showui_loop_count + 1}:\n{cached.actions}", sender="bot")
+                    yield str(cached.actions)
+
+                    run = executor.replay(cached.actions, messages)
+                    history = cached.history
+
+                # Step 6: Execute the actions (the executor waits for the screen to settle after each action)
+                action_start = time.time()
+                if pipeline is None:
+                    for message, tool_result_content in run:
+                        yield message
+                else:
+                    # rendered below, while the next planner call runs
+                    pending_messages = [message for message, tool_result_content in run]
+                last_action_end = time.time()
+
+                # Step 7: Update conversation with embedding history of plan and actions
+                messages.append({
+                    "role": "user",
+                    "content": history
+                })
+                if recorder is not None and executor.last_parse_error is None:
+                    # a step whose actions could not be parsed did nothing, it is not replayed
+                    recorder.record(frame, executor.last_actions, history)
+
+                # Increment loop counter
+                showui_loop_count += 1
+                frame = None
+
+                if pipeline is not None:
+                    # Steps 0 and 1 of the next step: the settled frame and a background planner call
+                    if capture_daemon is not None:
+                        frame = capture_daemon.latest(newer_than=last_action_end)
+                    else:
+                        frame = pipeline.next_frame(since=action_start)
+                    note_screen(frame)
+                    if recorder is None or not (cache.is_done(task, showui_loop_count, frame)
+                                                or cache.lookup(task, showui_loop_count, frame)):
+                        planned = pipeline.submit("plan", planner, messages=messages, frame=frame)
+                    render_start = time.perf_counter()
+                    for message in pending_messages:
+                        yield message
+                    pipeline.record("render", time.perf_counter() - render_start)
+
+                logger.info(
+                    f"End of loop. Total cost: $USD{planner.total_cost:.5f}"
                 )
-                yield None
-                break
-
-            # Step 4: Output an action message
-            output_callback(
-                f"{colorful_text_vlm} sending action to {colorful_text_showui}:\n{next_action}",
-                sender="bot"
-            )
-
-            # Step 5: Actor response
-            actor_response = actor(messages=next_action)
-            yield actor_response
-
-            # Step 6: Execute the actor response
-            for message, tool_result_content in executor(actor_response, messages):
-                time.sleep(0.5)  # optional small delay
-                yield message
-
-            # Step 7: Update conversation with embedding history of plan and actions
-            messages.append({
-                "role": "user",
-                "content": [
-                    "History plan:" + str(json.loads(vlm_response)),
-                    "History actions:" + str(actor_response["content"])
-                ]
-            })
-
-            logger.info(
-                f"End of loop. Total cost: $USD{planner.total_cost:.5f}"
-            )
-
-
-            # Increment loop counter
-            showui_loop_count += 1
+        finally:
+            if capture_daemon is not None:
+                capture_daemon.stop()
+            if pipeline is not None:
+                pipeline.close()
+                logger.info(f"Pipeline timings:\n{pipeline.format()}")
+            logger.info(f"Action timings:\n{action_telemetry.format()}")
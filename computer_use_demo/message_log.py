@@ -0,0 +1,206 @@
+"""
+Conversation log with O(1) duplicate detection.
+
+The executors only append a message if it is not already in the conversation. With a
+plain list `message in messages` compares it, by deep dict/pydantic equality, to every
+earlier message including their base64 image payloads. `MessageLog` is a list of
+`BetaMessageParam` that also gives every message a stable id and indexes messages by a
+fingerprint of their content, so membership tests and `append_unique` only compare
+against the messages with the same fingerprint.
+
+Fingerprints are taken when a message is added; after editing messages in place (e.g.
+dropping old screenshots) call `reindex()`. Copies, deep copies and pickles keep the ids.
+"""
+from collections.abc import Iterable
+from typing import Any
+
+
+def message_fingerprint(message: Any) -> int:
+    """Hash of a message's content; equal messages have equal fingerprints."""
+    return hash(_freeze(message))
+
+
+def _freeze(value: Any) -> Any:
+    # a hashable copy of the structure; strings are kept as is, Python caches their hash,
+    # so re-fingerprinting a message does not re-read its base64 payloads
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return value
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if hasattr(value, "model_dump"):  # pydantic blocks, e.g. BetaTextBlock
+        return (type(value).__name__, _freeze(value.model_dump()))
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+class MessageLog(list):
+    """A list of messages with stable ids and a fingerprint index."""
+
+    def __init__(self, messages: Iterable = (), ids: Iterable[int] | None = None, next_id: int = 0):
+        super().__init__(messages)
+        self._ids: list[int] = list(ids) if ids is not None else list(range(next_id, next_id + len(self)))
+        self._next_id = max(next_id, max(self._ids, default=-1) + 1)
+        self._index: dict[int, list[int]] | None = None  # fingerprint -> ids, built lazily
+        self._positions: dict[int, int] | None = None  # id -> index in the list
+
+    # ---- index ----
+
+    def reindex(self):
+        """Rebuild the fingerprint index, e.g. after messages were edited in place."""
+        self._index = {}
+        for message_id, message in zip(self._ids, self):
+            self._index.setdefault(message_fingerprint(message), []).append(message_id)
+        self._positions = None
+
+    def _ensure_index(self) -> dict[int, list[int]]:
+        if self._index is None:
+            self.reindex()
+        return self._index
+
+    def _position(self, message_id: int) -> int:
+        if self._positions is None:
+            self._positions = {message_id: i for i, message_id in enumerate(self._ids)}
+        return self._positions[message_id]
+
+    def _invalidate(self):
+        # arbitrary mutation: drop the index, rebuild it on the next lookup
+        self._index = None
+        self._positions = None
+
+    def _find(self, message: Any, fingerprint: int) -> int | None:
+        for message_id in self._ensure_index().get(fingerprint, ()):
+            if list.__getitem__(self, self._position(message_id)) == message:
+                return message_id
+        return None
+
+    # ---- ids ----
+
+    @property
+    def ids(self) -> list[int]:
+        """Stable ids of the messages, in order."""
+        return list(self._ids)
+
+    def id_of(self, index: int) -> int:
+        return self._ids[index]
+
+    def by_id(self, message_id: int) -> Any:
+        return list.__getitem__(self, self._position(message_id))
+
+    def find(self, message: Any) -> int | None:
+        """Id of a message equal to `message`, or None."""
+        return self._find(message, message_fingerprint(message))
+
+    # ---- appending ----
+
+    def append(self, message: Any):
+        self._add(message, message_fingerprint(message) if self._index is not None else None)
+
+    def _add(self, message: Any, fingerprint: int | None) -> int:
+        message_id = self._next_id
+        self._next_id += 1
+        super().append(message)
+        self._ids.append(message_id)
+        if self._index is not None and fingerprint is not None:
+            self._index.setdefault(fingerprint, []).append(message_id)
+        if self._positions is not None:
+            self._positions[message_id] = len(self) - 1
+        return message_id
+
+    def append_unique(self, message: Any) -> bool:
+        """Append `message` unless an equal message is already logged; returns whether it was appended."""
+        fingerprint = message_fingerprint(message)
+        if self._find(message, fingerprint) is not None:
+            return False
+        self._add(message, fingerprint)
+        return True
+
+    def extend(self, messages: Iterable):
+        for message in messages:
+            self.append(message)
+
+    def __iadd__(self, messages: Iterable):
+        self.extend(messages)
+        return self
+
+    def __contains__(self, message: Any) -> bool:
+        return self.find(message) is not None
+
+    # ---- other mutations keep ids aligned and rebuild the index lazily ----
+
+    def insert(self, index: int, message: Any):
+        index = max(0, min(len(self), index if index >= 0 else len(self) + index))
+        super().insert(index, message)
+        self._ids.insert(index, self._next_id)
+        self._next_id += 1
+        self._invalidate()
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = list(value)
+            resized = len(self._ids[index]) != len(value)
+            super().__setitem__(index, value)
+            if resized:
+                # the new messages get new ids
+                self._ids[index] = range(self._next_id, self._next_id + len(value))
+                self._next_id += len(value)
+        else:
+            super().__setitem__(index, value)
+        self._invalidate()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        del self._ids[index]
+        self._invalidate()
+
+    def pop(self, index: int = -1) -> Any:
+        message = super().pop(index)
+        del self._ids[index]
+        self._invalidate()
+        return message
+
+    def remove(self, message: Any):
+        del self[self.index(message)]
+
+    def clear(self):
+        super().clear()
+        self._ids.clear()
+        self._invalidate()
+
+    def sort(self, *args, **kwargs):
+        raise TypeError("A MessageLog keeps the conversation order and cannot be sorted")
+
+    def reverse(self):
+        raise TypeError("A MessageLog keeps the conversation order and cannot be reversed")
+
+    def __imul__(self, n):
+        raise TypeError("A MessageLog cannot be repeated")
+
+    # ---- copying ----
+
+    def copy(self) -> "MessageLog":
+        return MessageLog(self, self._ids, self._next_id)
+
+    def __copy__(self) -> "MessageLog":
+        return self.copy()
+
+    def __reduce__(self):
+        # deepcopy and pickle rebuild from the messages and ids; the index is rebuilt lazily
+        return (MessageLog, (list(self), list(self._ids), self._next_id))
+
+    def __repr__(self):
+        return f"MessageLog({list.__repr__(self)})"
+
+
+def append_unique(messages: list, message: Any) -> bool:
+    """Append `message` unless it is already in `messages`; O(1) for a MessageLog."""
+    if isinstance(messages, MessageLog):
+        return messages.append_unique(message)
+    if message in messages:
+        return False
+    messages.append(message)
+    return True
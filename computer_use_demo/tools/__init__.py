@@ -3,14 +3,20 @@ from .bash import BashTool
 from .collection import ToolCollection
 from .computer import ComputerTool
 from .edit import EditTool
-from .screen_capture import get_screenshot
+from .frame import Frame
+from .frame_store import FrameStore, frame_store
+from .screen_capture import capture_frame, get_screenshot
 
 __ALL__ = [
     BashTool,
     CLIResult,
     ComputerTool,
     EditTool,
+    Frame,
+    FrameStore,
     ToolCollection,
     ToolResult,
+    capture_frame,
+    frame_store,
     get_screenshot,
 ]
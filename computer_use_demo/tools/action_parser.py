@@ -0,0 +1,467 @@
+"""
+Parser for the actions the ShowUI-style actors return.
+
+The actors answer with one action dict, several comma-separated dicts or a list of them,
+quoted as Python literals or as JSON, e.g.
+
+    {'action': 'CLICK', 'value': None, 'position': [0.49, 0.42]}, {'action': 'ENTER', 'value': None, 'position': None}
+
+`parse_actions` tokenizes the text with one compiled pattern and parses it with a small
+recursive-descent parser into `ShowUIAction` records. The cost is linear in the length of
+the text (nesting is capped at `MAX_DEPTH`), and any malformed input raises
+`ActionParseError` with the offset of the problem instead of returning None.
+
+`parse_ui_tars_actions` parses UI-TARS function-call output (every action of a response)
+into the same records.
+
+Run the module to fuzz the parsers and compare them with `ast.literal_eval`.
+"""
+import ast
+import re
+from dataclasses import dataclass
+from typing import Any
+
+
+MAX_DEPTH = 8  # an action list nests at most [ { [ [ ] ] } ]
+
+Point = tuple[float, float]
+
+# one token per match, whitespace skipped; anything else is a single-character token the parser rejects
+_TOKEN = re.compile(r"""
+    \s*(
+        '[^'\\]*(?:\\.[^'\\]*)*'            # 'string'
+      | "[^"\\]*(?:\\.[^"\\]*)*"            # "string"
+      | -?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?  # number
+      | [A-Za-z_]\w*                     # None, null, True, ...
+      | \S                               # punctuation, or a stray character
+    )
+""", re.VERBOSE | re.DOTALL)
+
+_NAMES = {"None": None, "null": None, "True": True, "true": True, "False": False, "false": False}
+_CLOSING = {"[": "]", "(": ")"}
+_FENCE = re.compile(r"^\s*```[\w-]*\s*|\s*```\s*$")
+
+
+class ActionParseError(ValueError):
+    """The actor output is not a valid action list; `offset` is where parsing failed, if known."""
+
+    def __init__(self, message: str, text: str = "", offset: int | None = None):
+        self.message = message
+        self.text = text
+        self.offset = offset
+        if offset is not None:
+            message = f"{message} at offset {offset}: {text[max(0, offset - 20):offset + 20]!r}"
+        super().__init__(message)
+
+
+@dataclass(frozen=True)
+class ShowUIAction:
+    action: str  # upper case, e.g. "CLICK"
+    value: str | None = None
+    position: Point | tuple[Point, Point] | None = None  # [x, y], or [[x1, y1], [x2, y2]] for a start and end
+
+    def as_dict(self) -> dict[str, Any]:
+        """The action in the actors' dict format."""
+        position = self.position
+        if position is not None:
+            position = [list(p) for p in position] if isinstance(position[0], tuple) else list(position)
+        return {"action": self.action, "value": self.value, "position": position}
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens: list[str] = _TOKEN.findall(text)
+        self.i = 0
+
+    def error(self, message: str, i: int | None = None) -> ActionParseError:
+        # token offsets are only needed here, so only the error path pays for them
+        i = self.i if i is None else i
+        offsets = [m.start(1) for m in _TOKEN.finditer(self.text)]
+        return ActionParseError(message, self.text, offsets[i] if i < len(offsets) else len(self.text))
+
+    def peek(self) -> str | None:
+        return self.tokens[self.i] if self.i < len(self.tokens) else None
+
+    def expect(self, token: str):
+        if self.peek() != token:
+            raise self.error(f"expected {token!r}")
+        self.i += 1
+
+    def value(self, depth: int = 0) -> Any:
+        if depth > MAX_DEPTH:
+            raise self.error("too deeply nested")
+        if self.i >= len(self.tokens):
+            raise self.error("unexpected end of input")
+        token = self.tokens[self.i]
+        self.i += 1
+        first = token[0]
+        if first == "'" or first == '"':
+            return self.string(token)
+        if first == "{":
+            return self.dict(depth)
+        if first == "[" or first == "(":
+            return self.sequence(_CLOSING[first], depth)
+        if first.isdigit() or first in "-.":
+            try:
+                return int(token) if token.lstrip("-").isdigit() else float(token)
+            except ValueError:
+                raise self.error(f"unexpected {token!r}", self.i - 1) from None
+        if token in _NAMES:
+            return _NAMES[token]
+        raise self.error(f"unexpected {token!r}", self.i - 1)
+
+    def string(self, token: str) -> str:
+        if len(token) < 2:
+            raise self.error("unterminated string", self.i - 1)
+        if "\\" not in token:
+            return token[1:-1]
+        try:
+            return ast.literal_eval(token)  # escapes are rare, let Python decode them
+        except (ValueError, SyntaxError):
+            raise self.error("invalid escape in string", self.i - 1) from None
+
+    def dict(self, depth: int) -> dict:
+        result = {}
+        while self.peek() != "}":
+            if self.i < len(self.tokens) and self.tokens[self.i][0] not in "'\"":
+                raise self.error("expected a quoted key")
+            key = self.value(depth + 1)
+            self.expect(":")
+            result[key] = self.value(depth + 1)
+            if self.peek() != ",":
+                break
+            self.i += 1
+        self.expect("}")
+        return result
+
+    def sequence(self, closing: str, depth: int) -> list:
+        result = []
+        while self.peek() != closing:
+            result.append(self.value(depth + 1))
+            if self.peek() != ",":
+                break
+            self.i += 1
+        self.expect(closing)
+        return result
+
+    def items(self) -> list:
+        """The top level: values separated by commas, e.g. `{...}, {...}`."""
+        values = [self.value()]
+        while self.peek() == ",":
+            self.i += 1
+            if self.peek() is None:
+                break  # trailing comma
+            values.append(self.value())
+        if self.i < len(self.tokens):
+            raise self.error("unexpected text after the actions")
+        return values
+
+
+def parse_literal(text: str) -> Any:
+    """Parse one Python- or JSON-quoted literal made of dicts, lists, strings, numbers and None."""
+    parser = _Parser(text)
+    items = parser.items()
+    if len(items) != 1:
+        raise ActionParseError("expected a single value", text)
+    return items[0]
+
+
+def parse_actor_response(response: str | dict) -> dict[str, Any]:
+    """The actor's response dict (`{'content': ..., 'role': 'assistant'}`), parsing it if it was stringified."""
+    if isinstance(response, dict):
+        return response
+    if not isinstance(response, str):
+        raise ActionParseError(f"expected a response dict or string, got {type(response).__name__}")
+    parsed = parse_literal(response)
+    if not isinstance(parsed, dict) or "content" not in parsed:
+        raise ActionParseError("the response has no 'content'", response)
+    return parsed
+
+
+def parse_actions(output: str | dict | list) -> list[ShowUIAction]:
+    """Parse actor output (text, or an already decoded dict or list of dicts) into action records."""
+    if isinstance(output, str):
+        text = _FENCE.sub("", output) if "```" in output else output
+        start = _first_bracket(text)
+        items = _Parser(text[start:]).items()
+        if len(items) == 1 and isinstance(items[0], list):
+            items = items[0]
+    elif isinstance(output, dict):
+        text, items = str(output), [output]
+    elif isinstance(output, list):
+        text, items = str(output), output
+    else:
+        raise ActionParseError(f"expected actor output text, got {type(output).__name__}")
+    if not items:
+        raise ActionParseError("no actions", text)
+    return [_action(item, text) for item in items]
+
+
+def _first_bracket(text: str) -> int:
+    # skip any prose before the actions ("Here is the next action: {...}")
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ActionParseError("no action dict in the output", text, 0)
+    return min(starts)
+
+
+def _action(item: Any, text: str) -> ShowUIAction:
+    if not isinstance(item, dict):
+        raise ActionParseError(f"expected an action dict, got {item!r}", text)
+    action = item.get("action")
+    if not isinstance(action, str) or not action:
+        raise ActionParseError(f"action dict without an action name: {item!r}", text)
+    value = item.get("value")
+    if value is not None and not isinstance(value, str):
+        value = str(value)
+    return ShowUIAction(action.upper(), value, _position(item.get("position"), item, text))
+
+
+def _position(position: Any, item: dict, text: str) -> Point | tuple[Point, Point] | None:
+    if position is None or position == []:
+        return None
+    if _is_point(position):
+        return (float(position[0]), float(position[1]))
+    if isinstance(position, list) and len(position) == 2 and all(_is_point(p) for p in position):
+        return tuple((float(p[0]), float(p[1])) for p in position)
+    raise ActionParseError(f"position must be [x, y] or [[x1, y1], [x2, y2]]: {item!r}", text)
+
+
+def _is_point(value: Any) -> bool:
+    return (isinstance(value, list) and len(value) == 2
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value))
+
+
+# ---- UI-TARS ----
+#
+# UI-TARS answers in function-call syntax, optionally after a "Thought:", with one or more
+# actions after "Action:", each on its own line and possibly with its own "Action:", e.g.
+#
+#     Thought: ...
+#     Action: click(start_box='<|box_start|>(153,97)<|box_end|>')
+#     Action: type(content='hello\n')
+#
+# Boxes are points (x, y) or boxes (x1, y1, x2, y2) in [0, 1000) relative coordinates.
+
+UI_TARS_COORDINATE_SCALE = 1000
+
+_UI_TARS_STRING = r"'[^'\\]*(?:\\.[^'\\]*)*'|\"[^\"\\]*(?:\\.[^\"\\]*)*\""
+# each part of a call has a single way to match, so a malformed call fails in linear time
+_UI_TARS_CALL = re.compile(rf"""
+    \b(?P<name>[A-Za-z_]\w*)\s*\(\s*
+    (?P<args>(?:\w+\s*=\s*(?:{_UI_TARS_STRING})\s*(?:,\s*)?)*)
+    \)
+""", re.VERBOSE)
+_UI_TARS_ARG = re.compile(rf"(\w+)\s*=\s*({_UI_TARS_STRING})")
+_UI_TARS_ACTION_SECTION = re.compile(r"^\s*Action\s*:", re.IGNORECASE | re.MULTILINE)
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+# allowed between actions: separators and "Action:" headers
+_UI_TARS_SEPARATOR = re.compile(r"(?:[\s,;`]|Action\s*:)*", re.IGNORECASE)
+_KEY_SEPARATOR = re.compile(r"[\s+]+")
+
+# UI-TARS function -> ShowUI action name
+UI_TARS_ACTIONS = {
+    "click": "CLICK",
+    "left_single": "CLICK",
+    "left_double": "DOUBLE_CLICK",
+    "double_click": "DOUBLE_CLICK",
+    "right_single": "RIGHT_CLICK",
+    "right_click": "RIGHT_CLICK",
+    "drag": "DRAG",
+    "left_drag": "DRAG",
+    "select": "DRAG",
+    "hotkey": "HOTKEY",
+    "press": "HOTKEY",
+    "type": "INPUT",
+    "scroll": "SCROLL",
+    "wait": "WAIT",
+    "finished": "STOP",
+    "call_user": "STOP",
+}
+_UI_TARS_KEYS = {"arrowup": "up", "arrowdown": "down", "arrowleft": "left", "arrowright": "right",
+                 "escape": "esc", "return": "enter", "control": "ctrl", "space": "space"}
+
+
+def parse_ui_tars_actions(text: str, scale: float = UI_TARS_COORDINATE_SCALE) -> list[ShowUIAction]:
+    """
+    Every action of a UI-TARS response, in order, as ShowUI action records with positions
+    normalized to [0, 1] (divided by `scale`). Raises ActionParseError if there is no action
+    or an action is unknown or malformed; text between the actions other than whitespace and
+    separators is malformed too, so a broken call is never skipped.
+    """
+    if not isinstance(text, str):
+        raise ActionParseError(f"expected UI-TARS output text, got {type(text).__name__}")
+    # the actions follow "Action:"; a "Thought:" before it may mention calls too
+    section = _UI_TARS_ACTION_SECTION.search(text)
+    start = section.end() if section else 0
+    actions = []
+    for match in _UI_TARS_CALL.finditer(text, start):
+        _check_ui_tars_gap(text, start, match.start())
+        start = match.end()
+        name = match["name"]
+        if name not in UI_TARS_ACTIONS:
+            raise ActionParseError(f"unknown UI-TARS action {name!r}", text, match.start())
+        args = {key: _ui_tars_string(value, text, match.start()) for key, value in _UI_TARS_ARG.findall(match["args"])}
+        actions.append(_ui_tars_action(UI_TARS_ACTIONS[name], args, scale, text, match.start()))
+    if not actions:
+        raise ActionParseError("no UI-TARS action in the output", text, start)
+    _check_ui_tars_gap(text, start, len(text))
+    return actions
+
+
+def _check_ui_tars_gap(text: str, start: int, end: int):
+    gap = _UI_TARS_SEPARATOR.match(text, start, end)
+    if gap.end() != end:
+        raise ActionParseError("malformed UI-TARS action", text, gap.end())
+
+
+def _ui_tars_string(token: str, text: str, offset: int) -> str:
+    if "\\" not in token:
+        return token[1:-1]
+    try:
+        return ast.literal_eval(token)
+    except (ValueError, SyntaxError):
+        raise ActionParseError("invalid escape in string", text, offset) from None
+
+
+def _ui_tars_action(action: str, args: dict[str, str], scale: float, text: str, offset: int) -> ShowUIAction:
+    def box(key: str) -> Point:
+        if key not in args:
+            raise ActionParseError(f"{action} needs {key}", text, offset)
+        numbers = [float(n) for n in _NUMBER.findall(args[key])]
+        if len(numbers) == 4:  # a box: click its center
+            numbers = [(numbers[0] + numbers[2]) / 2, (numbers[1] + numbers[3]) / 2]
+        elif len(numbers) != 2:
+            raise ActionParseError(f"{key} must be (x, y) or (x1, y1, x2, y2): {args[key]!r}", text, offset)
+        return (numbers[0] / scale, numbers[1] / scale)
+
+    if action in ("CLICK", "DOUBLE_CLICK", "RIGHT_CLICK"):
+        return ShowUIAction(action, None, box("start_box"))
+    if action == "DRAG":
+        return ShowUIAction(action, None, (box("start_box"), box("end_box")))
+    if action == "HOTKEY":
+        keys = [_UI_TARS_KEYS.get(key, key) for key in _KEY_SEPARATOR.split(args.get("key", "").strip().lower()) if key]
+        if not keys:
+            raise ActionParseError("hotkey needs a key", text, offset)
+        if keys == ["enter"]:
+            return ShowUIAction("ENTER")
+        if keys == ["esc"]:
+            return ShowUIAction("ESC")
+        return ShowUIAction(action, "+".join(keys))
+    if action == "INPUT":
+        return ShowUIAction(action, args.get("content", ""))
+    if action == "SCROLL":
+        direction = args.get("direction", "down").strip().lower()
+        if direction not in ("up", "down", "left", "right"):
+            raise ActionParseError(f"unknown scroll direction {direction!r}", text, offset)
+        return ShowUIAction(action, direction, box("start_box") if "start_box" in args else None)
+    return ShowUIAction(action)  # WAIT, STOP
+
+
+# Outputs seen from ShowUI, the ShowUI API actor and the UI-TARS conversion
+SAMPLE_OUTPUTS = [
+    "{'action': 'CLICK', 'value': None, 'position': [0.49, 0.18]}",
+    "{'action': 'CLICK', 'value': None, 'position': [0.49, 0.42]}, {'action': 'INPUT', 'value': 'weather for New York city', 'position': [0.49, 0.42]}, {'action': 'ENTER', 'value': None, 'position': None}",
+    "[{'action': 'SCROLL', 'value': 'down', 'position': None}]",
+    '{"action": "INPUT", "value": "it\'s \\"quoted\\"", "position": [0.1, 0.9]}',
+    '{"action": "CLICK", "value": null, "position": [153, 97]}',
+    "{'action': 'press', 'value': None, 'position': [0.5, 0.5]}",
+    "{'action': 'ESC', 'value': None, 'position': None}",
+    "{'action': 'INPUT', 'value': 'café \\n 2', 'position': [1e-1, .5]}",
+    "```json\n[{\"action\": \"ENTER\", \"value\": null, \"position\": null}]\n```",
+    "Next action: {'action': 'HOVER', 'value': None, 'position': [[0.1, 0.2], [0.3, 0.4]]}",
+]
+
+UI_TARS_SAMPLE_OUTPUTS = [
+    "Action: click(start_box='(153,97)')",
+    "Thought: The search box is at the top.\nAction: click(start_box='<|box_start|>(512,40)<|box_end|>')\n\ntype(content='weather\\n')",
+    "left_double(start_box='[100, 200, 140, 220]')\nhotkey(key='ctrl c')",
+    "Action: drag(start_box='(10,10)', end_box='(500,500)')",
+    "Action: scroll(start_box='(500,500)', direction='down')\nwait()\nfinished()",
+    "Action: right_single(start_box='(1,2)')\nhotkey(key='Enter')\ntype(content=\"it's (done)\")",
+    "Thought: Fill in the name.\nAction: click(start_box='(300,420)')\nAction: type(content='x')\naction: hotkey(key='enter')",
+]
+
+# Must be rejected as a whole: parsing only the well-formed calls would type into the wrong field
+UI_TARS_MALFORMED_OUTPUTS = [
+    "Action: click(start_box=(1,2))\ntype(content='x')",
+    "Action: type(content='x')\nclick(start_box='(1,2)'",
+    "Action: click(start_box='(1,2)') and then type(content='x')",
+]
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    def literal_eval_actions(text: str) -> list[dict]:
+        # the parsing this module replaces
+        text = text.strip()
+        if text.startswith("{") and text.endswith("}"):
+            text = f"[{text}]"
+        parsed = ast.literal_eval(text)
+        return parsed if isinstance(parsed, list) else [parsed]
+
+    # 1. agreement with ast.literal_eval where both apply
+    for sample in SAMPLE_OUTPUTS:
+        actions = parse_actions(sample)
+        print(f"{len(actions)} actions <- {sample[:60]!r}")
+        try:
+            expected = literal_eval_actions(sample)
+        except (ValueError, SyntaxError):
+            continue
+        assert [a.action for a in actions] == [e["action"].upper() for e in expected], sample
+        assert [a.value for a in actions] == [e["value"] for e in expected], sample
+
+    for sample in UI_TARS_SAMPLE_OUTPUTS:
+        parse_ui_tars_actions(sample)
+    for sample in UI_TARS_MALFORMED_OUTPUTS:
+        try:
+            parse_ui_tars_actions(sample)
+        except ActionParseError as e:
+            print(f"rejected: {e}")
+        else:
+            raise AssertionError(f"accepted malformed UI-TARS output {sample!r}")
+
+    # 2. fuzzing: mutated samples parse or raise ActionParseError, never anything else
+    rng = random.Random(0)
+    alphabet = "{}[](),:=<|>'\"\\ .-0123456789eNonenullCLICKactionclickbox_"
+    for parse, samples, extra in [
+        (parse_actions, SAMPLE_OUTPUTS, ["", "[" * 10000, "{'action': 'CLICK'" * 1000, "\\", "'", "{'a': 1} x", "null", "[]"]),
+        (parse_ui_tars_actions, UI_TARS_SAMPLE_OUTPUTS, ["", "click(" * 10000, "Action:", "wait(", "type(content='\\')", *UI_TARS_MALFORMED_OUTPUTS]),
+    ]:
+        parsed = failed = 0
+        mutated = []
+        for _ in range(20000):
+            chars = list(rng.choice(samples))
+            for _ in range(rng.randint(1, 4)):
+                i = rng.randrange(len(chars) + 1)
+                op = rng.random()
+                if op < 0.4 and i < len(chars):
+                    del chars[i]
+                elif op < 0.8:
+                    chars.insert(i, rng.choice(alphabet))
+                else:
+                    chars = chars[:i]
+            mutated.append("".join(chars))
+        for text in mutated + extra:
+            try:
+                parse(text)
+                parsed += 1
+            except ActionParseError:
+                failed += 1
+        print(f"fuzz {parse.__name__}: {parsed} parsed, {failed} rejected with ActionParseError")
+
+    # 3. micro-benchmark
+    n = 20000
+    sample = SAMPLE_OUTPUTS[1]
+    for name, parse in [("parse_actions", parse_actions), ("ast.literal_eval", literal_eval_actions)]:
+        start = time.perf_counter()
+        for _ in range(n):
+            parse(sample)
+        print(f"{name}: {(time.perf_counter() - start) / n * 1e6:.1f} us per 3-action output")
+    start = time.perf_counter()
+    for _ in range(n):
+        parse_ui_tars_actions(UI_TARS_SAMPLE_OUTPUTS[4])
+    print(f"parse_ui_tars_actions: {(time.perf_counter() - start) / n * 1e6:.1f} us per 3-action output")
@@ -1,4 +1,5 @@
 import asyncio
+import codecs
 import os
 from typing import ClassVar, Literal
 
@@ -21,6 +22,8 @@ class _BashSession:
     def __init__(self):
         self._started = False
         self._timed_out = False
+        self._stderr_chunks: asyncio.Queue[str] = asyncio.Queue()
+        self._stderr_reader: asyncio.Task | None = None
 
     async def start(self):
         if self._started:
@@ -28,18 +31,28 @@ class _BashSession:
 
         self._process = await asyncio.create_subprocess_shell(
             self.command,
-            shell=False,
             stdin=asyncio.subprocess.PIPE,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
         )
+        # drain stderr all the time, a full pipe would block the shell while we read stdout
+        self._stderr_reader = asyncio.create_task(self._read_stderr())
 
         self._started = True
 
+    async def _read_stderr(self):
+        assert self._process.stderr
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        # chunks, not lines: stderr may hold long lines without a newline
+        while data := await self._process.stderr.read(65536):
+            self._stderr_chunks.put_nowait(decoder.decode(data))
+
     def stop(self):
         """Terminate the bash shell."""
         if not self._started:
             raise ToolError("Session has not started.")
+        if self._stderr_reader is not None:
+            self._stderr_reader.cancel()
         if self._process.returncode is not None:
             return
         self._process.terminate()
@@ -63,34 +76,44 @@ class _BashSession:
         assert self._process.stdout
         assert self._process.stderr
 
-        # send command to the process
+        # send command to the process; the sentinel also ends its stderr
         self._process.stdin.write(
-            command.encode() + f"; echo '{self._sentinel}'\n".encode()
+            command.encode() + f"; echo '{self._sentinel}'; echo '{self._sentinel}' >&2\n".encode()
         )
         await self._process.stdin.drain()
 
         # read output from the process, until the sentinel is found
         output = ""
+        error = ""
         try:
             async with asyncio.timeout(self._timeout):
                 while True:
                     await asyncio.sleep(self._output_delay)
                     data = await self._process.stdout.readline()
                     if not data:
-                        break
+                        break  # the shell exited, its stderr sentinel will not come
                     line = data.decode()
                     output += line
                     if self._sentinel in line:
                         output = output.replace(self._sentinel, "")
                         break
+                # and the stderr collected by the reader, up to the stderr sentinel
+                while data:
+                    chunk = await self._stderr_chunks.get()
+                    error += chunk
+                    # the sentinel may be split across chunks
+                    if self._sentinel in error[-len(chunk) - len(self._sentinel):]:
+                        error = error.replace(self._sentinel, "")
+                        break
         except asyncio.TimeoutError:
             self._timed_out = True
             raise ToolError(
                 f"timed out: bash has not returned in {self._timeout} seconds and must be restarted",
             ) from None
-
-        error = await self._process.stderr.read()
-        error = error.decode()
+        if not data:
+            # the shell exited: take whatever stderr it wrote
+            while not self._stderr_chunks.empty():
+                error += self._stderr_chunks.get_nowait()
 
         return CLIResult(output=output.strip(), error=error.strip())
 
@@ -0,0 +1,41 @@
+"""
+Screen capture backends.
+
+Capture goes through a `CaptureBackend` instead of calling (or monkeypatching)
+`ImageGrab.grab` at each call site.
+"""
+from abc import ABCMeta, abstractmethod
+
+from PIL import Image, ImageGrab
+
+
+BBox = tuple[int, int, int, int]
+
+
+class CaptureBackend(metaclass=ABCMeta):
+    """Abstract base class for screen capture backends."""
+
+    @abstractmethod
+    def grab(self, bbox: BBox) -> Image.Image:
+        """Grab the `bbox` region (left, top, right, bottom) of the virtual desktop."""
+        ...
+
+
+class ImageGrabBackend(CaptureBackend):
+    """Pillow's ImageGrab (Windows, macOS, X11)."""
+
+    def grab(self, bbox: BBox) -> Image.Image:
+        # all_screens lets bbox address monitors other than the primary on Windows
+        return ImageGrab.grab(bbox=bbox, all_screens=True)
+
+
+_capture_backend: CaptureBackend = ImageGrabBackend()
+
+
+def get_capture_backend() -> CaptureBackend:
+    return _capture_backend
+
+
+def set_capture_backend(backend: CaptureBackend):
+    global _capture_backend
+    _capture_backend = backend
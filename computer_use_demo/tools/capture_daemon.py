@@ -0,0 +1,147 @@
+"""
+Background screen capture with latest-frame prefetch.
+
+`CaptureDaemon` grabs the selected screen on a worker thread into a small ring buffer,
+either continuously (every `interval` seconds) or on demand. Consumers ask for the
+freshest frame with a staleness bound and get it without waiting whenever the buffer
+already holds one that is recent enough, which takes capture off the critical path.
+"""
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+from .frame import Frame
+from .logger import logger
+from .screen_capture import capture_frame
+
+
+class CaptureDaemon:
+    """
+    Args:
+        selected_screen: screen to capture.
+        interval: seconds between captures in continuous mode.
+        buffer_size: number of recent frames kept.
+        continuous: capture every `interval` seconds; otherwise only when `request()` is called
+            or `latest()` finds no fresh enough frame.
+        max_age: default staleness bound (seconds) for `latest()`.
+        capture: function returning a Frame; defaults to `capture_frame(selected_screen)`.
+    """
+
+    def __init__(
+        self,
+        selected_screen: int = 0,
+        interval: float = 0.2,
+        buffer_size: int = 4,
+        continuous: bool = True,
+        max_age: float = 0.5,
+        capture: Callable[[], Frame] | None = None,
+    ):
+        self.selected_screen = selected_screen
+        self.interval = interval
+        self.continuous = continuous
+        self.max_age = max_age
+        self._capture = capture or (lambda: capture_frame(selected_screen=self.selected_screen))
+
+        self._frames: deque[Frame] = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._requested = False
+        self._running = False
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "CaptureDaemon":
+        with self._condition:
+            if self._running:
+                return self
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="capture-daemon", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self.continuous:
+                    self._condition.wait_for(lambda: self._requested or not self._running)
+                if not self._running:
+                    return
+                self._requested = False
+            try:
+                frame = self._capture()
+            except Exception as e:
+                logger.warning(f"CaptureDaemon: capture failed: {e}")
+                frame = None
+            with self._condition:
+                if frame is not None:
+                    self._frames.append(frame)
+                self._condition.notify_all()
+                if self.continuous:
+                    # sleep until the next tick, unless someone asks for a frame right now
+                    self._condition.wait_for(lambda: self._requested or not self._running, timeout=self.interval)
+
+    def request(self):
+        """Ask the worker to capture a frame as soon as possible."""
+        with self._condition:
+            self._requested = True
+            self._condition.notify_all()
+
+    def peek(self) -> Frame | None:
+        """Newest buffered frame, however old, without waiting."""
+        with self._condition:
+            return self._frames[-1] if self._frames else None
+
+    def latest(self, max_age: float | None = None, newer_than: float | None = None, timeout: float = 5.0) -> Frame:
+        """
+        Return the newest frame that is at most `max_age` seconds old and, if given, captured
+        after the `newer_than` timestamp (e.g. the end of the last action). Returns immediately
+        when the buffer has one, otherwise requests a capture and waits for it; captures on
+        the calling thread if the daemon is not running or does not deliver within `timeout`.
+        """
+        max_age = self.max_age if max_age is None else max_age
+
+        def fresh() -> Frame | None:
+            if not self._frames:
+                return None
+            frame = self._frames[-1]
+            if time.time() - frame.timestamp > max_age:
+                return None
+            if newer_than is not None and frame.timestamp <= newer_than:
+                return None
+            return frame
+
+        # decide under the lock, but grab outside it: a capture must not block the daemon or other callers
+        with self._condition:
+            frame = fresh()
+            if frame is not None:
+                return frame
+            running = self._running
+            if running:
+                self._requested = True
+                self._condition.notify_all()
+                if self._condition.wait_for(lambda: fresh() is not None, timeout=timeout):
+                    return fresh()
+        if running:
+            logger.warning(f"CaptureDaemon: no fresh frame within {timeout:.1f}s, capturing synchronously")
+        return self._capture_now()
+
+    def _capture_now(self) -> Frame:
+        # called without the lock held, it is only taken to buffer the frame
+        frame = self._capture()
+        with self._condition:
+            self._frames.append(frame)
+            self._condition.notify_all()
+        return frame
@@ -1,5 +1,6 @@
 """Collection classes for managing multiple tools."""
 
+import asyncio
 from typing import Any
 
 from anthropic.types.beta import BetaToolUnionParam
@@ -10,6 +11,7 @@ from .base import (
     ToolFailure,
     ToolResult,
 )
+from .logger import logger
 
 
 class ToolCollection:
@@ -33,9 +35,30 @@ class ToolCollection:
         except ToolError as e:
             return ToolFailure(error=e.message)
         
+    async def run_many(self, calls: list[tuple[str, dict[str, Any]]]) -> list[ToolResult]:
+        """
+        Run several (name, tool_input) calls and return their results in call order. Calls to
+        the same tool run one after the other, in order; different tools run concurrently.
+        """
+        groups: dict[str, list[int]] = {}
+        for i, (name, _) in enumerate(calls):
+            groups.setdefault(name, []).append(i)
+        results: list[ToolResult | None] = [None] * len(calls)
+
+        async def run_group(indices: list[int]):
+            for i in indices:
+                name, tool_input = calls[i]
+                results[i] = await self.run(name=name, tool_input=tool_input)
+
+        await asyncio.gather(*(run_group(indices) for indices in groups.values()))
+        return results
+
     def sync_call(self, *, name: str, tool_input: dict[str, Any]) -> ToolResult:
-        print(f"sync_call: {name} {tool_input}")
+        logger.debug(f"sync_call: {name} {tool_input}")
         tool = self.tool_map.get(name)
         if not tool:
             return ToolFailure(error=f"Tool {name} is invalid")
-        return tool.sync_call(**tool_input)
+        try:
+            return tool.sync_call(**tool_input)
+        except ToolError as e:
+            return ToolFailure(error=e.message)
@@ -1,30 +1,27 @@
-import subprocess
-import platform
-import pyautogui
 import asyncio
-import base64
-import os
+import math
 import time
-if platform.system() == "Darwin":
-    import Quartz  # uncomment this line if you are on macOS
+from collections.abc import Callable
+from dataclasses import dataclass
 from enum import StrEnum
-from pathlib import Path
-from typing import Literal, TypedDict
-from uuid import uuid4
-from screeninfo import get_monitors
-
-from PIL import ImageGrab, Image
-from functools import partial
+from typing import Literal, NamedTuple, TypedDict
 
 from anthropic.types.beta import BetaToolComputerUse20241022Param
 
 from .base import BaseAnthropicTool, ToolError, ToolResult
+from .capture_backend import get_capture_backend
+from .coordinates import MAX_SCALING_TARGETS, CoordinateMapper, get_coordinate_mapper
+from .frame import Frame
+from .input_backend import get_input_backend
+from .logger import logger
+from .pacing import PacingProfile, get_pacing_profile
+from .resize import pad_and_resize
 from .run import run
+from .screen_geometry import screen_geometry
+from .settle import SettleDetector, settle_detector
+from .telemetry import action_telemetry
+from .typing_engine import TypingEngine, typing_engine
 
-OUTPUT_DIR = "./tmp/outputs"
-
-TYPING_DELAY_MS = 12
-TYPING_GROUP_SIZE = 50
 
 Action = Literal[
     "key",
@@ -35,23 +32,14 @@ Action = Literal[
     "right_click",
     "middle_click",
     "double_click",
+    "left_press",
+    "scroll",
     "screenshot",
     "cursor_position",
+    "wait",
 ]
 
 
-class Resolution(TypedDict):
-    width: int
-    height: int
-
-
-MAX_SCALING_TARGETS: dict[str, Resolution] = {
-    "XGA": Resolution(width=1024, height=768),  # 4:3
-    "WXGA": Resolution(width=1280, height=800),  # 16:10
-    "FWXGA": Resolution(width=1366, height=768),  # ~16:9
-}
-
-
 class ScalingSource(StrEnum):
     COMPUTER = "computer"
     API = "api"
@@ -63,16 +51,11 @@ class ComputerToolOptions(TypedDict):
     display_number: int | None
 
 
-def chunks(s: str, chunk_size: int) -> list[str]:
-    return [s[i : i + chunk_size] for i in range(0, len(s), chunk_size)]
-
-
 def get_screen_details():
-    screens = get_monitors()
     screen_details = []
 
-    # Sort screens by x position to arrange from left to right
-    sorted_screens = sorted(screens, key=lambda s: s.x)
+    # Screens are sorted by x position to arrange from left to right
+    sorted_screens = screen_geometry.screens()
 
     # Loop through sorted screens and assign positions
     primary_index = 0
@@ -98,7 +81,7 @@ def get_screen_details():
 class ComputerTool(BaseAnthropicTool):
     """
     A tool that allows the agent to interact with the screen, keyboard, and mouse of the current computer.
-    Adapted for Windows using 'pyautogui'.
+    Adapted for Windows using 'pyautogui'; input goes through the configured input backend.
     """
 
     name: Literal["computer"] = "computer"
@@ -108,6 +91,8 @@ class ComputerTool(BaseAnthropicTool):
     display_num: int | None
 
     _screenshot_delay = 2.0
+    _wait_seconds = 5.0  # default of the "wait" action, e.g. UI-TARS wait()
+    _max_wait_seconds = 60.0  # longer waits are clamped, they would block the executor
     _scaling_enabled = True
 
     @property
@@ -124,7 +109,8 @@ class ComputerTool(BaseAnthropicTool):
     def to_params(self) -> BetaToolComputerUse20241022Param:
         return {"name": self.name, "type": self.api_type, **self.options}
 
-    def __init__(self, selected_screen: int = 0, is_scaling: bool = True):
+    def __init__(self, selected_screen: int = 0, is_scaling: bool = True, settle_detector: SettleDetector = settle_detector,
+                 typing_engine: TypingEngine = typing_engine, pacing: PacingProfile | str | None = None):
         super().__init__()
 
         # Get screen width and height using Windows command
@@ -133,6 +119,10 @@ class ComputerTool(BaseAnthropicTool):
         self.offset_y = 0
         self.selected_screen = selected_screen   
         self.is_scaling = is_scaling
+        self.settle_detector = settle_detector
+        self.typing_engine = typing_engine
+        # None follows the active pacing profile (see pacing.py)
+        self._pacing = get_pacing_profile(pacing) if isinstance(pacing, str) else pacing
         self.width, self.height = self.get_screen_size()  
         self.width, self.height = int(self.width), int(self.height)
 
@@ -147,61 +137,14 @@ class ComputerTool(BaseAnthropicTool):
         self.action_conversion = {"left click": "click",
                                   "right click": "right_click"}
         
-        system = platform.system()        # Detect platform
-        if system == "Windows":
-            screens = get_monitors()
-            sorted_screens = sorted(screens, key=lambda s: s.x)
-            if self.selected_screen < 0 or self.selected_screen >= len(screens):
-                raise IndexError("Invalid screen index.")
-            screen = sorted_screens[self.selected_screen]
-            bbox = (screen.x, screen.y, screen.x + screen.width, screen.y + screen.height)
-
-        elif system == "Darwin":  # macOS
-            max_displays = 32  # Maximum number of displays to handle
-            active_displays = Quartz.CGGetActiveDisplayList(max_displays, None, None)[1]
-            screens = []
-            for display_id in active_displays:
-                bounds = Quartz.CGDisplayBounds(display_id)
-                screens.append({
-                    'id': display_id, 'x': int(bounds.origin.x), 'y': int(bounds.origin.y),
-                    'width': int(bounds.size.width), 'height': int(bounds.size.height),
-                    'is_primary': Quartz.CGDisplayIsMain(display_id)  # Check if this is the primary display
-                })
-            sorted_screens = sorted(screens, key=lambda s: s['x'])
-            if self.selected_screen < 0 or self.selected_screen >= len(screens):
-                raise IndexError("Invalid screen index.")
-            screen = sorted_screens[self.selected_screen]
-            bbox = (screen['x'], screen['y'], screen['x'] + screen['width'], screen['y'] + screen['height'])
-        else:  # Linux or other OS
-            cmd = "xrandr | grep ' primary' | awk '{print $4}'"
-            try:
-                output = subprocess.check_output(cmd, shell=True).decode()
-                resolution = output.strip()
-                # Parse the resolution format like "1920x1080+1920+0"
-                parts = resolution.split('+')[0]  # Get just the "1920x1080" part
-                width, height = map(int, parts.split('x'))
-                
-                # Create a screen object/dictionary similar to what's used in other platforms
-                # Extract the offsets from the resolution string
-                x_offset = int(resolution.split('+')[1]) if len(resolution.split('+')) > 1 else 0
-                y_offset = int(resolution.split('+')[2]) if len(resolution.split('+')) > 2 else 0
-                
-                # Create a screen object with attributes similar to the screeninfo.Monitor object
-                class LinuxScreen:
-                    def __init__(self, x, y, width, height):
-                        self.x = x
-                        self.y = y
-                        self.width = width
-                        self.height = height
-                
-                screen = LinuxScreen(x_offset, y_offset, width, height)
-                bbox = (x_offset, y_offset, x_offset + width, y_offset + height)
-            except subprocess.CalledProcessError:
-                raise RuntimeError("Failed to get screen resolution on Linux.")
+        screen = screen_geometry.get(self.selected_screen)
+        bbox = screen.bbox
             
-        self.offset_x = screen['x'] if system == "Darwin" else screen.x
-        self.offset_y = screen['y'] if system == "Darwin" else screen.y
+        self.offset_x = screen.x
+        self.offset_y = screen.y
         self.bbox = bbox
+        # scale and offset between API, screen and virtual-desktop coordinates, see coordinates.py
+        self.coordinate_mapper: CoordinateMapper = get_coordinate_mapper(self.selected_screen)
         
 
     async def __call__(
@@ -214,167 +157,9 @@ class ComputerTool(BaseAnthropicTool):
         scroll_amount: int = 10,
         **kwargs,
     ):  
-        print(f"action: {action}, text: {text}, coordinate: {coordinate}")
-        action = self.action_conversion.get(action, action)
-        
-        if action in ("mouse_move", "left_click_drag"):
-            if coordinate is None:
-                raise ToolError(f"coordinate is required for {action}")
-            if text is not None:
-                raise ToolError(f"text is not accepted for {action}")
-            if not isinstance(coordinate, (list, tuple)) or len(coordinate) != 2:
-                raise ToolError(f"{coordinate} must be a tuple of length 2")
-            # if not all(isinstance(i, int) and i >= 0 for i in coordinate):
-            if not all(isinstance(i, int) for i in coordinate):
-                raise ToolError(f"{coordinate} must be a tuple of non-negative ints")
-            
-            if self.is_scaling:
-                x, y = self.scale_coordinates(
-                    ScalingSource.API, coordinate[0], coordinate[1]
-                )
-            else:
-                x, y = coordinate
-
-            # print(f"scaled_coordinates: {x}, {y}")
-            # print(f"offset: {self.offset_x}, {self.offset_y}")
-            
-            x += self.offset_x
-            y += self.offset_y
-
-            print(f"mouse move to {x}, {y}")
-            
-            if action == "mouse_move":
-                pyautogui.moveTo(x, y)
-                return ToolResult(output=f"Moved mouse to ({x}, {y})")
-            elif action == "left_click_drag":
-                current_x, current_y = pyautogui.position()
-                pyautogui.dragTo(x, y, duration=0.5)  # Adjust duration as needed
-                return ToolResult(output=f"Dragged mouse from ({current_x}, {current_y}) to ({x}, {y})")
-
-        if action in ("key", "type"):
-            if text is None:
-                raise ToolError(f"text is required for {action}")
-            if coordinate is not None:
-                raise ToolError(f"coordinate is not accepted for {action}")
-            if not isinstance(text, str):
-                raise ToolError(output=f"{text} must be a string")
-
-            if action == "key":
-                # Handle key combinations
-                keys = text.split('+')
-                for key in keys:
-                    key = key.strip().lower()
-                    key = self.key_conversion.get(key, key)
-                    pyautogui.keyDown(key)  # Press down each key
-                for key in reversed(keys):
-                    key = key.strip().lower()
-                    key = self.key_conversion.get(key, key)
-                    pyautogui.keyUp(key)    # Release each key in reverse order
-                return ToolResult(output=f"Pressed keys: {text}")
-            
-            elif action == "type":
-                pyautogui.typewrite(text, interval=TYPING_DELAY_MS / 1000)  # Convert ms to seconds
-                screenshot_base64 = (await self.screenshot()).base64_image
-                return ToolResult(output=text, base64_image=screenshot_base64)
-           
-        # minimum modification to avoid disrupting the original flow, will be optimized later
-        # for support of Claude 3.7 Computer Use API
-        if action in ("scroll"):
-            if coordinate is None:
-                if scroll_direction in ("up", "down"):
-                    pyautogui.scroll(scroll_amount if scroll_direction == "up" else -scroll_amount)
-                elif scroll_direction in ("left", "right"):
-                    pyautogui.hscroll(scroll_amount if scroll_direction == "right" else -scroll_amount)
-                return ToolResult(output=f"Scrolled {scroll_direction}")
-            else:
-                if self.is_scaling:
-                    x, y = self.scale_coordinates(
-                        ScalingSource.API, coordinate[0], coordinate[1]
-                    )
-                else:
-                    x, y = coordinate
-
-                # print(f"scaled_coordinates: {x}, {y}")
-                # print(f"offset: {self.offset_x}, {self.offset_y}")
-                
-                if scroll_direction in ("up", "down"):
-                    pyautogui.scroll(scroll_amount if scroll_direction == "up" else -scroll_amount, x, y)
-                elif scroll_direction in ("left", "right"):
-                    pyautogui.hscroll(scroll_amount if scroll_direction == "right" else -scroll_amount, x, y)
-                return ToolResult(output=f"Scrolled {scroll_direction} at {x}, {y}")
-            
-        if action in ("left_click", "right_click", "double_click", "middle_click", "left_press"):
-            if coordinate is not None:
-                if self.is_scaling:
-                    x, y = self.scale_coordinates(
-                        ScalingSource.API, coordinate[0], coordinate[1]
-                    )
-                else:
-                    x, y = coordinate
-
-                # print(f"scaled_coordinates: {x}, {y}")
-                # print(f"offset: {self.offset_x}, {self.offset_y}")
-                
-                x += self.offset_x
-                y += self.offset_y
-
-                if action == "left_click":
-                    pyautogui.click(x, y)
-                elif action == "right_click":
-                    pyautogui.rightClick(x, y)
-                elif action == "double_click":
-                    pyautogui.doubleClick(x, y)
-                elif action == "middle_click":
-                    pyautogui.middleClick(x, y)
-                elif action == "left_press":
-                    pyautogui.mouseDown(x, y)
-                    time.sleep(1)
-                    pyautogui.mouseUp(x, y)
-                return ToolResult(output=f"Performed {action} at {x}, {y}")
-            else:
-                pass
-        
-        if action in (
-            "left_click",
-            "right_click",
-            "double_click",
-            "middle_click",
-            "screenshot",
-            "cursor_position",
-            "left_press",
-        ):
-            if text is not None:
-                raise ToolError(f"text is not accepted for {action}")
-            # if coordinate is not None:
-            #     raise ToolError(f"coordinate is not accepted for {action}")
-
-            if action == "screenshot":
-                return await self.screenshot()
-            elif action == "cursor_position":
-                x, y = pyautogui.position()
-                x, y = self.scale_coordinates(ScalingSource.COMPUTER, x, y)
-                return ToolResult(output=f"X={x},Y={y}")
-            # minimum modification to avoid disrupting the original flow, will be optimized later
-            else:
-                if coordinate is None:
-                    if action == "left_click":
-                        pyautogui.click()
-                    elif action == "right_click":
-                        pyautogui.rightClick()
-                    elif action == "middle_click":
-                        pyautogui.middleClick()
-                    elif action == "double_click":
-                        pyautogui.doubleClick()
-                    elif action == "left_press":
-                        pyautogui.mouseDown()
-                        time.sleep(1)
-                        pyautogui.mouseUp()
-                    return ToolResult(output=f"Performed {action}")
-                else:
-                    pass
-            
-        raise ToolError(f"Invalid action: {action}")
-    
+        # input and capture block, run them off the event loop so other tools can proceed
+        return await asyncio.to_thread(self.dispatch, ActionCall(action, text, coordinate, scroll_direction, scroll_amount,
+                                                                 screenshot_after_type=True))
     
     def sync_call(
         self,
@@ -382,206 +167,156 @@ class ComputerTool(BaseAnthropicTool):
         action: Action,
         text: str | None = None,
         coordinate: tuple[int, int] | None = None,
+        scroll_direction: Literal["up", "down", "left", "right"] = "down",
+        scroll_amount: int = 10,
+        screenshot_after_type: bool = False,
         **kwargs,
     ):
-        print(f"action: {action}, text: {text}, coordinate: {coordinate}")
-        action = self.action_conversion.get(action, action)
-        
-        if action in ("mouse_move", "left_click_drag"):
-            if coordinate is None:
-                raise ToolError(f"coordinate is required for {action}")
-            if text is not None:
-                raise ToolError(f"text is not accepted for {action}")
-            if not isinstance(coordinate, (list, tuple)) or len(coordinate) != 2:
-                raise ToolError(f"{coordinate} must be a tuple of length 2")
-            # if not all(isinstance(i, int) and i >= 0 for i in coordinate):
-            if not all(isinstance(i, int) for i in coordinate):
-                raise ToolError(f"{coordinate} must be a tuple of non-negative ints")
-            
-            if self.is_scaling:
-                x, y = self.scale_coordinates(
-                    ScalingSource.API, coordinate[0], coordinate[1]
-                )
-            else:
-                x, y = coordinate
-
-            # print(f"scaled_coordinates: {x}, {y}")
-            # print(f"offset: {self.offset_x}, {self.offset_y}")
-            x += self.offset_x
-            y += self.offset_y
-
-            print(f"mouse move to {x}, {y}")
-            
-            if action == "mouse_move":
-                pyautogui.moveTo(x, y)
-                return ToolResult(output=f"Moved mouse to ({x}, {y})")
-            elif action == "left_click_drag":
-                current_x, current_y = pyautogui.position()
-                pyautogui.dragTo(x, y, duration=0.5)  # Adjust duration as needed
-                return ToolResult(output=f"Dragged mouse from ({current_x}, {current_y}) to ({x}, {y})")
-
-        if action in ("key", "type"):
-            if text is None:
-                raise ToolError(f"text is required for {action}")
-            if coordinate is not None:
-                raise ToolError(f"coordinate is not accepted for {action}")
-            if not isinstance(text, str):
-                raise ToolError(output=f"{text} must be a string")
-
-            if action == "key":
-                # Handle key combinations
-                keys = text.split('+')
-                for key in keys:
-                    key = self.key_conversion.get(key.strip(), key.strip())
-                    key = key.lower()
-                    pyautogui.keyDown(key)  # Press down each key
-                for key in reversed(keys):
-                    key = self.key_conversion.get(key.strip(), key.strip())
-                    key = key.lower()
-                    pyautogui.keyUp(key)    # Release each key in reverse order
-                return ToolResult(output=f"Pressed keys: {text}")
-            
-            elif action == "type":
-                pyautogui.typewrite(text, interval=TYPING_DELAY_MS / 1000)  # Convert ms to seconds
-                return ToolResult(output=text)
-
-        if action in (
-            "left_click",
-            "right_click",
-            "double_click",
-            "middle_click",
-            "screenshot",
-            "cursor_position",
-            "left_press",
-        ):
-            if text is not None:
-                raise ToolError(f"text is not accepted for {action}")
-            if coordinate is not None:
-                raise ToolError(f"coordinate is not accepted for {action}")
-            elif action == "cursor_position":
-                x, y = pyautogui.position()
-                x, y = self.scale_coordinates(ScalingSource.COMPUTER, x, y)
-                return ToolResult(output=f"X={x},Y={y}")
-            else:
-                if action == "left_click":
-                    pyautogui.click()
-                elif action == "right_click":
-                    pyautogui.rightClick()
-                elif action == "middle_click":
-                    pyautogui.middleClick()
-                elif action == "double_click":
-                    pyautogui.doubleClick()
-                elif action == "left_press":
-                    pyautogui.mouseDown()
-                    time.sleep(1)
-                    pyautogui.mouseUp()
-                return ToolResult(output=f"Performed {action}")
-            
-        raise ToolError(f"Invalid action: {action}")
+        return self.dispatch(ActionCall(action, text, coordinate, scroll_direction, scroll_amount,
+                                        screenshot_after_type=screenshot_after_type))
 
-    async def screenshot(self):
-        
-        import time
-        time.sleep(1)
-        
+    @property
+    def pacing(self) -> PacingProfile:
+        return self._pacing or get_pacing_profile()
+
+    def dispatch(self, call: "ActionCall") -> ToolResult:
+        """Validate and run one action; shared by `__call__` and `sync_call`."""
+        logger.debug(f"action: {call.action}, text: {call.text}, coordinate: {call.coordinate}")
+        action = self.action_conversion.get(call.action, call.action)
+        handler = _ACTION_HANDLERS.get(action)
+        if handler is None:
+            raise ToolError(f"Invalid action: {action}")
+        _ACTION_VALIDATORS[action](call.text, call.coordinate)
+
+        start = time.perf_counter()
+        get_input_backend().set_pause(self.pacing.event_pause)
+        try:
+            return handler(self, call._replace(action=action))
+        finally:
+            action_telemetry.record(action, time.perf_counter() - start)
+
+    def _to_screen(self, coordinate) -> tuple[int, int]:
+        """Model coordinate -> virtual-desktop pixel on the selected screen."""
+        x, y = int(coordinate[0]), int(coordinate[1])
+        if self.is_scaling and self._scaling_enabled:
+            if x > self.width or y > self.height:
+                raise ToolError(f"Coordinates {x}, {y} are out of bounds")
+            return self.coordinate_mapper.map_point(x, y, "api", "absolute")
+        return self.coordinate_mapper.map_point(x, y, "screen", "absolute")
+
+    def _mouse_move(self, call: "ActionCall") -> ToolResult:
+        x, y = self._to_screen(call.coordinate)
+        logger.debug(f"mouse move to {x}, {y}")
+        get_input_backend().move_to(x, y)
+        return ToolResult(output=f"Moved mouse to ({x}, {y})")
+
+    def _left_click_drag(self, call: "ActionCall") -> ToolResult:
+        x, y = self._to_screen(call.coordinate)
+        input_backend = get_input_backend()
+        current_x, current_y = input_backend.position()
+        input_backend.drag_to(x, y, duration=self.pacing.drag_duration)
+        return ToolResult(output=f"Dragged mouse from ({current_x}, {current_y}) to ({x}, {y})")
+
+    def _key(self, call: "ActionCall") -> ToolResult:
+        # Handle key combinations: the backend presses each key and releases them in reverse order
+        keys = [key.strip().lower() for key in call.text.split('+')]
+        keys = [self.key_conversion.get(key, key) for key in keys]
+        get_input_backend().hotkey(keys)
+        return ToolResult(output=f"Pressed keys: {call.text}")
+
+    def _type(self, call: "ActionCall") -> ToolResult:
+        self.typing_engine.type(call.text, get_input_backend())  # chunked, bulk or clipboard paste, see typing_engine.py
+        if call.screenshot_after_type:
+            return ToolResult(output=call.text, base64_image=self._screenshot().base64_image)
+        return ToolResult(output=call.text)
+
+    def _scroll(self, call: "ActionCall") -> ToolResult:
+        direction, amount = call.scroll_direction, call.scroll_amount
+        horizontal = direction in ("left", "right")
+        clicks = amount if direction in ("up", "right") else -amount
+        if call.coordinate is None:
+            get_input_backend().scroll(clicks, horizontal=horizontal)
+            return ToolResult(output=f"Scrolled {direction}")
+        x, y = self._to_screen(call.coordinate)
+        get_input_backend().scroll(clicks, x, y, horizontal=horizontal)
+        return ToolResult(output=f"Scrolled {direction} at {x}, {y}")
+
+    def _click(self, call: "ActionCall") -> ToolResult:
+        input_backend = get_input_backend()
+        x = y = None
+        if call.coordinate is not None:
+            x, y = self._to_screen(call.coordinate)
+        if call.action == "left_press":
+            input_backend.mouse_down(x, y)
+            time.sleep(self.pacing.press_hold)
+            input_backend.mouse_up(x, y)
+        else:
+            input_backend.click(x, y, **_CLICK_OPTIONS[call.action])
+        if x is None:
+            return ToolResult(output=f"Performed {call.action}")
+        return ToolResult(output=f"Performed {call.action} at {x}, {y}")
+
+    def _wait(self, call: "ActionCall") -> ToolResult:
+        # give the screen time to change, e.g. a page loading; `text` may set the seconds
+        try:
+            seconds = float(call.text) if call.text else self._wait_seconds
+        except ValueError:
+            raise ToolError(f"{call.text} is not a number of seconds") from None
+        if not math.isfinite(seconds) or seconds < 0:
+            raise ToolError(f"{call.text} is not a number of seconds")
+        seconds = min(seconds, self._max_wait_seconds)
+        time.sleep(seconds)
+        return ToolResult(output=f"Waited {seconds:g}s")
+
+    def _cursor_position(self, call: "ActionCall") -> ToolResult:
+        x, y = get_input_backend().position()
+        space = "api" if self.is_scaling and self._scaling_enabled else "screen"
+        x, y = self.coordinate_mapper.map_point(x, y, "absolute", space)
+        return ToolResult(output=f"X={x},Y={y}")
+
+    def _screenshot_action(self, call: "ActionCall") -> ToolResult:
+        return self._screenshot()
+
+    async def screenshot(self, settle: bool = True):
         """Take a screenshot of the current screen and return a ToolResult with the base64 encoded image."""
-        output_dir = Path(OUTPUT_DIR)
-        output_dir.mkdir(parents=True, exist_ok=True)
-        path = output_dir / f"screenshot_{uuid4().hex}.png"
-
-        ImageGrab.grab = partial(ImageGrab.grab, all_screens=True)
-
-        # Detect platform
-        system = platform.system()
-
-        if system == "Windows":
-            # Windows: Use screeninfo to get monitor details
-            screens = get_monitors()
-
-            # Sort screens by x position to arrange from left to right
-            sorted_screens = sorted(screens, key=lambda s: s.x)
-
-            if self.selected_screen < 0 or self.selected_screen >= len(screens):
-                raise IndexError("Invalid screen index.")
-
-            screen = sorted_screens[self.selected_screen]
-            bbox = (screen.x, screen.y, screen.x + screen.width, screen.y + screen.height)
-
-        elif system == "Darwin":  # macOS
-            # macOS: Use Quartz to get monitor details
-            max_displays = 32  # Maximum number of displays to handle
-            active_displays = Quartz.CGGetActiveDisplayList(max_displays, None, None)[1]
-
-            # Get the display bounds (resolution) for each active display
-            screens = []
-            for display_id in active_displays:
-                bounds = Quartz.CGDisplayBounds(display_id)
-                screens.append({
-                    'id': display_id,
-                    'x': int(bounds.origin.x),
-                    'y': int(bounds.origin.y),
-                    'width': int(bounds.size.width),
-                    'height': int(bounds.size.height),
-                    'is_primary': Quartz.CGDisplayIsMain(display_id)  # Check if this is the primary display
-                })
-
-            # Sort screens by x position to arrange from left to right
-            sorted_screens = sorted(screens, key=lambda s: s['x'])
-
-            if self.selected_screen < 0 or self.selected_screen >= len(screens):
-                raise IndexError("Invalid screen index.")
-
-            screen = sorted_screens[self.selected_screen]
-            bbox = (screen['x'], screen['y'], screen['x'] + screen['width'], screen['y'] + screen['height'])
-
-        else:  # Linux or other OS
-            cmd = "xrandr | grep ' primary' | awk '{print $4}'"
-            try:
-                output = subprocess.check_output(cmd, shell=True).decode()
-                resolution = output.strip().split()[0]
-                parts = resolution.split('+')[0]  # Get just the "1920x1080" part
-                width, height = map(int, parts.split('x'))
-                return width, height
-                bbox = (0, 0, width, height)  # Assuming single primary screen for simplicity
-            except subprocess.CalledProcessError:
-                raise RuntimeError("Failed to get screen resolution on Linux.")
+        return self._screenshot(settle=settle)
+
+    def _screenshot(self, settle: bool = True) -> ToolResult:
+        if settle:
+            # wait until the screen stops changing instead of a fixed delay
+            self.settle_detector.wait(self.selected_screen)
+
+        screen = screen_geometry.get(self.selected_screen)
+        bbox = screen.bbox
 
         # Take screenshot using the bounding box
-        screenshot = ImageGrab.grab(bbox=bbox)
+        try:
+            screenshot = get_capture_backend().grab(bbox)
+        except OSError:
+            # the cached layout may be stale, e.g. a monitor was unplugged
+            screen_geometry.invalidate()
+            raise
+        screen_geometry.note_capture_size(self.selected_screen, screenshot.size)
 
         # Set offsets (for potential future use)
-        self.offset_x = screen['x'] if system == "Darwin" else screen.x
-        self.offset_y = screen['y'] if system == "Darwin" else screen.y
+        self.offset_x = screen.x
+        self.offset_y = screen.y
+        self.coordinate_mapper = get_coordinate_mapper(self.selected_screen)
 
-        print(f"target_dimension {self.target_dimension}")
-        
+        pad_ratio = None
         if not hasattr(self, 'target_dimension'):
-            screenshot = self.padding_image(screenshot)
+            # pad to 16:10, done on the scaled image by pad_and_resize
+            pad_ratio = 16 / 10
             self.target_dimension = MAX_SCALING_TARGETS["WXGA"]
 
         # Resize if target_dimensions are specified
-        print(f"offset is {self.offset_x}, {self.offset_y}")
-        print(f"target_dimension is {self.target_dimension}")
-        screenshot = screenshot.resize((self.target_dimension["width"], self.target_dimension["height"]))
-
-        # Save the screenshot
-        screenshot.save(str(path))
-
-        if path.exists():
-            # Return a ToolResult instance instead of a dictionary
-            return ToolResult(base64_image=base64.b64encode(path.read_bytes()).decode())
-        
-        raise ToolError(f"Failed to take screenshot: {path} does not exist.")
+        logger.debug(f"offset is {self.offset_x}, {self.offset_y}, target_dimension is {self.target_dimension}")
+        screenshot = pad_and_resize(screenshot, (self.target_dimension["width"], self.target_dimension["height"]),
+                                    pad_ratio=pad_ratio)
 
-    def padding_image(self, screenshot):
-        """Pad the screenshot to 16:10 aspect ratio, when the aspect ratio is not 16:10."""
-        _, height = screenshot.size
-        new_width = height * 16 // 10
-
-        padding_image = Image.new("RGB", (new_width, height), (255, 255, 255))
-        # padding to top left
-        padding_image.paste(screenshot, (0, 0))
-        return padding_image
+        # Encode in memory, the screenshot is not written to disk
+        frame = Frame(screenshot, selected_screen=self.selected_screen, offset=(self.offset_x, self.offset_y))
+        return ToolResult(base64_image=frame.base64)
 
     async def shell(self, command: str, take_screenshot=True) -> ToolResult:
         """Run a shell command and return the output, error, and optionally a screenshot."""
@@ -589,9 +324,9 @@ class ComputerTool(BaseAnthropicTool):
         base64_image = None
 
         if take_screenshot:
-            # delay to let things settle before taking a screenshot
-            await asyncio.sleep(self._screenshot_delay)
-            base64_image = (await self.screenshot()).base64_image
+            # let things settle before taking a screenshot, at most _screenshot_delay
+            await asyncio.to_thread(self.settle_detector.wait, self.selected_screen, max_wait=self._screenshot_delay)
+            base64_image = (await self.screenshot(settle=False)).base64_image
 
         return ToolResult(output=stdout, error=stderr, base64_image=base64_image)
 
@@ -600,96 +335,18 @@ class ComputerTool(BaseAnthropicTool):
         x, y = int(x), int(y)
         if not self._scaling_enabled:
             return x, y
-        ratio = self.width / self.height
-        target_dimension = None
-
-        for target_name, dimension in MAX_SCALING_TARGETS.items():
-            # allow some error in the aspect ratio - not ratios are exactly 16:9
-            if abs(dimension["width"] / dimension["height"] - ratio) < 0.02:
-                if dimension["width"] < self.width:
-                    target_dimension = dimension
-                    self.target_dimension = target_dimension
-                    # print(f"target_dimension: {target_dimension}")
-                break
-
-        if target_dimension is None:
-            # TODO: currently we force the target to be WXGA (16:10), when it cannot find a match
-            target_dimension = MAX_SCALING_TARGETS["WXGA"]
-            self.target_dimension = MAX_SCALING_TARGETS["WXGA"]
-
-        # should be less than 1
-        x_scaling_factor = target_dimension["width"] / self.width
-        y_scaling_factor = target_dimension["height"] / self.height
+        mapper = self.coordinate_mapper
+        self.target_dimension = mapper.api_target
         if source == ScalingSource.API:
             if x > self.width or y > self.height:
                 raise ToolError(f"Coordinates {x}, {y} are out of bounds")
             # scale up
-            return round(x / x_scaling_factor), round(y / y_scaling_factor)
+            return mapper.map_point(x, y, "api", "screen")
         # scale down
-        return round(x * x_scaling_factor), round(y * y_scaling_factor)
+        return mapper.map_point(x, y, "screen", "api")
 
     def get_screen_size(self):
-        if platform.system() == "Windows":
-            # Use screeninfo to get primary monitor on Windows
-            screens = get_monitors()
-
-            # Sort screens by x position to arrange from left to right
-            sorted_screens = sorted(screens, key=lambda s: s.x)
-            
-            if self.selected_screen is None:
-                primary_monitor = next((m for m in get_monitors() if m.is_primary), None)
-                return primary_monitor.width, primary_monitor.height
-            elif self.selected_screen < 0 or self.selected_screen >= len(screens):
-                raise IndexError("Invalid screen index.")
-            else:
-                screen = sorted_screens[self.selected_screen]
-                return screen.width, screen.height
-
-        elif platform.system() == "Darwin":
-            # macOS part using Quartz to get screen information
-            max_displays = 32  # Maximum number of displays to handle
-            active_displays = Quartz.CGGetActiveDisplayList(max_displays, None, None)[1]
-
-            # Get the display bounds (resolution) for each active display
-            screens = []
-            for display_id in active_displays:
-                bounds = Quartz.CGDisplayBounds(display_id)
-                screens.append({
-                    'id': display_id,
-                    'x': int(bounds.origin.x),
-                    'y': int(bounds.origin.y),
-                    'width': int(bounds.size.width),
-                    'height': int(bounds.size.height),
-                    'is_primary': Quartz.CGDisplayIsMain(display_id)  # Check if this is the primary display
-                })
-
-            # Sort screens by x position to arrange from left to right
-            sorted_screens = sorted(screens, key=lambda s: s['x'])
-
-            if self.selected_screen is None:
-                # Find the primary monitor
-                primary_monitor = next((screen for screen in screens if screen['is_primary']), None)
-                if primary_monitor:
-                    return primary_monitor['width'], primary_monitor['height']
-                else:
-                    raise RuntimeError("No primary monitor found.")
-            elif self.selected_screen < 0 or self.selected_screen >= len(screens):
-                raise IndexError("Invalid screen index.")
-            else:
-                # Return the resolution of the selected screen
-                screen = sorted_screens[self.selected_screen]
-                return screen['width'], screen['height']
-
-        else:  # Linux or other OS
-            cmd = "xrandr | grep ' primary' | awk '{print $4}'"
-            try:
-                output = subprocess.check_output(cmd, shell=True).decode()
-                resolution = output.strip().split()[0]
-                parts = resolution.split('+')[0]  # Get just the "1920x1080" part
-                width, height = map(int, parts.split('x'))
-                return width, height
-            except subprocess.CalledProcessError:
-                raise RuntimeError("Failed to get screen resolution on Linux.")
+        return screen_geometry.size(self.selected_screen)
     
     def get_mouse_position(self):
         # TODO: enhance this func
@@ -704,4 +361,88 @@ class ComputerTool(BaseAnthropicTool):
         """Map text to cliclick key codes if necessary."""
         # For simplicity, return text as is
         # Implement mapping if special keys are needed
-        return text
\ No newline at end of file
+        return text
+
+
+class ActionCall(NamedTuple):
+    action: str
+    text: str | None = None
+    coordinate: tuple[int, int] | None = None
+    scroll_direction: str = "down"
+    scroll_amount: int = 10
+    screenshot_after_type: bool = True
+
+
+@dataclass(frozen=True)
+class ActionSpec:
+    handler: Callable[[ComputerTool, ActionCall], ToolResult]
+    coordinate: str = "forbidden"  # "required", "optional" or "forbidden"
+    text: str = "forbidden"  # "required", "optional" or "forbidden"
+    int_coordinate: bool = False  # coordinate must be a pair of ints
+
+
+_CLICK_OPTIONS = {
+    "left_click": {},
+    "right_click": {"button": "right"},
+    "middle_click": {"button": "middle"},
+    "double_click": {"clicks": 2},
+}
+
+ACTION_SPECS: dict[str, ActionSpec] = {
+    "mouse_move": ActionSpec(ComputerTool._mouse_move, coordinate="required", int_coordinate=True),
+    "left_click_drag": ActionSpec(ComputerTool._left_click_drag, coordinate="required", int_coordinate=True),
+    "key": ActionSpec(ComputerTool._key, text="required"),
+    "type": ActionSpec(ComputerTool._type, text="required"),
+    "scroll": ActionSpec(ComputerTool._scroll, coordinate="optional", text="optional"),
+    "left_click": ActionSpec(ComputerTool._click, coordinate="optional"),
+    "right_click": ActionSpec(ComputerTool._click, coordinate="optional"),
+    "middle_click": ActionSpec(ComputerTool._click, coordinate="optional"),
+    "double_click": ActionSpec(ComputerTool._click, coordinate="optional"),
+    "left_press": ActionSpec(ComputerTool._click, coordinate="optional"),
+    "screenshot": ActionSpec(ComputerTool._screenshot_action, coordinate="optional"),
+    "cursor_position": ActionSpec(ComputerTool._cursor_position, coordinate="optional"),
+    "wait": ActionSpec(ComputerTool._wait, text="optional"),
+}
+
+
+def _compile_validator(action: str, spec: ActionSpec) -> Callable[[str | None, tuple | None], None]:
+    """Build the argument checks for `action` once, so dispatch runs only the checks that apply."""
+    checks = []
+    if spec.coordinate == "required":
+        def check(text, coordinate):
+            if coordinate is None:
+                raise ToolError(f"coordinate is required for {action}")
+        checks.append(check)
+    elif spec.coordinate == "forbidden":
+        def check(text, coordinate):
+            if coordinate is not None:
+                raise ToolError(f"coordinate is not accepted for {action}")
+        checks.append(check)
+    if spec.text == "required":
+        def check(text, coordinate):
+            if text is None:
+                raise ToolError(f"text is required for {action}")
+            if not isinstance(text, str):
+                raise ToolError(f"{text} must be a string")
+        checks.append(check)
+    elif spec.text == "forbidden":
+        def check(text, coordinate):
+            if text is not None:
+                raise ToolError(f"text is not accepted for {action}")
+        checks.append(check)
+    if spec.int_coordinate:
+        def check(text, coordinate):
+            if not isinstance(coordinate, (list, tuple)) or len(coordinate) != 2:
+                raise ToolError(f"{coordinate} must be a tuple of length 2")
+            if not all(isinstance(i, int) for i in coordinate):
+                raise ToolError(f"{coordinate} must be a tuple of non-negative ints")
+        checks.append(check)
+
+    def validate(text, coordinate):
+        for check in checks:
+            check(text, coordinate)
+    return validate
+
+
+_ACTION_HANDLERS = {action: spec.handler for action, spec in ACTION_SPECS.items()}
+_ACTION_VALIDATORS = {action: _compile_validator(action, spec) for action, spec in ACTION_SPECS.items()}
@@ -0,0 +1,159 @@
+"""
+Coordinate mapping between the spaces actions are expressed in.
+
+A `CoordinateMapper` is built once per screen and precomputes the scale and offset
+between every pair of spaces:
+
+- "normalized": [0, 1] relative to the screen (ShowUI positions);
+- "screen": pixels relative to the screen's top-left corner;
+- "api": the scaled space the Anthropic API sees (see `scaling_target`);
+- "absolute": virtual-desktop pixels, what the input backends take;
+- "physical": pixels of a capture of the screen, larger than "screen" on HiDPI displays.
+
+`map_point` maps a single point with plain floats, `transform` maps an (N, 2) array in
+one NumPy operation and `map_actions` maps the coordinates of a whole action list.
+All paths round the same way, so a position maps to the same pixel whichever executor
+produced it.
+"""
+from typing import Any, Literal, TypedDict
+
+import numpy as np
+
+from .screen_geometry import ScreenInfo, screen_geometry
+
+
+class Resolution(TypedDict):
+    width: int
+    height: int
+
+
+MAX_SCALING_TARGETS: dict[str, Resolution] = {
+    "XGA": Resolution(width=1024, height=768),  # 4:3
+    "WXGA": Resolution(width=1280, height=800),  # 16:10
+    "FWXGA": Resolution(width=1366, height=768),  # ~16:9
+}
+
+Space = Literal["normalized", "screen", "api", "absolute", "physical"]
+SPACES: tuple[str, ...] = ("normalized", "screen", "api", "absolute", "physical")
+
+
+def scaling_target(width: int, height: int) -> Resolution:
+    """
+    The API resolution for a `width` x `height` screen: the target with the same aspect
+    ratio if it is smaller than the screen, WXGA (16:10) otherwise.
+    """
+    ratio = width / height
+    for dimension in MAX_SCALING_TARGETS.values():
+        # allow some error in the aspect ratio - not ratios are exactly 16:9
+        if abs(dimension["width"] / dimension["height"] - ratio) < 0.02:
+            if dimension["width"] < width:
+                return dimension
+            break
+    # TODO: currently we force the target to be WXGA (16:10), when it cannot find a match
+    return MAX_SCALING_TARGETS["WXGA"]
+
+
+class CoordinateMapper:
+    """
+    Args:
+        screen: the screen the coordinates refer to.
+        api_size: size of the "api" space; `scaling_target` of the screen by default.
+        capture_size: pixel size of a capture of the screen, for the "physical" space;
+            the logical screen size by default.
+    """
+
+    def __init__(self, screen: ScreenInfo, api_size: tuple[int, int] | None = None,
+                 capture_size: tuple[int, int] | None = None):
+        self.screen = screen
+        if api_size is None:
+            target = scaling_target(screen.width, screen.height)
+            api_size = (target["width"], target["height"])
+        self.api_size = api_size
+        self.capture_size = capture_size or screen.size
+
+        # each space as scale and offset into absolute pixels: absolute = p * scale + offset
+        width, height = screen.width, screen.height
+        to_absolute = {
+            "normalized": ((width, height), (screen.x, screen.y)),
+            "screen": ((1.0, 1.0), (screen.x, screen.y)),
+            "api": ((width / api_size[0], height / api_size[1]), (screen.x, screen.y)),
+            "absolute": ((1.0, 1.0), (0.0, 0.0)),
+            "physical": ((width / self.capture_size[0], height / self.capture_size[1]), (screen.x, screen.y)),
+        }
+        # source -> target as target = p * scale + offset, for every pair
+        self._affine: dict[tuple[str, str], tuple[float, float, float, float]] = {}
+        self._matrices: dict[tuple[str, str], tuple[np.ndarray, np.ndarray]] = {}
+        for source, ((ssx, ssy), (sox, soy)) in to_absolute.items():
+            for target, ((tsx, tsy), (tox, toy)) in to_absolute.items():
+                affine = (ssx / tsx, ssy / tsy, (sox - tox) / tsx, (soy - toy) / tsy)
+                self._affine[source, target] = affine
+                self._matrices[source, target] = (np.array(affine[:2]), np.array(affine[2:]))
+
+    @property
+    def api_target(self) -> Resolution:
+        return Resolution(width=self.api_size[0], height=self.api_size[1])
+
+    def map_point(self, x: float, y: float, source: Space, target: Space) -> tuple[int, int]:
+        if target == "normalized":
+            raise ValueError("Use transform() to map into the normalized space, it is not integral")
+        sx, sy, ox, oy = self._affine[source, target]
+        return round(x * sx + ox), round(y * sy + oy)
+
+    def transform(self, points, source: Space, target: Space) -> np.ndarray:
+        """Map an (N, 2) array of points; integer pixels unless the target is "normalized"."""
+        scale, offset = self._matrices[source, target]
+        mapped = np.asarray(points, dtype=np.float64).reshape(-1, 2) * scale + offset
+        if target == "normalized":
+            return mapped
+        # np.rint rounds half to even like round()
+        return np.rint(mapped).astype(np.int64)
+
+    def map_actions(self, actions: list[dict[str, Any]], source: Space, target: Space) -> list[dict[str, Any]]:
+        """Map the "coordinate" of every action that has one, in a single transform."""
+        indices = [i for i, action in enumerate(actions) if action.get("coordinate") is not None]
+        if not indices:
+            return actions
+        mapped = self.transform([actions[i]["coordinate"] for i in indices], source, target).tolist()
+        actions = list(actions)
+        for i, coordinate in zip(indices, mapped):
+            actions[i] = {**actions[i], "coordinate": tuple(coordinate)}
+        return actions
+
+    def contains(self, x: float, y: float, space: Space) -> bool:
+        """Whether the point lies on the screen."""
+        ax, ay = self.map_point(x, y, space, "absolute")
+        left, top, right, bottom = self.screen.bbox
+        return left <= ax < right and top <= ay < bottom
+
+
+_mappers: dict[tuple[ScreenInfo, tuple[int, int] | None], CoordinateMapper] = {}
+
+
+def get_coordinate_mapper(selected_screen: int | None = 0, api_size: tuple[int, int] | None = None) -> CoordinateMapper:
+    """The mapper for `selected_screen` in the current layout, built once per screen geometry."""
+    screen = screen_geometry.get(selected_screen)
+    key = (screen, api_size)
+    mapper = _mappers.get(key)
+    if mapper is None:
+        mapper = _mappers[key] = CoordinateMapper(screen, api_size)
+    return mapper
+
+
+if __name__ == "__main__":
+    import time
+
+    mapper = CoordinateMapper(ScreenInfo(1920, 0, 2560, 1440), capture_size=(5120, 2880))
+    print(f"api size {mapper.api_size}")
+    print(f"normalized (0.5, 0.5) -> absolute {mapper.transform([(0.5, 0.5)], 'normalized', 'absolute')[0]}")
+    print(f"api (640, 400) -> absolute {mapper.map_point(640, 400, 'api', 'absolute')}")
+    print(f"absolute (3200, 720) -> physical {mapper.map_point(3200, 720, 'absolute', 'physical')}")
+
+    points = np.random.rand(10000, 2)
+    start = time.perf_counter()
+    for x, y in points:
+        mapper.map_point(x, y, "normalized", "absolute")
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    mapper.transform(points, "normalized", "absolute")
+    batch_time = time.perf_counter() - start
+    print(f"10000 points: map_point {loop_time * 1000:.2f} ms, transform {batch_time * 1000:.2f} ms")
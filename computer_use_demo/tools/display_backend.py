@@ -0,0 +1,48 @@
+"""
+Selects where screenshots come from and where input goes.
+
+"native" grabs the real desktop with Pillow's ImageGrab, sends input with pyautogui (or
+the OOTB_INPUT_BACKEND input backend, see input_backend.py) and queries the monitor
+layout from the OS. "synthetic" installs an in-process
+`SyntheticDisplay` for headless runs. The backend is chosen by `use_display_backend`,
+which `sampling_loop_sync(display_backend=...)` calls, or by the OOTB_DISPLAY_BACKEND
+environment variable.
+"""
+import os
+
+from .capture_backend import ImageGrabBackend, set_capture_backend
+from .input_backend import PyAutoGUIBackend, set_input_backend, use_input_backend
+from .logger import logger
+from .screen_geometry import query_screens, screen_geometry
+from .synthetic_display import SyntheticDisplay
+
+
+DISPLAY_BACKEND_ENV = "OOTB_DISPLAY_BACKEND"
+DISPLAY_BACKENDS = ("native", "synthetic")
+
+
+def use_display_backend(name: str | None = None, **kwargs) -> SyntheticDisplay | None:
+    """
+    Install the `name` display backend (default: $OOTB_DISPLAY_BACKEND). Does nothing when
+    neither is set, so a backend installed by the caller is kept. Keyword arguments go to
+    `SyntheticDisplay`; returns the synthetic display, if one was installed.
+    """
+    name = name or os.environ.get(DISPLAY_BACKEND_ENV)
+    if not name:
+        return None
+    if name not in DISPLAY_BACKENDS:
+        raise ValueError(f"Unknown display backend {name!r}, expected one of {DISPLAY_BACKENDS}")
+
+    logger.info(f"Using the {name} display backend.")
+    if name == "native":
+        set_capture_backend(ImageGrabBackend())
+        if use_input_backend() is None:
+            set_input_backend(PyAutoGUIBackend())
+        screen_geometry.set_query(query_screens)
+        return None
+
+    display = SyntheticDisplay(**kwargs)
+    set_capture_backend(display)
+    set_input_backend(display.input)
+    screen_geometry.set_query(display.query_screens)
+    return display
@@ -0,0 +1,155 @@
+"""
+In-memory screen frames.
+
+A `Frame` wraps a captured PIL image and computes its encodings lazily, so a screenshot
+can be handed to models and the UI without a PNG round trip through the disk. Encodings
+are memoized per (format, size, quality): within one step the planner, the actor and
+the UI callback share a single PNG compression of the same frame. Writing to disk is an
+optional sink (`Frame.save`) backed by the bounded, content-addressed `FrameStore`.
+
+A frame can also be a region of a larger image (`Frame.from_region`), e.g. a changed area
+of a planner frame; the region is only cropped out when its pixels are first needed.
+"""
+import base64
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+from .frame_store import FrameStore, frame_store
+from .phash import dhash
+
+# formats whose encoder takes a `quality` argument
+_LOSSY_FORMATS = ("JPEG", "WEBP")
+
+
+class Frame:
+    """A captured screen image with lazily computed, memoized encodings."""
+
+    def __init__(
+        self,
+        image: Image.Image | None,
+        selected_screen: int | None = 0,
+        offset: tuple[int, int] = (0, 0),
+        timestamp: float | None = None,
+    ):
+        self._image = image
+        self._source: Image.Image | None = None
+        self._box: tuple[int, int, int, int] | None = None
+        self.selected_screen = selected_screen
+        self.offset = offset  # top-left of the captured screen in virtual-desktop coordinates
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+        self._resized: dict[tuple[int, int], Image.Image] = {}
+        self._encodings: dict[tuple, bytes] = {}
+        self._base64: dict[tuple, str] = {}
+        self._path: Path | None = None
+        self._phash: int | None = None
+        # planner, actor and UI may run on different threads
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_region(cls, source: Image.Image, box: tuple[int, int, int, int], **kwargs) -> "Frame":
+        """A frame showing the `box` region of `source`, cropped lazily on first pixel access."""
+        frame = cls(None, **kwargs)
+        frame._source = source
+        frame._box = box
+        return frame
+
+    @property
+    def image(self) -> Image.Image:
+        if self._image is None:
+            with self._lock:
+                if self._image is None:
+                    self._image = self._source.crop(self._box)
+                    self._source = None  # don't keep the full grab alive once cropped
+        return self._image
+
+    @property
+    def size(self) -> tuple[int, int]:
+        if self._image is None:
+            left, top, right, bottom = self._box
+            return (right - left, bottom - top)
+        return self._image.size
+
+    @property
+    def phash(self) -> int:
+        """64-bit perceptual hash (dHash) of the frame, computed once."""
+        if self._phash is None:
+            self._phash = dhash(self.image)
+        return self._phash
+
+    @staticmethod
+    def _key(format: str, size: tuple[int, int] | None, quality: int | None) -> tuple:
+        format = format.upper()
+        if format == "JPG":
+            format = "JPEG"
+        if format not in _LOSSY_FORMATS:
+            quality = None  # ignored by lossless encoders, don't split the cache on it
+        return (format, tuple(size) if size else None, quality)
+
+    def resized(self, size: tuple[int, int] | None) -> Image.Image:
+        """The frame resized to `size` (width, height), memoized. None or the native size returns the frame itself."""
+        if not size or tuple(size) == self.size:
+            return self.image
+        size = tuple(size)
+        image = self._resized.get(size)
+        if image is None:
+            image = self.image.resize(size, Image.LANCZOS)
+            self._resized[size] = image
+        return image
+
+    def encode(self, format: str = "PNG", size: tuple[int, int] | None = None, quality: int | None = None) -> bytes:
+        """Encoded bytes of the frame, computed once per (format, size, quality)."""
+        key = self._key(format, size, quality)
+        data = self._encodings.get(key)
+        if data is None:
+            with self._lock:
+                data = self._encodings.get(key)
+                if data is None:
+                    format, size, quality = key
+                    image = self.resized(size)
+                    if format == "JPEG" and image.mode != "RGB":
+                        image = image.convert("RGB")
+                    params = {"quality": quality} if quality is not None else {}
+                    buffer = BytesIO()
+                    image.save(buffer, format=format, **params)
+                    data = buffer.getvalue()
+                    self._encodings[key] = data
+        return data
+
+    def encode_base64(self, format: str = "PNG", size: tuple[int, int] | None = None, quality: int | None = None) -> str:
+        """Base64 string of `encode(format, size, quality)`, memoized."""
+        key = self._key(format, size, quality)
+        data = self._base64.get(key)
+        if data is None:
+            data = base64.b64encode(self.encode(*key)).decode("utf-8")
+            self._base64[key] = data
+        return data
+
+    @property
+    def png_bytes(self) -> bytes:
+        """PNG-encoded bytes of the frame at native size."""
+        return self.encode("PNG")
+
+    @property
+    def base64(self) -> str:
+        """Base64 string of the PNG-encoded frame at native size."""
+        return self.encode_base64("PNG")
+
+    def save(self, store: FrameStore | None = None) -> Path:
+        """Persist the frame as PNG in `store` (the shared frame store by default) and return its path."""
+        store = store if store is not None else frame_store
+        # put() again even if saved before: it only refreshes the LRU entry, or rewrites an evicted file
+        self._path = store.put(self.png_bytes)
+        return self._path
+
+    @property
+    def path(self) -> Path | None:
+        """Path of the persisted frame, or None if it was never saved."""
+        return self._path
+
+    def __repr__(self):
+        return f"Frame(screen={self.selected_screen}, size={self.size}, path={self._path})"
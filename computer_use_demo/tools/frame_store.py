@@ -0,0 +1,115 @@
+"""
+Bounded on-disk store for persisted frames.
+
+Files are named after a hash of their content, so an identical screenshot is written
+once however many times it is saved. The store keeps at most `max_files` files and
+`max_bytes` bytes and evicts the least recently used ones first; a hit refreshes the
+file's mtime, so the LRU order survives restarts. Files already in the directory
+(including old `screenshot_<uuid>.png` captures) are adopted on startup and evicted
+like any other.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from .logger import logger
+
+
+OUTPUT_DIR = "./tmp/outputs"
+
+MAX_BYTES = 1 << 30  # 1 GiB
+MAX_FILES = 2000
+
+
+class FrameStore:
+    """
+    Args:
+        root: directory holding the files.
+        max_bytes: total size cap, in bytes.
+        max_files: file count cap.
+    """
+
+    def __init__(self, root: str | Path = OUTPUT_DIR, max_bytes: int = MAX_BYTES, max_files: int = MAX_FILES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._entries: OrderedDict[str, int] | None = None  # file name -> size, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # scan lazily so that importing the module never touches the disk
+        if self._entries is not None:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.root):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        files.sort()
+        self._entries = OrderedDict((name, size) for _, name, size in files)
+        self._total_bytes = sum(self._entries.values())
+        self._evict()
+
+    def put(self, data: bytes, suffix: str = ".png", prefix: str = "screenshot_") -> Path:
+        """Store `data` (if not already stored) and return its path."""
+        name = f"{prefix}{hashlib.blake2b(data, digest_size=16).hexdigest()}{suffix}"
+        path = self.root / name
+        with self._lock:
+            self._load()
+            if name in self._entries and path.exists():
+                self._entries.move_to_end(name)
+                os.utime(path)
+                return path
+
+            # write to a temporary name first so readers never see a partial file
+            tmp_path = path.with_name(name + ".tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+
+            self._total_bytes -= self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._total_bytes += len(data)
+            self._evict(keep=name)
+        return path
+
+    def _evict(self, keep: str | None = None):
+        while self._entries and (len(self._entries) > self.max_files or self._total_bytes > self.max_bytes):
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                break  # never evict the file that is being returned
+            del self._entries[name]
+            self._total_bytes -= size
+            try:
+                (self.root / name).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"FrameStore: failed to remove {name}: {e}")
+
+    def configure(self, max_bytes: int | None = None, max_files: int | None = None):
+        """Change the caps; evicts immediately if the store is over the new ones."""
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if max_files is not None:
+                self.max_files = max_files
+            if self._entries is not None:
+                self._evict()
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            self._load()
+            return self._total_bytes
+
+
+frame_store = FrameStore(OUTPUT_DIR)
@@ -0,0 +1,151 @@
+"""
+Image codecs for model payloads.
+
+An `ImageCodec` describes how a screenshot is sent to a model: container format,
+lossy quality and an optional cap on the longest side. Encoding goes through the
+frame's memoized encoder, so the same codec applied twice to one frame costs nothing.
+
+Codecs can be written as compact specs, e.g. "png", "jpeg:85", "webp:80:1280"
+(format[:quality[:max_dimension]]).
+
+Run `python -m computer_use_demo.tools.image_codec [image.png]` to benchmark bytes on
+the wire against encode time for the built-in codecs.
+"""
+import base64
+from dataclasses import dataclass
+from io import BytesIO
+
+from PIL import Image
+
+from .frame import Frame
+
+
+_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+@dataclass(frozen=True)
+class ImageCodec:
+    format: str = "PNG"
+    quality: int | None = None
+    max_dimension: int | None = None
+
+    def __post_init__(self):
+        format = self.format.upper()
+        format = "JPEG" if format == "JPG" else format
+        if format not in _MIME_TYPES:
+            raise ValueError(f"Image format {self.format} not supported, choose from {list(_MIME_TYPES)}")
+        object.__setattr__(self, "format", format)
+
+    @classmethod
+    def from_spec(cls, spec: "str | ImageCodec | None") -> "ImageCodec":
+        """Parse "format[:quality[:max_dimension]]"; empty fields are skipped, e.g. "png::1024"."""
+        if isinstance(spec, ImageCodec):
+            return spec
+        if not spec:
+            return PNG_CODEC
+        format, *rest = spec.split(":")
+        quality = int(rest[0]) if len(rest) > 0 and rest[0] else None
+        max_dimension = int(rest[1]) if len(rest) > 1 and rest[1] else None
+        return cls(format, quality, max_dimension)
+
+    @property
+    def mime_type(self) -> str:
+        return _MIME_TYPES[self.format]
+
+    def target_size(self, size: tuple[int, int]) -> tuple[int, int] | None:
+        """Size after applying max_dimension, or None if the image is sent at native size."""
+        width, height = size
+        if not self.max_dimension or max(width, height) <= self.max_dimension:
+            return None
+        ratio = self.max_dimension / max(width, height)
+        return (max(1, round(width * ratio)), max(1, round(height * ratio)))
+
+    def encode(self, image: Frame | Image.Image) -> bytes:
+        if isinstance(image, Frame):
+            return image.encode(self.format, self.target_size(image.size), self.quality)
+        size = self.target_size(image.size)
+        if size:
+            image = image.resize(size, Image.LANCZOS)
+        if self.format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        buffer = BytesIO()
+        image.save(buffer, format=self.format, **({"quality": self.quality} if self.quality is not None else {}))
+        return buffer.getvalue()
+
+    def encode_base64(self, image: Frame | Image.Image) -> str:
+        if isinstance(image, Frame):
+            return image.encode_base64(self.format, self.target_size(image.size), self.quality)
+        return base64.b64encode(self.encode(image)).decode("utf-8")
+
+    def data_url(self, image: Frame | Image.Image) -> str:
+        """`data:` URL as used by OpenAI-compatible `image_url` content."""
+        return f"data:{self.mime_type};base64,{self.encode_base64(image)}"
+
+    def __str__(self):
+        return ":".join([self.format.lower(), str(self.quality or ""), str(self.max_dimension or "")]).rstrip(":")
+
+
+PNG_CODEC = ImageCodec("PNG")
+
+# Per-provider defaults, keyed by APIProvider value. Providers missing here get PNG.
+# Override a provider with `PROVIDER_CODECS[...] = ImageCodec.from_spec("jpeg:85")`, or pass
+# `image_codec=` to sampling_loop_sync to use one codec for every model in the loop.
+PROVIDER_CODECS: dict[str, ImageCodec] = {
+    "openai": PNG_CODEC,
+    "openrouter": PNG_CODEC,
+    "lmstudio": PNG_CODEC,
+    "ssh": ImageCodec("JPEG", quality=85, max_dimension=1024),  # remote inference over slow links
+}
+
+
+def get_codec(provider: str | None, override: "str | ImageCodec | None" = None) -> ImageCodec:
+    """Codec for `provider`, unless an explicit override is given."""
+    if override:
+        return ImageCodec.from_spec(override)
+    return PROVIDER_CODECS.get(str(provider) if provider else "", PNG_CODEC)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from PIL import ImageDraw
+
+    if len(sys.argv) > 1:
+        source = Image.open(sys.argv[1]).convert("RGB")
+    else:
+        # synthetic desktop-like 1080p frame: flat panels, text and a photo-like region;
+        # pass a real screenshot for representative numbers
+        source = Image.new("RGB", (1920, 1080), (240, 240, 240))
+        draw = ImageDraw.Draw(source)
+        draw.rectangle((0, 0, 1920, 40), fill=(32, 33, 36))
+        for row in range(60, 1000, 18):
+            for col in range(40, 1300, 90):
+                draw.text((col, row), "lorem ipsum", fill=(20, 20, 20))
+        photo = Image.merge("RGB", [
+            Image.blend(Image.linear_gradient("L").resize((560, 900)), Image.effect_noise((560, 900), 64), 0.3)
+            for _ in range(3)
+        ])
+        source.paste(photo, (1340, 80))
+
+    codecs = [
+        PNG_CODEC,
+        ImageCodec("PNG", max_dimension=1280),
+        ImageCodec("JPEG", quality=90),
+        ImageCodec("JPEG", quality=85, max_dimension=1024),
+        ImageCodec("JPEG", quality=75),
+        ImageCodec("WEBP", quality=80),
+        ImageCodec("WEBP", quality=80, max_dimension=1280),
+    ]
+    repeats = 5
+    baseline = None
+    print(f"source {source.size[0]}x{source.size[1]}, best of {repeats} runs")
+    print(f"{'codec':<18}{'wire bytes':>12}{'vs png':>9}{'encode ms':>11}")
+    for codec in codecs:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            payload = codec.encode_base64(Frame(source))  # fresh frame, no memoized encoding
+            timings.append(time.perf_counter() - start)
+        baseline = baseline or len(payload)
+        print(f"{str(codec):<18}{len(payload):>12}{baseline / len(payload):>8.1f}x{min(timings) * 1000:>11.1f}")
@@ -0,0 +1,360 @@
+"""
+Mouse and keyboard backends.
+
+`ComputerTool` sends input through an `InputBackend` rather than calling pyautogui
+directly, so input can go to a real desktop (`PyAutoGUIBackend`, or on Linux the
+batching xdotool, XTest and uinput backends in linux_input.py), be recorded by a
+`RecordingInputBackend`, e.g. for a synthetic display on a headless machine, or be
+dropped by a `NullInputBackend`. `use_input_backend` installs one by name, also read
+from the OOTB_INPUT_BACKEND environment variable; input_benchmark.py compares them.
+"""
+import os
+import platform
+import threading
+import time
+from abc import ABCMeta, abstractmethod
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from .logger import logger
+
+
+class InputBackend(metaclass=ABCMeta):
+    """Abstract base class for input backends. Coordinates are virtual-desktop pixels."""
+
+    @abstractmethod
+    def position(self) -> tuple[int, int]:
+        ...
+
+    @abstractmethod
+    def move_to(self, x: int, y: int):
+        ...
+
+    @abstractmethod
+    def drag_to(self, x: int, y: int, duration: float = 0.5):
+        ...
+
+    @abstractmethod
+    def click(self, x: int | None = None, y: int | None = None, button: str = "left", clicks: int = 1):
+        ...
+
+    @abstractmethod
+    def mouse_down(self, x: int | None = None, y: int | None = None, button: str = "left"):
+        ...
+
+    @abstractmethod
+    def mouse_up(self, x: int | None = None, y: int | None = None, button: str = "left"):
+        ...
+
+    @abstractmethod
+    def scroll(self, clicks: int, x: int | None = None, y: int | None = None, horizontal: bool = False):
+        """Scroll by `clicks`; positive is up (or right when `horizontal`)."""
+        ...
+
+    @abstractmethod
+    def key_down(self, key: str):
+        ...
+
+    @abstractmethod
+    def key_up(self, key: str):
+        ...
+
+    @abstractmethod
+    def type_text(self, text: str, interval: float = 0.0):
+        ...
+
+    def hotkey(self, keys: list[str]):
+        """Press `keys` down in order and release them in reverse order."""
+        for key in keys:
+            self.key_down(key)
+        for key in reversed(keys):
+            self.key_up(key)
+
+    def set_pause(self, seconds: float):
+        """Pause `seconds` after each input event (see pacing.py)."""
+        pass
+
+    def send_text(self, text: str) -> bool:
+        """Send `text` in one go, without per-character delays. Returns False if the backend cannot."""
+        return False
+
+    def paste_text(self, text: str) -> bool:
+        """Paste `text` through the clipboard. Returns False if the backend cannot."""
+        return False
+
+
+class PyAutoGUIBackend(InputBackend):
+    """
+    Real input through pyautogui (imported on first use, it needs a display).
+
+    Args:
+        paste_keys: shortcut that pastes the clipboard, e.g. "ctrl+shift+v" for terminal
+            emulators; defaults to $OOTB_PASTE_KEYS, else command+v on macOS and ctrl+v elsewhere.
+        restore_delay: seconds to leave the pasted text on the clipboard before restoring
+            the previous contents, for slow apps; defaults to $OOTB_CLIPBOARD_RESTORE_DELAY or 0.5.
+    """
+
+    def __init__(self, paste_keys: str | None = None, restore_delay: float | None = None):
+        self._pyautogui = None
+        default_keys = "command+v" if platform.system() == "Darwin" else "ctrl+v"
+        self.paste_keys = (paste_keys or os.environ.get("OOTB_PASTE_KEYS") or default_keys).split("+")
+        if restore_delay is None:
+            restore_delay = float(os.environ.get("OOTB_CLIPBOARD_RESTORE_DELAY", 0.5))
+        self.restore_delay = restore_delay
+
+    @property
+    def pyautogui(self):
+        if self._pyautogui is None:
+            import pyautogui
+            self._pyautogui = pyautogui
+        return self._pyautogui
+
+    def set_pause(self, seconds):
+        self.pyautogui.PAUSE = seconds
+
+    def position(self) -> tuple[int, int]:
+        x, y = self.pyautogui.position()
+        return int(x), int(y)
+
+    def move_to(self, x, y):
+        self.pyautogui.moveTo(x, y)
+
+    def drag_to(self, x, y, duration=0.5):
+        self.pyautogui.dragTo(x, y, duration=duration)
+
+    def click(self, x=None, y=None, button="left", clicks=1):
+        self.pyautogui.click(x, y, clicks=clicks, button=button)
+
+    def mouse_down(self, x=None, y=None, button="left"):
+        self.pyautogui.mouseDown(x, y, button=button)
+
+    def mouse_up(self, x=None, y=None, button="left"):
+        self.pyautogui.mouseUp(x, y, button=button)
+
+    def scroll(self, clicks, x=None, y=None, horizontal=False):
+        if horizontal:
+            self.pyautogui.hscroll(clicks, x, y)
+        else:
+            self.pyautogui.scroll(clicks, x, y)
+
+    def key_down(self, key):
+        self.pyautogui.keyDown(key)
+
+    def key_up(self, key):
+        self.pyautogui.keyUp(key)
+
+    def hotkey(self, keys):
+        self.pyautogui.hotkey(*keys)
+
+    def type_text(self, text, interval=0.0):
+        self.pyautogui.typewrite(text, interval=interval)
+
+    def send_text(self, text):
+        if not text.isascii():
+            return False  # typewrite silently drops characters it has no key for
+        self.pyautogui.typewrite(text, interval=0)
+        return True
+
+    def paste_text(self, text):
+        try:
+            import pyperclip  # installed with pyautogui
+            previous = pyperclip.paste()
+            pyperclip.copy(text)
+            copied = pyperclip.paste() == text
+        except Exception as e:  # no clipboard mechanism, e.g. xclip/xsel missing
+            logger.warning(f"Clipboard unavailable, cannot paste: {e}")
+            return False
+        if not copied:
+            # e.g. a clipboard manager rewrote it: pasting would insert something else
+            logger.warning("The clipboard did not take the text, not pasting it")
+            return False
+        self.pyautogui.hotkey(*self.paste_keys)
+        # give the target app time to read the clipboard before restoring it
+        time.sleep(self.restore_delay)
+        try:
+            if pyperclip.paste() == text:  # don't clobber what was copied meanwhile
+                pyperclip.copy(previous)
+        except Exception:
+            pass
+        return True
+
+
+@dataclass
+class InputEvent:
+    name: str  # InputBackend method name, e.g. "click"
+    args: dict[str, Any]
+    timestamp: float = field(default_factory=time.time)
+
+
+class RecordingInputBackend(InputBackend):
+    """
+    Records input events instead of sending them, and tracks the cursor position.
+
+    Args:
+        on_event: called with each event after it is recorded.
+        position: initial cursor position.
+    """
+
+    def __init__(self, on_event: Callable[[InputEvent], None] | None = None, position: tuple[int, int] = (0, 0)):
+        self.on_event = on_event
+        self.events: list[InputEvent] = []
+        self._position = position
+        self.pause = 0.0  # recorded, not slept
+        self._lock = threading.Lock()
+
+    def _record(self, name: str, **args):
+        event = InputEvent(name, args)
+        with self._lock:
+            self.events.append(event)
+            if args.get("x") is not None and args.get("y") is not None:
+                self._position = (int(args["x"]), int(args["y"]))
+        if self.on_event is not None:
+            self.on_event(event)
+
+    def set_pause(self, seconds):
+        self.pause = seconds
+
+    def position(self):
+        return self._position
+
+    def move_to(self, x, y):
+        self._record("move_to", x=x, y=y)
+
+    def drag_to(self, x, y, duration=0.5):
+        self._record("drag_to", x=x, y=y, duration=duration, start=self._position)
+
+    def click(self, x=None, y=None, button="left", clicks=1):
+        self._record("click", x=x, y=y, button=button, clicks=clicks)
+
+    def mouse_down(self, x=None, y=None, button="left"):
+        self._record("mouse_down", x=x, y=y, button=button)
+
+    def mouse_up(self, x=None, y=None, button="left"):
+        self._record("mouse_up", x=x, y=y, button=button)
+
+    def scroll(self, clicks, x=None, y=None, horizontal=False):
+        self._record("scroll", clicks=clicks, x=x, y=y, horizontal=horizontal)
+
+    def key_down(self, key):
+        self._record("key_down", key=key)
+
+    def key_up(self, key):
+        self._record("key_up", key=key)
+
+    def type_text(self, text, interval=0.0):
+        self._record("type_text", text=text, interval=interval)
+
+    def send_text(self, text):
+        self._record("type_text", text=text, interval=0.0)
+        return True
+
+    def paste_text(self, text):
+        self._record("paste_text", text=text)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+
+
+class NullInputBackend(InputBackend):
+    """Discards all input; measures the cost of everything but the input itself."""
+
+    def __init__(self):
+        self._position = (0, 0)
+
+    def position(self):
+        return self._position
+
+    def move_to(self, x, y):
+        self._position = (x, y)
+
+    def drag_to(self, x, y, duration=0.5):
+        self._position = (x, y)
+
+    def click(self, x=None, y=None, button="left", clicks=1):
+        pass
+
+    def mouse_down(self, x=None, y=None, button="left"):
+        pass
+
+    def mouse_up(self, x=None, y=None, button="left"):
+        pass
+
+    def scroll(self, clicks, x=None, y=None, horizontal=False):
+        pass
+
+    def key_down(self, key):
+        pass
+
+    def key_up(self, key):
+        pass
+
+    def type_text(self, text, interval=0.0):
+        pass
+
+    def send_text(self, text):
+        return True
+
+
+def _linux_backend(name: str) -> Callable[[], InputBackend]:
+    def create():
+        from . import linux_input  # optional dependencies are imported by the backends
+        return getattr(linux_input, name)()
+    return create
+
+
+INPUT_BACKEND_ENV = "OOTB_INPUT_BACKEND"
+INPUT_BACKENDS: dict[str, Callable[[], InputBackend]] = {
+    "pyautogui": PyAutoGUIBackend,
+    "xdotool": _linux_backend("XdotoolBackend"),
+    "xtest": _linux_backend("XTestBackend"),
+    "uinput": _linux_backend("UInputBackend"),
+    "recording": RecordingInputBackend,
+    "null": NullInputBackend,
+}
+
+
+def create_input_backend(name: str) -> InputBackend:
+    """
+    Create the `name` input backend. Raises (ImportError, OSError, subprocess errors, ...)
+    when the backend is unavailable on this machine, e.g. without its optional dependency.
+    """
+    if name not in INPUT_BACKENDS:
+        raise ValueError(f"Unknown input backend {name!r}, expected one of {tuple(INPUT_BACKENDS)}")
+    return INPUT_BACKENDS[name]()
+
+
+_input_backend: InputBackend = PyAutoGUIBackend()
+
+
+def get_input_backend() -> InputBackend:
+    return _input_backend
+
+
+def set_input_backend(backend: InputBackend):
+    global _input_backend
+    _input_backend = backend
+
+
+def use_input_backend(name: str | None = None) -> InputBackend | None:
+    """
+    Install the `name` input backend (default: $OOTB_INPUT_BACKEND), falling back to
+    pyautogui if it is unavailable. Does nothing when neither is set.
+    """
+    name = name or os.environ.get(INPUT_BACKEND_ENV)
+    if not name:
+        return None
+    if name not in INPUT_BACKENDS:
+        raise ValueError(f"Unknown input backend {name!r}, expected one of {tuple(INPUT_BACKENDS)}")
+    try:
+        backend = create_input_backend(name)
+    except Exception as e:
+        if name == "pyautogui":
+            raise
+        logger.warning(f"Input backend {name} is unavailable ({e!r}), using pyautogui.")
+        name, backend = "pyautogui", PyAutoGUIBackend()
+    logger.info(f"Using the {name} input backend.")
+    set_input_backend(backend)
+    return backend
@@ -0,0 +1,84 @@
+"""
+Benchmark of the input backends (see input_backend.py and linux_input.py).
+
+For each backend it measures raw events per second (cursor moves sent straight to the
+backend) and the end-to-end latency of ComputerTool actions (dispatch, validation,
+coordinate mapping and input) with the "fast" pacing profile:
+
+    python -m computer_use_demo.tools.input_benchmark
+    python -m computer_use_demo.tools.input_benchmark --backends pyautogui xdotool xtest uinput
+
+Only the null and recording backends run by default; the others move the real cursor,
+click and type into the focused window. Unavailable backends are skipped.
+"""
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from .computer import ComputerTool
+from .input_backend import INPUT_BACKENDS, create_input_backend, get_input_backend, set_input_backend
+from .screen_geometry import ScreenInfo, screen_geometry
+
+# actions of a typical CLICK + INPUT + ENTER step, in model (unscaled) coordinates
+ACTIONS = [
+    {"action": "mouse_move", "coordinate": (400, 300)},
+    {"action": "left_click", "coordinate": (420, 310)},
+    {"action": "key", "text": "ctrl+a"},
+    {"action": "type", "text": "The quick brown fox jumps over the lazy dog 012345"},
+    {"action": "key", "text": "Enter"},
+]
+
+
+def events_per_second(backend, events: int) -> float:
+    start = time.perf_counter()
+    for i in range(events):
+        backend.move_to(200 + i % 400, 200 + i % 300)
+    return events / (time.perf_counter() - start)
+
+
+def action_latency(tool: ComputerTool, repeat: int) -> dict[str, float]:
+    """Mean seconds per action, keyed by "action text"."""
+    latency = {}
+    for kwargs in ACTIONS:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # dispatch prints every action
+            for _ in range(repeat):
+                tool.sync_call(**kwargs)
+        name = kwargs["action"] if "text" not in kwargs else f"{kwargs['action']} {kwargs['text'][:10]}"
+        latency[name] = (time.perf_counter() - start) / repeat
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["null", "recording"], choices=list(INPUT_BACKENDS))
+    parser.add_argument("--events", type=int, default=500, help="cursor moves for the events/s measure")
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each action for the latency measure")
+    args = parser.parse_args()
+
+    if not os.environ.get("DISPLAY") and os.name == "posix":
+        # headless: give ComputerTool a screen to map coordinates onto
+        screen_geometry.set_query(lambda: [ScreenInfo(0, 0, 1920, 1080, True)])
+
+    previous = get_input_backend()
+    try:
+        for name in args.backends:
+            try:
+                backend = create_input_backend(name)
+            except Exception as e:
+                print(f"{name:<10} unavailable: {e!r}")
+                continue
+            set_input_backend(backend)
+            tool = ComputerTool(is_scaling=False, pacing="fast")
+            rate = events_per_second(backend, args.events)
+            latency = action_latency(tool, args.repeat)
+            actions = ", ".join(f"{action} {seconds * 1000:.2f}ms" for action, seconds in latency.items())
+            print(f"{name:<10} {rate:>10.0f} events/s | {actions}")
+    finally:
+        set_input_backend(previous)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+"""
+Linux input backends.
+
+pyautogui issues one X round trip (and one PAUSE) per event. These backends batch the
+events of one call instead:
+
+- `XdotoolBackend` runs one chained `xdotool` command per call (a click is move +
+  click, a key combo is a single `key ctrl+shift+t`, typing is one `type`);
+- `XTestBackend` sends fake input through the XTEST extension with python-xlib and
+  syncs once per call, so a whole string is typed in one round trip;
+- `UInputBackend` writes to a virtual /dev/uinput device with python-evdev, below X and
+  Wayland, and emits one SYN per call. It needs write access to /dev/uinput.
+
+python-xlib and evdev are optional dependencies, imported when the backend is created.
+A key name the backend has no key for raises ToolError before any event is sent.
+"""
+import shlex
+import subprocess
+import time
+
+from .base import ToolError
+from .input_backend import InputBackend
+from .logger import logger
+
+
+# pyautogui key names (as produced by ComputerTool) -> X keysym names
+X_KEYSYMS = {
+    "enter": "Return", "return": "Return", "esc": "Escape", "escape": "Escape", "tab": "Tab",
+    "backspace": "BackSpace", "delete": "Delete", "del": "Delete", "insert": "Insert", "space": "space",
+    "pagedown": "Next", "pageup": "Prior", "home": "Home", "end": "End",
+    "up": "Up", "down": "Down", "left": "Left", "right": "Right",
+    "ctrl": "Control_L", "control": "Control_L", "shift": "Shift_L", "alt": "Alt_L", "option": "Alt_L",
+    "win": "Super_L", "super": "Super_L", "command": "Super_L", "cmd": "Super_L", "meta": "Super_L",
+    "capslock": "Caps_Lock", "printscreen": "Print",
+    **{f"f{i}": f"F{i}" for i in range(1, 13)},
+}
+
+# X pointer buttons
+_BUTTONS = {"left": 1, "middle": 2, "right": 3}
+_SCROLL_BUTTONS = {(False, True): 4, (False, False): 5, (True, False): 6, (True, True): 7}  # (horizontal, positive)
+
+
+def x_keysym_name(key: str) -> str:
+    return X_KEYSYMS.get(key.lower(), key)
+
+
+class XdotoolBackend(InputBackend):
+    """Input through the xdotool binary, one chained command per call."""
+
+    def __init__(self, binary: str = "xdotool"):
+        self.binary = binary
+        self._pause = 0.0
+        # fail early when xdotool or the X server is missing
+        self._run(["getmouselocation"])
+
+    def _run(self, args: list[str]) -> str:
+        result = subprocess.run([self.binary, *args], capture_output=True, text=True, check=True)
+        if self._pause:
+            time.sleep(self._pause)
+        return result.stdout
+
+    def set_pause(self, seconds):
+        self._pause = seconds
+
+    def position(self):
+        fields = dict(line.split("=", 1) for line in self._run(["getmouselocation", "--shell"]).split())
+        return int(fields["X"]), int(fields["Y"])
+
+    def _move(self, x, y) -> list[str]:
+        return [] if x is None or y is None else ["mousemove", str(x), str(y)]
+
+    def move_to(self, x, y):
+        self._run(self._move(x, y))
+
+    def drag_to(self, x, y, duration=0.5):
+        self._run(["mousedown", "1"])
+        time.sleep(duration)
+        self._run(["mousemove", "--sync", str(x), str(y), "mouseup", "1"])
+
+    def click(self, x=None, y=None, button="left", clicks=1):
+        self._run([*self._move(x, y), "click", "--repeat", str(clicks), str(_BUTTONS[button])])
+
+    def mouse_down(self, x=None, y=None, button="left"):
+        self._run([*self._move(x, y), "mousedown", str(_BUTTONS[button])])
+
+    def mouse_up(self, x=None, y=None, button="left"):
+        self._run([*self._move(x, y), "mouseup", str(_BUTTONS[button])])
+
+    def scroll(self, clicks, x=None, y=None, horizontal=False):
+        if clicks:
+            button = _SCROLL_BUTTONS[(horizontal, clicks > 0)]
+            self._run([*self._move(x, y), "click", "--repeat", str(abs(clicks)), str(button)])
+
+    def key_down(self, key):
+        self._run(["keydown", x_keysym_name(key)])
+
+    def key_up(self, key):
+        self._run(["keyup", x_keysym_name(key)])
+
+    def hotkey(self, keys):
+        self._run(["key", "+".join(x_keysym_name(key) for key in keys)])
+
+    def type_text(self, text, interval=0.0):
+        self._run(["type", "--delay", str(int(interval * 1000)), "--", text])
+
+    def send_text(self, text):
+        self._run(["type", "--delay", "0", "--", text])
+        return True
+
+    def __repr__(self):
+        return f"XdotoolBackend({shlex.quote(self.binary)})"
+
+
+class XTestBackend(InputBackend):
+    """Fake input through the XTEST extension (python-xlib), one sync per call."""
+
+    def __init__(self, display_name: str | None = None):
+        from Xlib import X, XK, display
+        from Xlib.ext import xtest
+
+        self.X, self.XK, self.xtest = X, XK, xtest
+        self.display = display.Display(display_name)
+        if not self.display.has_extension("XTEST"):
+            raise OSError("The X server has no XTEST extension")
+        self.root = self.display.screen().root
+        self._pause = 0.0
+
+    def _flush(self):
+        self.display.sync()
+        if self._pause:
+            time.sleep(self._pause)
+
+    def set_pause(self, seconds):
+        self._pause = seconds
+
+    def _keycode(self, key: str) -> int:
+        keysym = self.XK.string_to_keysym(x_keysym_name(key))
+        keycode = self.display.keysym_to_keycode(keysym)
+        if not keycode:
+            raise ToolError(f"No keycode for key {key!r}")
+        return keycode
+
+    def _fake_move(self, x, y):
+        if x is not None and y is not None:
+            self.xtest.fake_input(self.display, self.X.MotionNotify, x=int(x), y=int(y), root=self.root)
+
+    def _fake_button(self, button: int, press: bool = True, release: bool = True):
+        if press:
+            self.xtest.fake_input(self.display, self.X.ButtonPress, button)
+        if release:
+            self.xtest.fake_input(self.display, self.X.ButtonRelease, button)
+
+    def position(self):
+        pointer = self.root.query_pointer()
+        return pointer.root_x, pointer.root_y
+
+    def move_to(self, x, y):
+        self._fake_move(x, y)
+        self._flush()
+
+    def drag_to(self, x, y, duration=0.5):
+        self._fake_button(1, release=False)
+        self._flush()
+        time.sleep(duration)
+        self._fake_move(x, y)
+        self._fake_button(1, press=False)
+        self._flush()
+
+    def click(self, x=None, y=None, button="left", clicks=1):
+        self._fake_move(x, y)
+        for _ in range(clicks):
+            self._fake_button(_BUTTONS[button])
+        self._flush()
+
+    def mouse_down(self, x=None, y=None, button="left"):
+        self._fake_move(x, y)
+        self._fake_button(_BUTTONS[button], release=False)
+        self._flush()
+
+    def mouse_up(self, x=None, y=None, button="left"):
+        self._fake_move(x, y)
+        self._fake_button(_BUTTONS[button], press=False)
+        self._flush()
+
+    def scroll(self, clicks, x=None, y=None, horizontal=False):
+        self._fake_move(x, y)
+        button = _SCROLL_BUTTONS[(horizontal, clicks > 0)]
+        for _ in range(abs(clicks)):
+            self._fake_button(button)
+        self._flush()
+
+    def key_down(self, key):
+        self.xtest.fake_input(self.display, self.X.KeyPress, self._keycode(key))
+        self._flush()
+
+    def key_up(self, key):
+        self.xtest.fake_input(self.display, self.X.KeyRelease, self._keycode(key))
+        self._flush()
+
+    def hotkey(self, keys):
+        keycodes = [self._keycode(key) for key in keys]
+        for keycode in keycodes:
+            self.xtest.fake_input(self.display, self.X.KeyPress, keycode)
+        for keycode in reversed(keycodes):
+            self.xtest.fake_input(self.display, self.X.KeyRelease, keycode)
+        self._flush()
+
+    def _char_key(self, char: str) -> tuple[int, bool] | None:
+        """(keycode, needs shift) for `char`, or None if the keyboard map has no key for it."""
+        if char == "\n":
+            return self._keycode("enter"), False
+        if char == "\t":
+            return self._keycode("tab"), False
+        code = ord(char)
+        # Latin-1 keysyms equal the code point, others live at 0x01000000 + code point
+        keysym = code if 0x20 <= code <= 0xFF else 0x01000000 + code
+        for keycode, index in self.display.keysym_to_keycodes(keysym):
+            return keycode, index % 2 == 1
+        return None
+
+    def _type(self, text: str, interval: float):
+        char_keys = [self._char_key(char) for char in text]
+        if None in char_keys:
+            return False
+        shift = self._keycode("shift")
+        for keycode, shifted in char_keys:
+            if shifted:
+                self.xtest.fake_input(self.display, self.X.KeyPress, shift)
+            self.xtest.fake_input(self.display, self.X.KeyPress, keycode)
+            self.xtest.fake_input(self.display, self.X.KeyRelease, keycode)
+            if shifted:
+                self.xtest.fake_input(self.display, self.X.KeyRelease, shift)
+            if interval:
+                self.display.sync()
+                time.sleep(interval)
+        self._flush()
+        return True
+
+    def type_text(self, text, interval=0.0):
+        if not self._type(text, interval):
+            logger.warning(f"XTestBackend: some characters of {text!r} have no key in the keyboard map")
+
+    def send_text(self, text):
+        return self._type(text, 0.0)
+
+
+class UInputBackend(InputBackend):
+    """
+    Input through a virtual uinput device (python-evdev). The pointer is an absolute device
+    spanning the virtual desktop; the position is tracked, uinput cannot read it back.
+    Typing assumes a US keyboard layout.
+    """
+
+    # US layout: characters typed with shift
+    _SHIFTED = dict(zip('~!@#$%^&*()_+{}|:"<>?', "`1234567890-=[]\\;',./"))
+    _PUNCTUATION = {
+        " ": "SPACE", "\n": "ENTER", "\t": "TAB", "-": "MINUS", "=": "EQUAL", "[": "LEFTBRACE",
+        "]": "RIGHTBRACE", "\\": "BACKSLASH", ";": "SEMICOLON", "'": "APOSTROPHE", "`": "GRAVE",
+        ",": "COMMA", ".": "DOT", "/": "SLASH",
+    }
+    _KEY_NAMES = {
+        "enter": "ENTER", "return": "ENTER", "esc": "ESC", "escape": "ESC", "ctrl": "LEFTCTRL",
+        "control": "LEFTCTRL", "shift": "LEFTSHIFT", "alt": "LEFTALT", "option": "LEFTALT",
+        "win": "LEFTMETA", "super": "LEFTMETA", "command": "LEFTMETA", "cmd": "LEFTMETA", "meta": "LEFTMETA",
+        "pagedown": "PAGEDOWN", "pageup": "PAGEUP", "del": "DELETE", "capslock": "CAPSLOCK",
+        "printscreen": "SYSRQ",
+    }
+
+    def __init__(self, width: int | None = None, height: int | None = None):
+        from evdev import AbsInfo, UInput, ecodes
+
+        from .screen_geometry import screen_geometry
+
+        self.e = ecodes
+        if width is None or height is None:
+            screens = screen_geometry.screens()
+            width = max(s.x + s.width for s in screens)
+            height = max(s.y + s.height for s in screens)
+        keys = [code for name, code in ecodes.ecodes.items() if name.startswith("KEY_") and code < 0x2ff]
+        capabilities = {
+            ecodes.EV_KEY: sorted(set(keys)) + [ecodes.BTN_LEFT, ecodes.BTN_RIGHT, ecodes.BTN_MIDDLE],
+            ecodes.EV_ABS: [
+                (ecodes.ABS_X, AbsInfo(value=0, min=0, max=width - 1, fuzz=0, flat=0, resolution=0)),
+                (ecodes.ABS_Y, AbsInfo(value=0, min=0, max=height - 1, fuzz=0, flat=0, resolution=0)),
+            ],
+            ecodes.EV_REL: [ecodes.REL_WHEEL, ecodes.REL_HWHEEL],
+        }
+        self.device = UInput(capabilities, name="computer-use-ootb")
+        self._buttons = {"left": ecodes.BTN_LEFT, "middle": ecodes.BTN_MIDDLE, "right": ecodes.BTN_RIGHT}
+        self._position = (0, 0)
+        self._pause = 0.0
+
+    def _syn(self):
+        self.device.syn()
+        if self._pause:
+            time.sleep(self._pause)
+
+    def set_pause(self, seconds):
+        self._pause = seconds
+
+    def _code(self, key: str) -> int:
+        name = self._KEY_NAMES.get(key.lower()) or self._PUNCTUATION.get(key) or key.upper()
+        code = getattr(self.e, f"KEY_{name}", None)
+        if code is None:
+            raise ToolError(f"No uinput key code for {key!r}")
+        return code
+
+    def _char_key(self, char: str) -> tuple[int, bool] | None:
+        """(key code, needs shift) for `char`, or None if it cannot be typed (non-ASCII, control characters)."""
+        if not char.isascii():
+            return None
+        key = self._SHIFTED.get(char, char.lower())
+        name = self._PUNCTUATION.get(key) or (key.upper() if key.isalnum() else None)
+        code = getattr(self.e, f"KEY_{name}", None) if name else None
+        if code is None:
+            return None
+        return code, char.isupper() or char in self._SHIFTED
+
+    def _write_move(self, x, y):
+        if x is not None and y is not None:
+            self.device.write(self.e.EV_ABS, self.e.ABS_X, int(x))
+            self.device.write(self.e.EV_ABS, self.e.ABS_Y, int(y))
+            self._position = (int(x), int(y))
+
+    def _write_key(self, code: int, press: bool = True, release: bool = True):
+        if press:
+            self.device.write(self.e.EV_KEY, code, 1)
+        if release:
+            self.device.write(self.e.EV_KEY, code, 0)
+
+    def position(self):
+        return self._position
+
+    def move_to(self, x, y):
+        self._write_move(x, y)
+        self._syn()
+
+    def drag_to(self, x, y, duration=0.5):
+        self._write_key(self.e.BTN_LEFT, release=False)
+        self._syn()
+        time.sleep(duration)
+        self._write_move(x, y)
+        self._syn()
+        self._write_key(self.e.BTN_LEFT, press=False)
+        self._syn()
+
+    def click(self, x=None, y=None, button="left", clicks=1):
+        self._write_move(x, y)
+        self._syn()
+        for _ in range(clicks):
+            # a SYN per press/release pair, or consumers may merge the clicks
+            self._write_key(self._buttons[button])
+            self.device.syn()
+        self._syn()
+
+    def mouse_down(self, x=None, y=None, button="left"):
+        self._write_move(x, y)
+        self._write_key(self._buttons[button], release=False)
+        self._syn()
+
+    def mouse_up(self, x=None, y=None, button="left"):
+        self._write_move(x, y)
+        self._write_key(self._buttons[button], press=False)
+        self._syn()
+
+    def scroll(self, clicks, x=None, y=None, horizontal=False):
+        self._write_move(x, y)
+        self.device.write(self.e.EV_REL, self.e.REL_HWHEEL if horizontal else self.e.REL_WHEEL, clicks)
+        self._syn()
+
+    def key_down(self, key):
+        self._write_key(self._code(key), release=False)
+        self._syn()
+
+    def key_up(self, key):
+        self._write_key(self._code(key), press=False)
+        self._syn()
+
+    def hotkey(self, keys):
+        codes = [self._code(key) for key in keys]
+        for code in codes:
+            self._write_key(code, release=False)
+        for code in reversed(codes):
+            self._write_key(code, press=False)
+        self._syn()
+
+    def _type(self, text: str, interval: float) -> bool:
+        # resolve every character first, so that nothing is typed if one of them cannot be
+        char_keys = [self._char_key(char) for char in text]
+        if None in char_keys:
+            return False
+        shift = self.e.KEY_LEFTSHIFT
+        for code, shifted in char_keys:
+            if shifted:
+                self._write_key(shift, release=False)
+            self._write_key(code)
+            if shifted:
+                self._write_key(shift, press=False)
+            self.device.syn()
+            if interval:
+                time.sleep(interval)
+        self._syn()
+        return True
+
+    def type_text(self, text, interval=0.0):
+        if not self._type(text, interval):
+            logger.warning(f"UInputBackend: some characters of {text!r} have no key on a US layout")
+
+    def send_text(self, text):
+        return self._type(text, 0.0)
@@ -0,0 +1,56 @@
+"""
+Action pacing profiles.
+
+A `PacingProfile` sets, in one place, how long input waits between events: the pause
+after every input backend call (pyautogui's PAUSE, 0.1s by default), the duration of
+drags and how long `left_press` holds the button. The executors already wait for the
+screen to settle after each action, so the implicit pauses mostly add latency:
+
+- "safe": the original fixed timings (0.1s pause, 0.5s drag, 1s hold), the default;
+- "human": small pauses and human-like drag and hold times;
+- "fast": no pause between events, short drags and holds.
+
+Faster profiles are opt-in: set one with `set_pacing_profile`, sampling_loop_sync(pacing=...)
+or the OOTB_PACING environment variable.
+"""
+import os
+from dataclasses import dataclass
+
+from .logger import logger
+
+
+@dataclass(frozen=True)
+class PacingProfile:
+    name: str
+    event_pause: float  # seconds after each input event
+    drag_duration: float  # seconds a left_click_drag takes
+    press_hold: float  # seconds left_press holds the button
+
+
+PACING_PROFILES: dict[str, PacingProfile] = {
+    "fast": PacingProfile("fast", event_pause=0.0, drag_duration=0.1, press_hold=0.3),
+    "human": PacingProfile("human", event_pause=0.03, drag_duration=0.3, press_hold=0.6),
+    "safe": PacingProfile("safe", event_pause=0.1, drag_duration=0.5, press_hold=1.0),
+}
+
+DEFAULT_PACING = "safe"
+
+
+def get_pacing_profile(name: str | None = None) -> PacingProfile:
+    """The `name` profile, or the active one if `name` is None."""
+    if name is None:
+        return _pacing_profile
+    if name not in PACING_PROFILES:
+        raise ValueError(f"Unknown pacing profile {name!r}, expected one of {tuple(PACING_PROFILES)}")
+    return PACING_PROFILES[name]
+
+
+def set_pacing_profile(profile: PacingProfile | str):
+    global _pacing_profile
+    if isinstance(profile, str):
+        profile = get_pacing_profile(profile)
+    logger.info(f"Using the {profile.name} pacing profile.")
+    _pacing_profile = profile
+
+
+_pacing_profile: PacingProfile = get_pacing_profile(os.environ.get("OOTB_PACING", DEFAULT_PACING))
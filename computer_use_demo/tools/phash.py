@@ -0,0 +1,184 @@
+"""
+Perceptual hashes of captured frames.
+
+`dhash` reduces a frame to a tiny grayscale thumbnail and records, for each pixel,
+whether it is brighter than its right neighbour: visually identical screens hash to the
+same 64-bit integer and small changes flip only a few bits. `PHashIndex` keeps recent
+hashes in memory and answers "has the screen changed since that step?" and "have we seen
+this screen before?" by Hamming distance. Captures are not indexed automatically: every
+Frame hashes itself lazily (`Frame.phash`), and the caller adds the frames it wants to
+look up later, e.g. `ScreenHistory` (change_map.py) one per agent step.
+
+A 64-bit hash is a filter, not a verdict: typing into a field usually leaves it unchanged
+and a small dialog flips only a few bits. Callers that act on a match confirm it on the
+pixels, as `ScreenHistory` and the trajectory cache do with a tile change map.
+
+Near-duplicate lookup splits each hash into `max_distance + 1` bands: by the pigeonhole
+principle two hashes within `max_distance` bits agree exactly on at least one band, so
+only entries sharing a band with the query are compared.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from PIL import Image
+
+
+HASH_SIZE = 8  # 8x8 comparisons -> 64-bit hash
+
+
+def dhash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """Difference hash of `image` as an integer of hash_size * hash_size bits."""
+    # box-filter straight down to (hash_size + 1) x hash_size, then go grayscale on the thumbnail
+    thumbnail = image.resize((hash_size + 1, hash_size), Image.BOX, reducing_gap=2.0).convert("L")
+    pixels = thumbnail.tobytes()
+    width = hash_size + 1
+    value = 0
+    for row in range(hash_size):
+        offset = row * width
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return (a ^ b).bit_count()
+
+
+@dataclass
+class PHashEntry:
+    phash: int
+    value: Any = None
+    timestamp: float = field(default_factory=time.time)
+
+
+class PHashIndex:
+    """
+    In-memory index of perceptual hashes with near-duplicate lookup.
+
+    Args:
+        max_distance: default Hamming distance under which two hashes are the same screen.
+        max_entries: the oldest entries are dropped beyond this many.
+        bits: hash width in bits.
+    """
+
+    def __init__(self, max_distance: int = 4, max_entries: int = 4096, bits: int = HASH_SIZE * HASH_SIZE):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.bits = bits
+        # band i covers bits [edges[i], edges[i + 1]); lookups within max_distance are exact
+        n_bands = max_distance + 1
+        self._edges = [round(i * bits / n_bands) for i in range(n_bands + 1)]
+        self._bands: list[dict[int, dict[int, None]]] = [{} for _ in range(n_bands)]
+        self._entries: OrderedDict[int, PHashEntry] = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _band_keys(self, phash: int):
+        for i in range(len(self._bands)):
+            low, high = self._edges[i], self._edges[i + 1]
+            yield i, (phash >> low) & ((1 << (high - low)) - 1)
+
+    def add(self, phash: int, value: Any = None, timestamp: float | None = None) -> PHashEntry:
+        """Add a hash (with an optional payload) and return its entry."""
+        entry = PHashEntry(phash, value, time.time() if timestamp is None else timestamp)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            for i, key in self._band_keys(phash):
+                self._bands[i].setdefault(key, {})[entry_id] = None
+            while len(self._entries) > self.max_entries:
+                self._remove(*self._entries.popitem(last=False))
+        return entry
+
+    def _remove(self, entry_id: int, entry: PHashEntry):
+        for i, key in self._band_keys(entry.phash):
+            bucket = self._bands[i].get(key)
+            if bucket is not None:
+                bucket.pop(entry_id, None)
+                if not bucket:
+                    del self._bands[i][key]
+
+    def query(self, phash: int, max_distance: int | None = None) -> list[tuple[PHashEntry, int]]:
+        """All entries within `max_distance` of `phash` as (entry, distance), nearest first, newest first on ties."""
+        max_distance = self.max_distance if max_distance is None else max_distance
+        with self._lock:
+            if max_distance > self.max_distance:
+                # the bands only guarantee recall up to self.max_distance
+                candidates = self._entries.keys()
+            else:
+                candidates = set()
+                for i, key in self._band_keys(phash):
+                    candidates.update(self._bands[i].get(key, ()))
+            matches = []
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                distance = hamming(phash, entry.phash)
+                if distance <= max_distance:
+                    matches.append((entry, distance, entry_id))
+        matches.sort(key=lambda m: (m[1], -m[2]))
+        return [(entry, distance) for entry, distance, _ in matches]
+
+    def nearest(self, phash: int, max_distance: int | None = None) -> tuple[PHashEntry, int] | None:
+        """The closest entry within `max_distance`, or None."""
+        matches = self.query(phash, max_distance)
+        return matches[0] if matches else None
+
+    def seen(self, phash: int, max_distance: int | None = None) -> bool:
+        """Whether a near-duplicate of `phash` is in the index."""
+        return self.nearest(phash, max_distance) is not None
+
+    def last(self, value: Any = None) -> PHashEntry | None:
+        """The most recently added entry; with `value`, the latest one with that payload, e.g. a step."""
+        with self._lock:
+            for entry in reversed(self._entries.values()):
+                if value is None or entry.value == value:
+                    return entry
+        return None
+
+    def changed(self, phash: int, since: PHashEntry | None, max_distance: int | None = None) -> bool:
+        """
+        Whether `phash` differs from the entry `since` by more than `max_distance`. The caller
+        names the entry to compare with (e.g. the one it added for the previous step); with
+        None there is nothing to compare with and the screen counts as changed.
+        """
+        max_distance = self.max_distance if max_distance is None else max_distance
+        return since is None or hamming(phash, since.phash) > max_distance
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for band in self._bands:
+                band.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+if __name__ == "__main__":
+    import random
+
+    base = Image.effect_noise((1920, 1080), 64).convert("RGB")
+    start = time.perf_counter()
+    for _ in range(20):
+        h = dhash(base)
+    print(f"dhash 1920x1080: {(time.perf_counter() - start) / 20 * 1000:.2f} ms")
+
+    changed = base.copy()
+    changed.paste((255, 255, 255), (100, 100, 500, 300))
+    print(f"distance after pasting a 400x200 box: {hamming(dhash(base), dhash(changed))}")
+
+    index = PHashIndex()
+    for _ in range(4000):
+        index.add(random.getrandbits(64))
+    step = index.add(h, value="base")
+    start = time.perf_counter()
+    for _ in range(1000):
+        match = index.nearest(h ^ 0b101)
+    print(f"nearest over {len(index)} entries: {(time.perf_counter() - start) * 1000:.1f} us, match={match[0].value}")
+    print(f"changed since the base step: {index.changed(dhash(changed), since=step)}, "
+          f"unchanged: {not index.changed(h, since=step)}")
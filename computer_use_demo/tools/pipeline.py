@@ -0,0 +1,143 @@
+"""
+Pipelined planner + actor steps.
+
+Without pipelining a step is strictly serial: plan -> capture -> ground -> execute ->
+settle -> capture -> plan, and the UI renders the step's messages while nothing else
+runs. `StepPipeline` overlaps these stages:
+
+- the screenshot of the next step is the settle detector's last full-resolution sample
+  of the settled screen (see settle.py), so no capture follows the settle wait;
+- the next planner call is submitted to a worker thread as soon as the history is
+  updated, and the step's messages are rendered while it runs. UI callbacks wrapped with
+  `defer` (the planner's) are not called from the worker: they are queued and run on the
+  loop thread by `result`, after the current step's own callbacks, so chat entries keep
+  their order.
+
+The pipeline records the duration of each stage and how much of the model calls was
+hidden behind other work; `format()` prints a summary, logged at the end of the loop.
+"""
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+from .frame import Frame
+from .screen_capture import capture_frame, frame_from_image
+from .settle import SettleDetector, settle_detector
+from .telemetry import ActionTelemetry
+
+
+@dataclass
+class PipelineTask:
+    name: str
+    future: Future
+    submitted: float = field(default_factory=time.perf_counter)
+    busy: float = 0.0  # seconds the call took on the worker
+    callbacks: list[tuple[Callable, tuple, dict]] = field(default_factory=list)  # deferred to `result`
+
+
+class StepPipeline:
+    """
+    Args:
+        selected_screen: screen the steps capture.
+        settle_detector: detector the executor waits with; its settled grab becomes the next frame.
+        capture: function returning a fresh Frame when no settled grab is usable;
+            defaults to `capture_frame(selected_screen)`.
+    """
+
+    def __init__(self, selected_screen: int = 0, settle_detector: SettleDetector = settle_detector,
+                 capture: Callable[[], Frame] | None = None):
+        self.selected_screen = selected_screen
+        self.settle_detector = settle_detector
+        self._capture = capture or (lambda: capture_frame(selected_screen=self.selected_screen))
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="step-pipeline")
+        self.telemetry = ActionTelemetry(label="stage")
+        self.busy = 0.0  # seconds spent in submitted calls
+        self.hidden = 0.0  # part of `busy` overlapped with work on the calling thread
+        self.captures_saved = 0
+        self._running = threading.local()  # the task running on the worker thread
+
+    def next_frame(self, since: float | None = None) -> Frame:
+        """
+        The frame for the next step: the settled grab of the last settle wait if it was
+        taken after the `since` timestamp (e.g. when execution started), else a capture.
+        """
+        start = time.perf_counter()
+        grab = self.settle_detector.settled_image(self.selected_screen, newer_than=since)
+        if grab is not None:
+            frame = frame_from_image(grab, selected_screen=self.selected_screen)
+            self.captures_saved += 1
+            self.telemetry.record("frame (settled)", time.perf_counter() - start)
+        else:
+            frame = self._capture()
+            self.telemetry.record("frame (capture)", time.perf_counter() - start)
+        return frame
+
+    def submit(self, name: str, fn: Callable[..., Any], *args, **kwargs) -> PipelineTask:
+        """Run `fn(*args, **kwargs)` on the worker thread; collect the value with `result`."""
+        task = PipelineTask(name, Future())
+
+        def run():
+            start = time.perf_counter()
+            self._running.task = task
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._running.task = None
+                task.busy = time.perf_counter() - start
+
+        task.future = self._pool.submit(run)
+        return task
+
+    def defer(self, callback: Callable[..., Any]) -> Callable[..., None]:
+        """
+        Wrap `callback` so that calls made by a submitted task are queued on the task and run
+        by `result` on the calling thread; calls from any other thread go straight through.
+        """
+        def deferred(*args, **kwargs):
+            task = getattr(self._running, "task", None)
+            if task is None:
+                return callback(*args, **kwargs)
+            task.callbacks.append((callback, args, kwargs))
+        return deferred
+
+    def result(self, task: PipelineTask) -> Any:
+        """Run the callbacks `task` deferred, in order, then return its value (or raise its exception)."""
+        start = time.perf_counter()
+        try:
+            task.future.exception()  # wait for it
+        finally:
+            waited = time.perf_counter() - start
+            self.telemetry.record(task.name, task.busy)
+            self.telemetry.record(f"{task.name} (waited)", waited)
+            self.busy += task.busy
+            self.hidden += max(0.0, task.busy - waited)
+        callbacks, task.callbacks = task.callbacks, []
+        for callback, args, kwargs in callbacks:
+            callback(*args, **kwargs)
+        return task.future.result()
+
+    def record(self, name: str, seconds: float):
+        """Record the duration of a stage run on the calling thread, e.g. rendering."""
+        self.telemetry.record(name, seconds)
+
+    @property
+    def overlap_fraction(self) -> float:
+        """Fraction of the submitted calls' time hidden behind other work."""
+        return self.hidden / self.busy if self.busy else 0.0
+
+    def format(self) -> str:
+        return (f"{self.telemetry.format()}\n"
+                f"overlapped {self.hidden:.3f}s of {self.busy:.3f}s in model calls ({self.overlap_fraction:.0%}), "
+                f"{self.captures_saved} captures saved")
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,169 @@
+"""
+Shared, cached monitor geometry for screenshot capture and input mapping.
+
+Querying the display layout is comparatively expensive (on Linux it forks `xrandr`),
+so the layout is queried once and cached until `invalidate()` is called, e.g. when
+a capture notices the screen resolution changed or a monitor was (un)plugged.
+"""
+import re
+import platform
+import subprocess
+import threading
+from dataclasses import dataclass
+from collections.abc import Callable
+
+from .logger import logger
+
+
+@dataclass(frozen=True)
+class ScreenInfo:
+    """Geometry of a single monitor in virtual-desktop coordinates."""
+
+    x: int
+    y: int
+    width: int
+    height: int
+    is_primary: bool = False
+
+    @property
+    def bbox(self) -> tuple[int, int, int, int]:
+        return (self.x, self.y, self.x + self.width, self.y + self.height)
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return (self.width, self.height)
+
+
+# e.g. "HDMI-1 connected primary 1920x1080+1920+0 (normal left inverted right ...) 527mm x 296mm"
+_XRANDR_OUTPUT_RE = re.compile(
+    r"^\S+ connected( primary)? (\d+)x(\d+)\+(\d+)\+(\d+)", re.MULTILINE
+)
+
+
+def _query_screens_screeninfo() -> list[ScreenInfo]:
+    from screeninfo import get_monitors
+
+    return [
+        ScreenInfo(m.x, m.y, m.width, m.height, bool(m.is_primary))
+        for m in get_monitors()
+    ]
+
+
+def _query_screens_darwin() -> list[ScreenInfo]:
+    import Quartz
+
+    max_displays = 32  # Maximum number of displays to handle
+    active_displays = Quartz.CGGetActiveDisplayList(max_displays, None, None)[1]
+
+    screens = []
+    for display_id in active_displays:
+        bounds = Quartz.CGDisplayBounds(display_id)
+        screens.append(ScreenInfo(
+            int(bounds.origin.x),
+            int(bounds.origin.y),
+            int(bounds.size.width),
+            int(bounds.size.height),
+            bool(Quartz.CGDisplayIsMain(display_id)),
+        ))
+    return screens
+
+
+def _query_screens_linux() -> list[ScreenInfo]:
+    try:
+        output = subprocess.run(
+            ["xrandr", "--query"], capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        # no xrandr binary or no X server, try screeninfo before giving up
+        try:
+            return _query_screens_screeninfo()
+        except Exception as e:
+            raise RuntimeError("Failed to get screen resolution on Linux.") from e
+
+    screens = [
+        ScreenInfo(int(x), int(y), int(w), int(h), bool(primary))
+        for primary, w, h, x, y in _XRANDR_OUTPUT_RE.findall(output)
+    ]
+    if not screens:
+        raise RuntimeError("Failed to get screen resolution on Linux.")
+    return screens
+
+
+def query_screens() -> list[ScreenInfo]:
+    """Query the OS for the current monitor layout (uncached)."""
+    system = platform.system()
+    if system == "Windows":
+        return _query_screens_screeninfo()
+    elif system == "Darwin":  # macOS
+        return _query_screens_darwin()
+    else:  # Linux or other OS
+        return _query_screens_linux()
+
+
+class ScreenGeometry:
+    """
+    Caches the monitor layout, sorted by x position (left to right) so that screen
+    indices match the ones shown in the UI.
+    """
+
+    def __init__(self, query: Callable[[], list[ScreenInfo]] = query_screens):
+        self._query = query
+        self._screens: list[ScreenInfo] | None = None
+        self._capture_sizes: dict[int | None, tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def screens(self) -> list[ScreenInfo]:
+        screens = self._screens
+        if screens is None:
+            with self._lock:
+                if self._screens is None:
+                    self._screens = sorted(self._query(), key=lambda s: s.x)
+                    logger.info(f"Screen layout: {self._screens}")
+                screens = self._screens
+        return screens
+
+    def get(self, selected_screen: int | None = 0) -> ScreenInfo:
+        """Return the selected screen, or the primary screen if `selected_screen` is None."""
+        screens = self.screens()
+        if selected_screen is None:
+            primary = next((s for s in screens if s.is_primary), None)
+            if primary is None:
+                raise RuntimeError("No primary monitor found.")
+            return primary
+        if selected_screen < 0 or selected_screen >= len(screens):
+            raise IndexError("Invalid screen index.")
+        return screens[selected_screen]
+
+    def bbox(self, selected_screen: int | None = 0) -> tuple[int, int, int, int]:
+        return self.get(selected_screen).bbox
+
+    def size(self, selected_screen: int | None = 0) -> tuple[int, int]:
+        return self.get(selected_screen).size
+
+    def note_capture_size(self, selected_screen: int | None, size: tuple[int, int]):
+        """
+        Record the pixel size of a capture of `selected_screen`. A change compared to the
+        previous capture means the resolution (or scale factor) changed, so the cached
+        layout is dropped. Sizes are compared capture-to-capture rather than to the
+        logical screen size because HiDPI grabs are larger than the logical bbox.
+        """
+        previous = self._capture_sizes.get(selected_screen)
+        self._capture_sizes[selected_screen] = size
+        if previous is not None and previous != size:
+            logger.info(f"Screen {selected_screen} capture size changed {previous} -> {size}, refreshing layout.")
+            self.invalidate()
+
+    def set_query(self, query: Callable[[], list[ScreenInfo]]):
+        """Query the layout with `query` from now on, e.g. from a synthetic display."""
+        with self._lock:
+            self._query = query
+            self._screens = None
+            self._capture_sizes.clear()
+
+    def invalidate(self):
+        """Drop the cached layout; call on hotplug or resolution change."""
+        with self._lock:
+            self._screens = None
+
+
+screen_geometry = ScreenGeometry()
@@ -0,0 +1,113 @@
+"""
+Adaptive wait for the screen to settle after an action.
+
+Instead of sleeping a fixed time after every action, sample cheap low-resolution
+grayscale frames of the selected screen and return as soon as consecutive samples
+stop changing, bounded by a minimum and a maximum wait. The full-resolution grab of
+the last sample of a settled screen is kept, so it can serve as the next step's
+screenshot instead of capturing again (see pipeline.py).
+"""
+import time
+
+from PIL import Image, ImageChops
+
+from .capture_backend import get_capture_backend
+from .logger import logger
+from .screen_geometry import screen_geometry
+
+
+class SettleDetector:
+    """
+    Args:
+        min_wait: always wait at least this long (seconds), gives the action time to start rendering.
+        max_wait: give up and return after this long (seconds), e.g. for animations or video.
+        interval: delay between two samples (seconds).
+        stable_samples: number of consecutive unchanged comparisons required to call the screen settled.
+        downscale: integer reduction factor of the sampled frames (8 turns 1920x1080 into 240x135).
+        pixel_tolerance: per-pixel gray-level difference below which a pixel counts as unchanged.
+        changed_fraction: fraction of changed pixels tolerated between samples (caret blinks, clocks, ...).
+    """
+
+    def __init__(
+        self,
+        min_wait: float = 0.05,
+        max_wait: float = 2.0,
+        interval: float = 0.05,
+        stable_samples: int = 2,
+        downscale: int = 8,
+        pixel_tolerance: int = 8,
+        changed_fraction: float = 0.002,
+    ):
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.interval = interval
+        self.stable_samples = stable_samples
+        self.downscale = downscale
+        self.pixel_tolerance = pixel_tolerance
+        self.changed_fraction = changed_fraction
+        self._last_grab: tuple[int, Image.Image, float] | None = None  # (screen, full grab, timestamp)
+        self._settled: tuple[int, Image.Image, float] | None = None
+
+    def sample(self, selected_screen: int = 0) -> Image.Image:
+        """Grab a low-resolution grayscale frame of the selected screen."""
+        screenshot = get_capture_backend().grab(screen_geometry.bbox(selected_screen))
+        self._last_grab = (selected_screen, screenshot, time.time())
+        return screenshot.reduce(self.downscale).convert("L")
+
+    def settled_image(self, selected_screen: int = 0, newer_than: float | None = None) -> Image.Image | None:
+        """
+        Full-resolution grab of `selected_screen` taken when the last `wait` saw it settle, or
+        None if that wait timed out or the grab is not newer than the `newer_than` timestamp.
+        """
+        settled = self._settled
+        if settled is None or settled[0] != selected_screen:
+            return None
+        if newer_than is not None and settled[2] <= newer_than:
+            return None
+        return settled[1]
+
+    def has_changed(self, previous: Image.Image, current: Image.Image) -> bool:
+        if previous.size != current.size:
+            return True
+        histogram = ImageChops.difference(previous, current).histogram()
+        changed = sum(histogram[self.pixel_tolerance:])
+        return changed > self.changed_fraction * previous.width * previous.height
+
+    def wait(self, selected_screen: int = 0, min_wait: float | None = None, max_wait: float | None = None) -> float:
+        """Block until the screen stops changing; return the time waited in seconds."""
+        min_wait = self.min_wait if min_wait is None else min_wait
+        max_wait = self.max_wait if max_wait is None else max_wait
+
+        start = time.monotonic()
+        self._settled = None
+        if min_wait > 0:
+            time.sleep(min_wait)
+
+        try:
+            previous = self.sample(selected_screen)
+            stable = 0
+            while stable < self.stable_samples:
+                remaining = max_wait - (time.monotonic() - start)
+                if remaining <= 0:
+                    logger.info(f"Screen {selected_screen} did not settle within {max_wait:.2f}s")
+                    break
+                time.sleep(min(self.interval, remaining))
+                current = self.sample(selected_screen)
+                stable = 0 if self.has_changed(previous, current) else stable + 1
+                previous = current
+            else:
+                self._settled = self._last_grab
+        except OSError as e:
+            # cannot sample the screen, fall back to a fixed wait
+            logger.warning(f"Settle sampling failed ({e}), waiting {max_wait:.2f}s instead")
+            time.sleep(max(0.0, max_wait - (time.monotonic() - start)))
+
+        return time.monotonic() - start
+
+
+settle_detector = SettleDetector()
+
+
+def wait_for_settle(selected_screen: int = 0, min_wait: float | None = None, max_wait: float | None = None) -> float:
+    """Wait for the selected screen to settle using the shared detector."""
+    return settle_detector.wait(selected_screen, min_wait=min_wait, max_wait=max_wait)
@@ -0,0 +1,130 @@
+"""
+Synthetic in-process display for headless runs.
+
+`SyntheticDisplay` is both a capture backend and the owner of a recording input backend:
+frames are rendered in memory and input events update the display state instead of
+reaching a real desktop. With it installed (see `display_backend.use_display_backend`)
+the whole sampling loop runs on a machine without a desktop, e.g. a CI box benchmarking
+loop throughput.
+
+Frames are either scripted (a list of images advanced by each click, key or typing
+event, or a callable rendering the display) or drawn by a default renderer that shows
+the cursor, recent clicks, typed text and the last keys pressed, so that actions
+visibly change the screen.
+"""
+import threading
+import time
+from collections.abc import Callable
+
+from PIL import Image, ImageDraw
+
+from .capture_backend import BBox, CaptureBackend
+from .input_backend import InputEvent, RecordingInputBackend
+from .screen_geometry import ScreenInfo
+
+
+# events that make a scripted display advance to its next frame
+_ADVANCING_EVENTS = ("click", "mouse_up", "drag_to", "scroll", "key_up", "type_text", "paste_text")
+
+
+class SyntheticDisplay(CaptureBackend):
+    """
+    Args:
+        screens: monitor layout; a single 1920x1080 primary screen by default.
+        script: frames to show, as a list of images (one per advancing input event, the
+            last one stays) or a callable returning the virtual-desktop image for this display.
+        capture_delay: seconds each grab takes, to model a real capture cost in benchmarks.
+    """
+
+    def __init__(
+        self,
+        screens: list[ScreenInfo] | None = None,
+        script: list[Image.Image] | Callable[["SyntheticDisplay"], Image.Image] | None = None,
+        capture_delay: float = 0.0,
+    ):
+        self.screens = screens or [ScreenInfo(0, 0, 1920, 1080, True)]
+        self.script = script
+        self.capture_delay = capture_delay
+
+        self.left = min(s.x for s in self.screens)
+        self.top = min(s.y for s in self.screens)
+        self.width = max(s.x + s.width for s in self.screens) - self.left
+        self.height = max(s.y + s.height for s in self.screens) - self.top
+
+        primary = next((s for s in self.screens if s.is_primary), self.screens[0])
+        self.input = RecordingInputBackend(on_event=self._on_event,
+                                           position=(primary.x + primary.width // 2, primary.y + primary.height // 2))
+        self.step = 0  # advancing input events so far
+        self.typed_text = ""
+        self.clicks: list[tuple[int, int]] = []
+        self.keys: list[str] = []
+        self.grabs = 0
+
+        self._frame: Image.Image | None = None  # rendered desktop, None when the state changed
+        self._lock = threading.Lock()
+
+    def query_screens(self) -> list[ScreenInfo]:
+        return list(self.screens)
+
+    def _on_event(self, event: InputEvent):
+        with self._lock:
+            if event.name == "click" and event.args.get("x") is not None:
+                self.clicks = (self.clicks + [(event.args["x"], event.args["y"])])[-10:]
+            elif event.name in ("type_text", "paste_text"):
+                self.typed_text = (self.typed_text + event.args["text"])[-200:]
+            elif event.name == "key_down":
+                self.keys = (self.keys + [event.args["key"]])[-10:]
+            if event.name in _ADVANCING_EVENTS:
+                self.step += 1
+            self._frame = None
+
+    def _render(self) -> Image.Image:
+        if isinstance(self.script, list):
+            return self.script[min(self.step, len(self.script) - 1)].convert("RGB")
+        if callable(self.script):
+            return self.script(self).convert("RGB")
+
+        image = Image.new("RGB", (self.width, self.height), (58, 110, 165))
+        draw = ImageDraw.Draw(image)
+        for screen in self.screens:
+            x, y = screen.x - self.left, screen.y - self.top
+            # a window with a title bar, a text field and a status line per screen
+            draw.rectangle((x + 80, y + 60, x + screen.width - 80, y + screen.height - 100), fill=(240, 240, 240))
+            draw.rectangle((x + 80, y + 60, x + screen.width - 80, y + 92), fill=(200, 200, 210))
+            draw.text((x + 92, y + 70), f"Synthetic display - step {self.step}", fill=(0, 0, 0))
+            draw.rectangle((x + 120, y + 140, x + screen.width - 120, y + 180), outline=(90, 90, 90), fill=(255, 255, 255))
+            draw.text((x + 130, y + 152), self.typed_text[-150:], fill=(0, 0, 0))
+            draw.text((x + 120, y + 200), f"keys: {' '.join(self.keys)}", fill=(60, 60, 60))
+        for cx, cy in self.clicks:
+            cx, cy = cx - self.left, cy - self.top
+            draw.ellipse((cx - 6, cy - 6, cx + 6, cy + 6), outline=(220, 30, 30), width=2)
+        px, py = self.input.position()
+        px, py = px - self.left, py - self.top
+        draw.polygon([(px, py), (px, py + 18), (px + 5, py + 14), (px + 12, py + 14)], fill=(0, 0, 0))
+        return image
+
+    def grab(self, bbox: BBox) -> Image.Image:
+        if self.capture_delay:
+            time.sleep(self.capture_delay)
+        with self._lock:
+            if self._frame is None:
+                self._frame = self._render()
+            frame = self._frame
+            self.grabs += 1
+        left, top, right, bottom = bbox
+        return frame.crop((left - self.left, top - self.top, right - self.left, bottom - self.top))
+
+
+if __name__ == "__main__":
+    display = SyntheticDisplay()
+    before = display.grab(display.screens[0].bbox)
+    display.input.click(400, 160)
+    display.input.type_text("hello world")
+    after = display.grab(display.screens[0].bbox)
+    print(f"events: {[e.name for e in display.input.events]}, step {display.step}, changed: {before.tobytes() != after.tobytes()}")
+
+    start = time.perf_counter()
+    for i in range(100):
+        display.input.move_to(i, i)
+        display.grab(display.screens[0].bbox)
+    print(f"render + grab: {(time.perf_counter() - start) * 10:.2f} ms")
@@ -0,0 +1,65 @@
+"""
+Per-action timing telemetry.
+
+`ComputerTool.dispatch` records how long every action takes in `action_telemetry`;
+`summary()` gives count, total, mean and max seconds per action, e.g. to see how much
+of a CLICK + INPUT + ENTER sequence is spent in input versus waiting.
+"""
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+
+
+@dataclass
+class TimingStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    last: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+
+class ActionTelemetry:
+    """Timing statistics keyed by action name (or `label`, e.g. pipeline stages)."""
+
+    def __init__(self, label: str = "action"):
+        self.label = label
+        self._stats: dict[str, TimingStats] = defaultdict(TimingStats)
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self._stats[name].add(seconds)
+
+    def get(self, name: str) -> TimingStats:
+        with self._lock:
+            return self._stats.get(name, TimingStats())
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                name: {"count": s.count, "total": s.total, "mean": s.mean, "max": s.max}
+                for name, s in sorted(self._stats.items())
+            }
+
+    def format(self) -> str:
+        lines = [f"{self.label:<18}{'count':>7}{'total s':>10}{'mean ms':>10}{'max ms':>10}"]
+        for name, s in self.summary().items():
+            lines.append(f"{name:<18}{s['count']:>7}{s['total']:>10.3f}{s['mean'] * 1000:>10.1f}{s['max'] * 1000:>10.1f}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+action_telemetry = ActionTelemetry()
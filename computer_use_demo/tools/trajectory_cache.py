@@ -0,0 +1,245 @@
+"""
+Trajectory cache for repeated tasks.
+
+Many tasks are the same few workflows re-run all day. A successful run is stored as its
+task, and for each step the screen it started from and the actions executed from it.
+When the same task runs again, a step whose screen still matches the recorded one replays
+the recorded actions without calling the models; on the first divergence the loop falls
+back to the planner and actor, and the new run replaces the recorded trajectory once it
+succeeds.
+
+A 64-bit perceptual hash (see phash.py) is too coarse to decide that: typing into a field
+leaves it unchanged and a small dialog flips only a few bits. The hash only rejects
+screens cheaply; a match also needs a tile change map (see change_map.py) against the
+recorded frame, kept as PNG in its own `FrameStore`, with no changed tile by default.
+
+Text typed by a step (e.g. a password) is not written to disk unless `record_text` is
+set (OOTB_TRAJECTORY_RECORD_TEXT=1): without it, recording stops before the first step
+that types, and only the steps before it are replayed.
+
+Trajectories are kept in a JSON file, written atomically after each successful run.
+"""
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from PIL import Image
+
+from .change_map import compute_change_map
+from .frame import Frame
+from .frame_store import FrameStore
+from .logger import logger
+from .phash import hamming
+
+
+TRAJECTORY_CACHE_PATH = os.environ.get("OOTB_TRAJECTORY_CACHE", "./tmp/trajectories.json")
+TRAJECTORY_FRAMES_DIR = os.environ.get("OOTB_TRAJECTORY_FRAMES", "./tmp/trajectory_frames")
+RECORD_TEXT = os.environ.get("OOTB_TRAJECTORY_RECORD_TEXT", "") == "1"
+MAX_TRAJECTORIES = 500
+
+
+@dataclass
+class TrajectoryStep:
+    phash: int  # screen the step started from
+    actions: list[dict[str, Any]]  # executor-specific, e.g. ShowUI tool inputs
+    history: list[str] | None = None  # conversation entry the step added, replayed as is
+    frame: str | None = None  # file name of the screen in the frame store
+
+
+@dataclass
+class Trajectory:
+    task: str
+    steps: list[TrajectoryStep]
+    final_phash: int | None = None  # screen on which the task was done
+    successes: int = 1
+    updated: float = field(default_factory=time.time)
+    final_frame: str | None = None  # file name of that screen in the frame store
+
+
+def task_key(task: str) -> str:
+    """Normalize a task prompt so that case and whitespace differences hit the same trajectory."""
+    return re.sub(r"\s+", " ", task).strip().lower()
+
+
+def task_text(messages: list) -> str | None:
+    """The text of the last user message that is a task prompt (not a tool result or history)."""
+    for message in reversed(messages):
+        if not isinstance(message, dict) or message.get("role") != "user":
+            continue
+        content = message.get("content")
+        first = content[0] if isinstance(content, list) and content else content
+        text = getattr(first, "text", None)
+        if text is None and isinstance(first, dict) and first.get("type") == "text":
+            text = first.get("text")
+        if isinstance(text, str):
+            return text
+    return None
+
+
+def types_text(actions: list[dict[str, Any]]) -> bool:
+    """Whether any action types text, as a ShowUI tool input or an Anthropic computer tool call."""
+    for action in actions:
+        if "name" in action:  # a tool call: {"name": ..., "input": {...}}
+            action = action["input"] if action["name"] == "computer" else {}
+        if action.get("action") == "type" and action.get("text"):
+            return True
+    return False
+
+
+@lru_cache(maxsize=4)
+def _read_frame(path: str) -> Image.Image:
+    # names are content hashes, so a path always holds the same image; lookup and the
+    # pipeline's check read the same recorded frame for a step
+    with Image.open(path) as image:
+        return image.convert("RGB")
+
+
+class TrajectoryRecorder:
+    """Collects the steps of one run; `TrajectoryCache.commit` stores them if the run succeeded."""
+
+    def __init__(self, task: str, record_text: bool = False):
+        self.task = task
+        self.record_text = record_text
+        self.steps: list[TrajectoryStep] = []
+        self.frames: list[Frame] = []
+        self.replayed = 0
+        self.stopped = False  # a step typed text and `record_text` is off: the steps after it are not recorded
+
+    def record(self, frame: Frame, actions: list[dict[str, Any]], history: list[str] | None = None):
+        if self.stopped:
+            return
+        if not self.record_text and types_text(actions):
+            logger.info(f"Trajectory cache: not recording {self.task!r} past step {len(self.steps)}, it types text")
+            self.stopped = True
+            return
+        self.steps.append(TrajectoryStep(frame.phash, actions, history))
+        self.frames.append(frame)
+
+
+class TrajectoryCache:
+    """
+    Args:
+        path: JSON file holding the trajectories; None keeps them in memory only.
+        frame_store: store for the recorded screens; defaults to TRAJECTORY_FRAMES_DIR.
+        max_distance: Hamming distance above which a screen is rejected without comparing pixels.
+        max_changed_tiles: changed tiles under which a screen still matches the recorded one.
+        record_text: record steps that type text, storing the text in plaintext.
+        max_trajectories: the least recently updated trajectories are dropped beyond this many.
+    """
+
+    def __init__(self, path: str | Path | None = TRAJECTORY_CACHE_PATH, frame_store: FrameStore | None = None,
+                 max_distance: int = 4, max_changed_tiles: int = 0, record_text: bool = RECORD_TEXT,
+                 max_trajectories: int = MAX_TRAJECTORIES):
+        self.path = Path(path) if path is not None else None
+        self.frame_store = frame_store if frame_store is not None else FrameStore(TRAJECTORY_FRAMES_DIR)
+        self.max_distance = max_distance
+        self.max_changed_tiles = max_changed_tiles
+        self.record_text = record_text
+        self.max_trajectories = max_trajectories
+        self._trajectories: dict[str, Trajectory] | None = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[str, Trajectory]:
+        # read lazily so that importing the module never touches the disk
+        if self._trajectories is None:
+            self._trajectories = {}
+            if self.path is not None and self.path.exists():
+                try:
+                    for item in json.loads(self.path.read_text(encoding="utf-8")):
+                        item["steps"] = [TrajectoryStep(**step) for step in item["steps"]]
+                        trajectory = Trajectory(**item)
+                        self._trajectories[task_key(trajectory.task)] = trajectory
+                except (OSError, ValueError, TypeError, KeyError) as e:
+                    logger.warning(f"Ignoring unreadable trajectory cache {self.path}: {e}")
+        return self._trajectories
+
+    def _save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps([asdict(t) for t in self._trajectories.values()]), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def get(self, task: str) -> Trajectory | None:
+        with self._lock:
+            return self._load().get(task_key(task))
+
+    def matches(self, phash: int, name: str | None, frame: Frame) -> bool:
+        """Whether `frame` shows the recorded screen `name` (with hash `phash`)."""
+        if name is None or hamming(phash, frame.phash) > self.max_distance:
+            return False
+        try:
+            recorded = _read_frame(str(self.frame_store.root / name))
+        except OSError:
+            return False  # evicted from the frame store
+        change_map = compute_change_map(recorded, frame)
+        return int(change_map.mask.sum()) <= self.max_changed_tiles
+
+    def lookup(self, task: str, step: int, frame: Frame) -> TrajectoryStep | None:
+        """The recorded `step` of `task` if `frame` still shows the screen it started from, else None."""
+        trajectory = self.get(task)
+        if trajectory is None or step >= len(trajectory.steps):
+            return None
+        recorded = trajectory.steps[step]
+        if not self.matches(recorded.phash, recorded.frame, frame):
+            logger.info(f"Trajectory cache: step {step} of {task!r} diverged from the recording")
+            return None
+        return recorded
+
+    def is_done(self, task: str, step: int, frame: Frame) -> bool:
+        """Whether `task` was done after `step` steps on the screen `frame` shows."""
+        trajectory = self.get(task)
+        return (trajectory is not None and trajectory.final_phash is not None and step == len(trajectory.steps)
+                and self.matches(trajectory.final_phash, trajectory.final_frame, frame))
+
+    def start(self, task: str) -> TrajectoryRecorder:
+        return TrajectoryRecorder(task, record_text=self.record_text)
+
+    def commit(self, recorder: TrajectoryRecorder, final_frame: Frame | None = None):
+        """Store the run of a task that succeeded, replacing the previous recording."""
+        if not recorder.steps:
+            return
+        if recorder.stopped:
+            final_frame = None  # the recording ends before the task did
+        key = task_key(recorder.task)
+        try:
+            for step, frame in zip(recorder.steps, recorder.frames):
+                step.frame = self.frame_store.put(frame.png_bytes, prefix="step_").name
+            final_name = self.frame_store.put(final_frame.png_bytes, prefix="step_").name if final_frame else None
+        except OSError as e:
+            logger.warning(f"Could not write the trajectory frames to {self.frame_store.root}: {e}")
+            return
+        with self._lock:
+            trajectories = self._load()
+            previous = trajectories.pop(key, None)
+            trajectories[key] = Trajectory(recorder.task, recorder.steps,
+                                           final_frame.phash if final_frame else None,
+                                           successes=previous.successes + 1 if previous else 1,
+                                           final_frame=final_name)
+            while len(trajectories) > self.max_trajectories:
+                del trajectories[next(iter(trajectories))]
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning(f"Could not write the trajectory cache {self.path}: {e}")
+        logger.info(f"Trajectory cache: recorded {len(recorder.steps)} steps of {recorder.task!r} "
+                    f"({recorder.replayed} replayed)")
+
+    def forget(self, task: str):
+        with self._lock:
+            if self._load().pop(task_key(task), None) is not None:
+                self._save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+
+trajectory_cache = TrajectoryCache()
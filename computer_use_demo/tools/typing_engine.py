@@ -0,0 +1,112 @@
+"""
+Typing engine for `type` / INPUT actions.
+
+Typing character by character with a delay is reliable but slow (12ms per character
+plus pyautogui's own pause), which adds up to tens of seconds for long form fields.
+`TypingEngine` picks a strategy per payload:
+
+- "paste": put the text on the clipboard and press the paste shortcut. It is opt-in: the
+  shortcut differs between apps (terminal emulators use ctrl+shift+v, see
+  PyAutoGUIBackend) and a failed paste goes unnoticed, so "auto" only pastes when a
+  `paste_threshold` is set, for payloads at least that long or with characters that
+  cannot be typed as keys. A trailing newline is not pasted but pressed as Enter, since
+  a pasted newline does not submit a single-line field;
+- "bulk": send the whole payload through the input backend without per-character
+  delays, when the backend supports it;
+- "chunked": type in groups of TYPING_GROUP_SIZE characters with TYPING_DELAY_MS between
+  characters, the most conservative option.
+
+Each strategy falls back to the next one if the backend cannot do it. The mode and the
+threshold can be set per engine or with OOTB_TYPING_MODE / OOTB_PASTE_THRESHOLD
+(unset by default).
+"""
+import os
+import time
+
+from .input_backend import InputBackend
+from .logger import logger
+
+
+TYPING_DELAY_MS = 12
+TYPING_GROUP_SIZE = 50
+
+TYPING_MODES = ("auto", "paste", "bulk", "chunked")
+
+
+def chunks(s: str, chunk_size: int) -> list[str]:
+    return [s[i : i + chunk_size] for i in range(0, len(s), chunk_size)]
+
+
+class TypingEngine:
+    """
+    Args:
+        mode: "auto" chooses per payload; "paste", "bulk" or "chunked" force a strategy
+            (falling back to the next one when the backend cannot do it).
+        paste_threshold: in "auto" mode, payloads at least this long (or not ASCII) are
+            pasted; None never pastes.
+        group_size: characters per group in chunked typing.
+        delay_ms: delay between characters in chunked typing.
+    """
+
+    def __init__(
+        self,
+        mode: str = "auto",
+        paste_threshold: int | None = None,
+        group_size: int = TYPING_GROUP_SIZE,
+        delay_ms: int = TYPING_DELAY_MS,
+    ):
+        if mode not in TYPING_MODES:
+            raise ValueError(f"Unknown typing mode {mode!r}, expected one of {TYPING_MODES}")
+        self.mode = mode
+        self.paste_threshold = paste_threshold
+        self.group_size = group_size
+        self.delay_ms = delay_ms
+
+    @classmethod
+    def from_env(cls) -> "TypingEngine":
+        paste_threshold = os.environ.get("OOTB_PASTE_THRESHOLD")
+        return cls(
+            mode=os.environ.get("OOTB_TYPING_MODE", "auto"),
+            paste_threshold=int(paste_threshold) if paste_threshold else None,
+        )
+
+    def strategies(self, text: str) -> list[str]:
+        """Strategies to try for `text`, in order."""
+        if self.mode == "paste":
+            return ["paste", "bulk", "chunked"]
+        if self.mode == "bulk":
+            return ["bulk", "chunked"]
+        if self.mode == "chunked":
+            return ["chunked"]
+        if self.paste_threshold is not None and (len(text) >= self.paste_threshold or not text.isascii()):
+            # key-by-key typing cannot produce non-ASCII characters
+            return ["paste", "bulk", "chunked"]
+        return ["bulk", "chunked"]
+
+    def type(self, text: str, input_backend: InputBackend) -> str:
+        """Type `text` through `input_backend` and return the strategy that was used."""
+        start = time.perf_counter()
+        for strategy in self.strategies(text):
+            if strategy == "paste" and self._paste(text, input_backend):
+                break
+            if strategy == "bulk" and input_backend.send_text(text):
+                break
+            if strategy == "chunked":
+                for chunk in chunks(text, self.group_size):
+                    input_backend.type_text(chunk, interval=self.delay_ms / 1000)
+                break
+        logger.debug(f"Typed {len(text)} characters by {strategy} in {time.perf_counter() - start:.3f}s")
+        return strategy
+
+    @staticmethod
+    def _paste(text: str, input_backend: InputBackend) -> bool:
+        # paste the text without its trailing newlines and press them as Enter
+        body = text.rstrip("\r\n")
+        if body and not input_backend.paste_text(body):
+            return False
+        for _ in range(text[len(body):].count("\n")):
+            input_backend.hotkey(["enter"])
+        return True
+
+
+typing_engine = TypingEngine.from_env()